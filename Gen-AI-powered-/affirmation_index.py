@@ -0,0 +1,71 @@
+# affirmation_index.py
+"""
+Immutable mood_tag -> affirmations index for the CSV fallback path.
+
+Built once when the data is loaded; picking an affirmation is a dict lookup plus
+random.choice over a tuple, with no DataFrame filtering per request. The bucket ->
+mood_tag resolution (mapped tag, then lowercase bucket, then any row) is also
+precomputed for every known bucket.
+"""
+
+import random
+
+# Map mood_bucket to CSV mood_tag format (lowercase)
+MOOD_MAPPING = {
+    "Happy": "happy",
+    "Sad": "sad",
+    "Anxious": "anxious",
+    "Angry": "angry",
+    "Fearful": "fearful",
+    "Urgent": "suicidal",
+    "Neutral": "confused",
+}
+
+
+class AffirmationIndex:
+    def __init__(self, by_tag: dict, mood_mapping: dict = None):
+        self._by_tag = {tag: tuple(rows) for tag, rows in by_tag.items() if rows}
+        self._all = tuple(row for rows in self._by_tag.values() for row in rows)
+        self._mood_mapping = dict(mood_mapping or MOOD_MAPPING)
+        self._resolved = {bucket: self._resolve(bucket) for bucket in self._mood_mapping}
+
+    @classmethod
+    def from_records(cls, records, mood_mapping: dict = None):
+        """
+        records: iterable of (mood_tag, text, safety_flag); rows without text are skipped.
+        """
+        by_tag = {}
+        for tag, text, flag in records:
+            if text is None or str(text).strip() in ("", "nan"):
+                continue
+            flag = "safe" if flag is None or str(flag) in ("", "nan") else str(flag)
+            by_tag.setdefault(str(tag), []).append((str(text).strip(), flag))
+        return cls(by_tag, mood_mapping)
+
+    @classmethod
+    def from_dataframe(cls, df, mood_mapping: dict = None):
+        text_col = "text" if "text" in df.columns else "affirmation"
+        n = len(df)
+        tags = df["mood_tag"].tolist() if "mood_tag" in df.columns else [""] * n
+        texts = df[text_col].tolist() if text_col in df.columns else [None] * n
+        flags = df["safety_flag"].tolist() if "safety_flag" in df.columns else ["safe"] * n
+        return cls.from_records(zip(tags, texts, flags), mood_mapping)
+
+    def __len__(self):
+        return len(self._all)
+
+    def _resolve(self, mood_bucket: str) -> tuple:
+        csv_mood = self._mood_mapping.get(mood_bucket, mood_bucket.lower())
+        # mapped tag, then original mood_bucket if mapping fails, then any row
+        return self._by_tag.get(csv_mood) or self._by_tag.get(mood_bucket.lower()) or self._all
+
+    def candidates(self, mood_bucket: str) -> tuple:
+        rows = self._resolved.get(mood_bucket)
+        return rows if rows is not None else self._resolve(mood_bucket)
+
+    def pick(self, mood_bucket: str, rng=random):
+        """
+        Random (text, safety_flag) for the bucket, or None if the index is empty.
+        """
+        rows = self.candidates(mood_bucket)
+        return rng.choice(rows) if rows else None
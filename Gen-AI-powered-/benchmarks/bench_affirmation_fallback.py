@@ -0,0 +1,83 @@
+# benchmarks/bench_affirmation_fallback.py
+"""
+CSV fallback latency: the old per-request pandas filtering + sample(1) versus
+affirmation_index.AffirmationIndex, on a synthetic affirmations file.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/bench_affirmation_fallback.py [n_rows]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+
+import pandas as pd  # noqa: E402
+
+from affirmation_index import AffirmationIndex, MOOD_MAPPING  # noqa: E402
+
+BUCKETS = list(MOOD_MAPPING)
+
+
+def pandas_pick(full_df, mood_bucket):
+    # the pre-index implementation of ml_logic's CSV fallback
+    csv_mood = MOOD_MAPPING.get(mood_bucket, mood_bucket.lower())
+    rows = full_df[full_df.get("mood_tag", "") == csv_mood]
+    if rows is None or len(rows) == 0:
+        rows = full_df[full_df.get("mood_tag", "") == mood_bucket.lower()]
+    if rows is None or len(rows) == 0:
+        rows = full_df
+    rec = rows.sample(1).iloc[0]
+    return rec.get("text"), rec.get("safety_flag", "safe")
+
+
+def make_csv(path, n_rows):
+    base = pd.read_csv(os.path.join(HERE, "affirmations.csv"), engine="python")
+    tags = base["mood_tag"].tolist()
+    rng = random.Random(1)
+    pd.DataFrame({
+        "id": range(1, n_rows + 1),
+        "mood_tag": [rng.choice(tags) for _ in range(n_rows)],
+        "text": [f"Affirmation number {i}; you are doing well." for i in range(n_rows)],
+        "tone": "gentle",
+        "language": "English",
+        "safety_flag": ["flag" if i % 500 == 0 else "safe" for i in range(n_rows)],
+    }).to_csv(path, index=False)
+
+
+def timeit(fn, n):
+    samples = []
+    for i in range(n):
+        bucket = BUCKETS[i % len(BUCKETS)]
+        t0 = time.perf_counter()
+        fn(bucket)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return 1e6 * statistics.median(samples), 1e6 * samples[int(0.95 * (n - 1))]
+
+
+def main(n_rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "affirmations.csv")
+        make_csv(path, n_rows)
+        df = pd.read_csv(path)
+
+    t0 = time.perf_counter()
+    index = AffirmationIndex.from_dataframe(df)
+    build_ms = 1000 * (time.perf_counter() - t0)
+
+    print(f"rows={n_rows}  index build={build_ms:.1f} ms")
+    print(f"{'path':<10}{'p50 us':>10}{'p95 us':>10}")
+    for name, fn, n in (("pandas", lambda b: pandas_pick(df, b), 200),
+                        ("index", index.pick, 100000)):
+        p50, p95 = timeit(fn, n)
+        print(f"{name:<10}{p50:>10.2f}{p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
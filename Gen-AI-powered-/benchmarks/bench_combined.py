@@ -0,0 +1,56 @@
+# benchmarks/bench_combined.py
+"""
+Compare the two-call (classify_mood + generate_affirmation) path with the single
+combined JSON call, using the local StubGenerativeModel.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/bench_combined.py [n_texts]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+os.chdir(HERE)
+
+import ml_logic  # noqa: E402
+from benchmarks.stub_model import StubGenerativeModel  # noqa: E402
+
+TEXTS = [
+    "I'm stressed about exams tomorrow",
+    "feeling sad and tired today",
+    "not sure how I feel, just a normal day at college",
+    "my friends ignored me and I keep overthinking it",
+]
+
+
+def run(mode: str, n: int):
+    stub = StubGenerativeModel()
+    ml_logic._model = stub
+    ml_logic.VERTEX_COMBINED = mode == "combined"
+    latencies = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        ml_logic.analyze_and_respond(TEXTS[i % len(TEXTS)])
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+    return {
+        "mode": mode,
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        "calls_per_req": stub.calls / n,
+        "in_tokens_per_req": stub.input_tokens / n,
+        "out_tokens_per_req": stub.output_tokens / n,
+    }
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    print(f"{'mode':<10}{'p50 ms':>10}{'p95 ms':>10}{'calls':>8}{'in tok':>10}{'out tok':>10}")
+    for mode in ("two-call", "combined"):
+        r = run(mode, n)
+        print(f"{r['mode']:<10}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['calls_per_req']:>8.1f}"
+              f"{r['in_tokens_per_req']:>10.1f}{r['out_tokens_per_req']:>10.1f}")
@@ -0,0 +1,59 @@
+# benchmarks/bench_import.py
+"""
+Cold-start cost of ml_logic: `python -X importtime -c "import ml_logic"` plus the time
+warmup() takes to load CSVs and the safety model, each in a fresh interpreter.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/bench_import.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WARMUP_SNIPPET = (
+    "import time; t0 = time.perf_counter(); import ml_logic; t1 = time.perf_counter(); "
+    "ml_logic.warmup(); t2 = time.perf_counter(); print(t1 - t0, t2 - t1)"
+)
+
+
+def importtime():
+    """
+    Returns (cumulative us for ml_logic, [(cumulative us, module)] heaviest first).
+    """
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import ml_logic"],
+                         cwd=HERE, capture_output=True, text=True).stderr
+    rows = []
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    total = next((c for c, n in rows if n.strip() == "ml_logic"), 0)
+    # direct children of ml_logic are indented by one level ("   name")
+    top = sorted((r for r in rows if r[1].startswith("   ") and not r[1].startswith("     ")), reverse=True)
+    return total, top[:8]
+
+
+def main(runs):
+    totals, imports, warmups = [], [], []
+    for _ in range(runs):
+        totals.append(importtime()[0])
+        out = subprocess.run([sys.executable, "-c", WARMUP_SNIPPET], cwd=HERE,
+                             capture_output=True, text=True).stdout.split()
+        imports.append(float(out[0]))
+        warmups.append(float(out[1]))
+
+    print(f"import ml_logic (importtime)  median {statistics.median(totals) / 1000:8.1f} ms")
+    print(f"import ml_logic (wall)        median {1000 * statistics.median(imports):8.1f} ms")
+    print(f"ml_logic.warmup()             median {1000 * statistics.median(warmups):8.1f} ms")
+    print("\nheaviest direct imports:")
+    for cumulative, name in importtime()[1]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name.strip()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,94 @@
+# benchmarks/bench_keyword_matcher.py
+"""
+Throughput of keyword_matcher (one pass, every category) against the two urgent
+detectors it replaced: safety.py's regex alternation and ml_logic's substring loop,
+plus ml_logic's old sequential fallback keyword scans.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/bench_keyword_matcher.py [n_texts]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+
+from keyword_matcher import DEFAULT_MATCHER  # noqa: E402
+
+# --- previous implementations, kept verbatim for comparison ---
+OLD_URGENT_REGEX = re.compile("|".join([
+    r"\bkill myself\b", r"\bkill me\b", r"\bi want to die\b", r"\bi'm going to kill myself\b",
+    r"\bwant to end my life\b", r"\bsuicid\w*\b", r"\bhurt myself\b", r"\bending my life\b", r"\bwant to die\b",
+]), flags=re.IGNORECASE)
+OLD_URGENT_KEYWORDS = ["suicide", "kill myself", "hurt myself", "want to die", "end my life", "die by suicide"]
+OLD_FALLBACK_LISTS = [
+    ["stress", "stressed", "anxiet", "panic", "overwhelm"],
+    ["sad", "depress", "lonely", "gloom"],
+    ["happy", "excited", "glad", "joy"],
+    ["angry", "mad", "furious"],
+    ["fear", "scared", "terrified"],
+]
+
+
+def old_regex(text):
+    return bool(OLD_URGENT_REGEX.search(text))
+
+
+def old_substring(text):
+    t = text.lower()
+    return any(k in t for k in OLD_URGENT_KEYWORDS)
+
+
+def old_fallback(text):
+    t = text.lower()
+    found = [i for i, kws in enumerate(OLD_FALLBACK_LISTS) if any(k in t for k in kws)]
+    return found, any(k in t for k in OLD_URGENT_KEYWORDS)
+
+
+SNIPPETS = [
+    "I have exams next week and I can't focus at all",
+    "my friends went out without me again and I'm home alone",
+    "honestly today was fine, nothing special happened in class",
+    "yaar bahut tension hai, kal result aane wala hai",
+    "मुझे आज बहुत अकेलापन महसूस हो रहा है",
+    "I feel so stressed and overwhelmed with everything",
+    "sometimes I just want to die",
+    "got selected for the team, so excited!!",
+]
+
+
+def corpus(n):
+    rng = random.Random(3)
+    return [" ".join(rng.choice(SNIPPETS) for _ in range(rng.randint(1, 4))) for _ in range(n)]
+
+
+def rate(fn, texts):
+    t0 = time.perf_counter()
+    for t in texts:
+        fn(t)
+    return len(texts) / (time.perf_counter() - t0) * 60 / 1e6
+
+
+def main(n):
+    texts = corpus(n)
+    print(f"{n} texts, throughput in millions of texts per minute")
+    rows = [
+        ("old safety regex (urgent only)", old_regex),
+        ("old ml_logic substrings (urgent only)", old_substring),
+        ("old fallback scans (all categories)", old_fallback),
+        ("matcher.has(urgent)", lambda t: DEFAULT_MATCHER.has(t, "urgent")),
+        ("matcher.match (all categories)", DEFAULT_MATCHER.match),
+    ]
+    for name, fn in rows:
+        print(f"  {name:<40}{rate(fn, texts):8.2f}")
+    t0 = time.perf_counter()
+    DEFAULT_MATCHER.match_many(texts)
+    print(f"  {'matcher.match_many (all categories)':<40}{n / (time.perf_counter() - t0) * 60 / 1e6:8.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,118 @@
+# benchmarks/bench_pipeline.py
+"""
+Microbenchmarks for the analyze pipeline, run offline against a zero-latency
+StubGenerativeModel so they measure our own overhead (screens, caches, parsing, fallback):
+detect_urgent, predict_safety, classify_mood, generate_affirmation, analyze_and_respond.
+Model-calling benchmarks run twice: "miss" (every text new to the response cache) and
+"hit" (repeated text).
+
+Save a baseline and compare later runs against it to catch regressions; --compare exits
+with status 1 if any benchmark's median got slower than the tolerance allows.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/bench_pipeline.py [--seconds 1] [--save base.json] [--compare base.json] [--tolerance 0.25]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+os.chdir(HERE)
+
+import ml_logic  # noqa: E402
+from safety import detect_urgent, predict_safety  # noqa: E402
+from benchmarks.corpus import texts as corpus_texts  # noqa: E402
+from benchmarks.stub_model import StubGenerativeModel  # noqa: E402
+
+
+def measure(fn, seconds, min_runs=50):
+    """
+    Calls fn(i) for at least `seconds` and `min_runs` runs; returns per-call stats in us.
+    """
+    for i in range(5):
+        fn(i)
+    samples = []
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while i < min_runs or time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+        i += 1
+    samples.sort()
+    return {
+        "runs": len(samples),
+        "p50_us": 1e6 * statistics.median(samples),
+        "p95_us": 1e6 * samples[int(0.95 * (len(samples) - 1))],
+        "ops_per_s": len(samples) / sum(samples),
+    }
+
+
+def benchmarks():
+    texts = corpus_texts(5000, seed=1, urgent_rate=0.0)
+    n = len(texts)
+
+    def fresh(i):
+        # unique per call, so the response cache always misses
+        return f"{texts[i % n]} {i}"
+
+    safety_model = ml_logic.get_safety_model()
+    rows = [
+        ("detect_urgent", lambda i: detect_urgent(texts[i % n])),
+        ("classify_mood miss", lambda i: ml_logic.classify_mood(fresh(i))),
+        ("classify_mood hit", lambda i: ml_logic.classify_mood(texts[0])),
+        ("generate_affirmation miss", lambda i: ml_logic.generate_affirmation(fresh(i), "Sad")),
+        ("generate_affirmation hit", lambda i: ml_logic.generate_affirmation(texts[0], "Sad")),
+        ("analyze_and_respond miss", lambda i: ml_logic.analyze_and_respond(fresh(i))),
+        ("analyze_and_respond hit", lambda i: ml_logic.analyze_and_respond(texts[0])),
+    ]
+    if safety_model is not None:
+        rows.insert(1, ("predict_safety", lambda i: predict_safety(texts[i % n], safety_model)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=1.0, help="time per benchmark")
+    parser.add_argument("--save", help="write results as JSON (baseline)")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    ml_logic.warmup()
+    ml_logic._model = StubGenerativeModel(latency="fixed:0", per_token_latency=0.0)
+
+    results = {}
+    print(f"{'benchmark':<28}{'p50 us':>10}{'p95 us':>10}{'ops/s':>12}")
+    for name, fn in benchmarks():
+        r = results[name] = measure(fn, args.seconds)
+        print(f"{name:<28}{r['p50_us']:>10.1f}{r['p95_us']:>10.1f}{r['ops_per_s']:>12,.0f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        regressions = []
+        print(f"\n{'vs baseline':<28}{'p50 change':>12}")
+        for name, r in results.items():
+            if name not in base:
+                continue
+            change = r["p50_us"] / base[name]["p50_us"] - 1
+            flag = "  REGRESSION" if change > args.tolerance else ""
+            print(f"{name:<28}{100 * change:>+11.1f}%{flag}")
+            if flag:
+                regressions.append(name)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
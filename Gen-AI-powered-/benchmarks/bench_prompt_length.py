@@ -0,0 +1,71 @@
+# benchmarks/bench_prompt_length.py
+"""
+analyze_and_respond latency versus check-in length, with the prompt input budget off
+and on (prompts.PROMPT_INPUT_MAX_TOKENS). Runs offline against StubGenerativeModel, whose
+latency grows per input token like the real API, and reports model input tokens per
+check-in alongside latency.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/bench_prompt_length.py [--lengths 50,500,2000,8000,20000] [--runs 10] [--budget 512]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+os.chdir(HERE)
+
+import ml_logic  # noqa: E402
+import prompts  # noqa: E402
+from benchmarks.corpus import texts as corpus_texts  # noqa: E402
+from benchmarks.stub_model import StubGenerativeModel  # noqa: E402
+
+
+def journal(chars: int, seed: int) -> str:
+    # a long check-in made of corpus sentences
+    out, i = [], 0
+    sentences = corpus_texts(200, seed=seed, urgent_rate=0.0)
+    while sum(len(s) + 2 for s in out) < chars:
+        out.append(sentences[i % len(sentences)])
+        i += 1
+    return (". ".join(out))[:chars]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lengths", default="50,500,2000,8000,20000", help="check-in lengths in characters")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=int, default=512, help="PROMPT_INPUT_MAX_TOKENS for the 'on' rows")
+    parser.add_argument("--latency", default="fixed:0.02", help="stub base latency spec")
+    args = parser.parse_args()
+
+    ml_logic.warmup()
+    stub = ml_logic._model = StubGenerativeModel(latency=args.latency)
+    ml_logic.response_cache = None  # every call goes to the model
+
+    print(f"{'chars':>8}{'budget':>8}{'p50 ms':>10}{'in tokens':>11}{'prompt build us':>17}")
+    for chars in [int(n) for n in args.lengths.split(",")]:
+        for budget in (0, args.budget):
+            prompts.PROMPT_INPUT_MAX_TOKENS = budget
+            texts = [journal(chars, seed) for seed in range(args.runs)]
+            stub.reset()
+            samples = []
+            for text in texts:
+                t0 = time.perf_counter()
+                ml_logic.analyze_and_respond(text, safety=("safe", 0.0))
+                samples.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            for text in texts:
+                prompts.CLASSIFY.render(text)
+            build_us = 1e6 * (time.perf_counter() - t0) / len(texts)
+            tokens = stub.stats()["input_tokens"] / len(texts)
+            label = budget or "off"
+            print(f"{chars:>8}{label:>8}{1000 * statistics.median(samples):>10.1f}{tokens:>11,.0f}{build_us:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
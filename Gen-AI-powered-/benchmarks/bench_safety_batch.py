@@ -0,0 +1,91 @@
+# benchmarks/bench_safety_batch.py
+"""
+Safety-screen throughput and latency under concurrency: one predict_proba call per
+request (predict_safety) versus the micro-batched screen (ml_logic.batched_safety),
+for several client thread counts. Uses the safety model at SAFETY_MODEL_PATH.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/bench_safety_batch.py [--requests 4000] [--threads 1,8,32,64] [--max-batch 64] [--wait-ms 2]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+os.chdir(HERE)
+
+import ml_logic  # noqa: E402
+from microbatch import MicroBatcher  # noqa: E402
+from safety import predict_safety  # noqa: E402
+from benchmarks.corpus import texts as corpus_texts  # noqa: E402
+
+
+def run(fn, texts, threads):
+    """
+    `threads` clients each call fn(text) back to back; returns (texts/s, p50 ms, p95 ms).
+    """
+    latencies = []
+    lock = threading.Lock()
+    it = iter(texts)
+
+    def client():
+        mine = []
+        while True:
+            with lock:
+                text = next(it, None)
+            if text is None:
+                break
+            t0 = time.perf_counter()
+            fn(text)
+            mine.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return (len(latencies) / elapsed, 1000 * statistics.median(latencies),
+            1000 * latencies[int(0.95 * (len(latencies) - 1))])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--threads", default="1,8,32,64")
+    parser.add_argument("--max-batch", type=int, default=ml_logic.SAFETY_BATCH_MAX)
+    parser.add_argument("--wait-ms", type=float, default=ml_logic.SAFETY_BATCH_WAIT_MS)
+    args = parser.parse_args()
+
+    model = ml_logic.get_safety_model()
+    if model is None:
+        sys.exit("no safety model; train one with train_safety_model.py first")
+    # urgent texts never reach the model in either mode
+    texts = corpus_texts(args.requests, seed=3, urgent_rate=0.0, duplicate_rate=0.0)
+    batcher = MicroBatcher(ml_logic._score_safety_batch, max_batch=args.max_batch,
+                           max_wait=args.wait_ms / 1000, name="bench-batcher")
+    ml_logic._safety_batcher.set(batcher)
+
+    print(f"{'threads':>8}{'mode':>12}{'texts/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'mean batch':>12}")
+    for threads in [int(t) for t in args.threads.split(",")]:
+        rate, p50, p95 = run(lambda t: predict_safety(t, model), texts, threads)
+        print(f"{threads:>8}{'per-request':>12}{rate:>12,.0f}{p50:>10.2f}{p95:>10.2f}{'':>12}")
+        before = batcher.stats()
+        rate, p50, p95 = run(ml_logic.batched_safety, texts, threads)
+        after = batcher.stats()
+        mean = (after["items"] - before["items"]) / max(1, after["batches"] - before["batches"])
+        print(f"{threads:>8}{'batched':>12}{rate:>12,.0f}{p50:>10.2f}{p95:>10.2f}{mean:>12.1f}")
+    batcher.close()
+
+
+if __name__ == "__main__":
+    main()
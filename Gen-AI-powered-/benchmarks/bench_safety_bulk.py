@@ -0,0 +1,76 @@
+# benchmarks/bench_safety_bulk.py
+"""
+Safety scoring throughput (texts/sec): predict_safety one text at a time versus
+safety.bulk_score on a synthetic CSV, single process and across all cores, and
+re-scoring from the on-disk feature cache. Needs safety_model.joblib
+(python train_safety_model.py).
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/bench_safety_bulk.py [n_texts]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+os.chdir(HERE)
+
+from safety import bulk_score, load_safety_model, predict_safety  # noqa: E402
+
+SNIPPETS = [
+    "I have exams next week and I can't focus at all",
+    "my friends went out without me again and I'm home alone",
+    "honestly today was fine, nothing special happened in class",
+    "yaar bahut tension hai, kal result aane wala hai",
+    "मुझे आज बहुत अकेलापन महसूस हो रहा है",
+    "I feel so stressed and overwhelmed with everything",
+    "nobody would notice if I was gone",
+    "got selected for the team, so excited!!",
+]
+
+
+def make_csv(path, n):
+    rng = random.Random(5)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "text"])
+        for i in range(n):
+            w.writerow([i, " ".join(rng.choice(SNIPPETS) for _ in range(rng.randint(1, 4)))])
+
+
+def main(n):
+    model = load_safety_model()
+    if model is None:
+        sys.exit("no safety model; run python train_safety_model.py first")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "checkins.csv")
+        make_csv(src, n)
+        with open(src, encoding="utf-8") as f:
+            texts = [row[1] for row in list(csv.reader(f))[1:min(n, 5000) + 1]]
+
+        t0 = time.perf_counter()
+        for t in texts:
+            predict_safety(t, model)
+        rows = [("predict_safety per text", len(texts) / (time.perf_counter() - t0))]
+
+        cache = os.path.join(tmp, "features")
+        for name, kw in (("bulk_score n_jobs=1", {"n_jobs": 1}),
+                         ("bulk_score n_jobs=-1", {"n_jobs": -1}),
+                         ("bulk_score + cache (cold)", {"n_jobs": -1, "feature_cache": cache}),
+                         ("bulk_score + cache (warm)", {"n_jobs": -1, "feature_cache": cache})):
+            report = bulk_score(src, os.path.join(tmp, "scores.csv"), model, **kw)
+            rows.append((name, report["texts_per_sec"]))
+
+    print(f"{n} texts, {os.cpu_count()} cores")
+    for name, rate in rows:
+        print(f"  {name:<30}{rate:>12,.0f} texts/sec")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,92 @@
+# benchmarks/bench_safety_load.py
+"""
+Per-worker cost of the safety model: joblib sklearn pipeline versus the compact
+artifact (safety.CompactSafetyModel). Trains a 20k-feature TF-IDF + LogisticRegression
+pipeline on a synthetic corpus, exports both formats, then in fresh interpreters measures
+load time (imports included), RSS and private memory after one prediction.
+Private memory is what each additional gunicorn worker really costs; memory-mapped
+compact arrays are shared page cache.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/bench_safety_load.py [runs]
+"""
+
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+os.chdir(HERE)
+
+PROBE = r"""
+import json, os, sys, time
+def mem():
+    out = {}
+    for path, keys in (("/proc/self/status", ("VmRSS",)), ("/proc/self/smaps_rollup", ("Private_Clean", "Private_Dirty"))):
+        try:
+            for line in open(path):
+                k, v = line.split(":", 1)
+                if k in keys:
+                    out[k] = int(v.split()[0])
+        except OSError:
+            pass
+    return out.get("VmRSS", 0), out.get("Private_Clean", 0) + out.get("Private_Dirty", 0)
+rss0, priv0 = mem()
+t0 = time.perf_counter()
+os.environ["SAFETY_MODEL_PATH"] = sys.argv[1]
+import safety
+model = safety.load_safety_model()
+t1 = time.perf_counter()
+safety.predict_safety("i feel a bit low today", model)
+rss1, priv1 = mem()
+print(json.dumps({"load_s": t1 - t0, "rss_kb": rss1 - rss0, "private_kb": priv1 - priv0,
+                  "sklearn": "sklearn" in sys.modules}))
+"""
+
+WORDS = [f"w{i}" for i in range(6000)] + ["sad", "alone", "die", "exam", "tension", "happy"]
+
+
+def build(tmp):
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from train_safety_model import export_compact
+
+    rng = random.Random(0)
+    texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))) for _ in range(20000)]
+    labels = ["flag" if "die" in t.split() else "safe" for t in texts]
+    pipe = make_pipeline(TfidfVectorizer(ngram_range=(1, 2), max_features=20000),
+                         LogisticRegression(class_weight="balanced", max_iter=1000))
+    pipe.fit(texts, labels)
+    joblib_path = os.path.join(tmp, "safety_model.joblib")
+    compact_path = os.path.join(tmp, "safety_model")
+    joblib.dump(pipe, joblib_path)
+    export_compact(pipe, compact_path)
+    return joblib_path, compact_path
+
+
+def probe(path, runs):
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE, path], cwd=HERE, capture_output=True, text=True)
+        results.append(json.loads(out.stdout))
+    return {k: statistics.median(r[k] for r in results) for k in ("load_s", "rss_kb", "private_kb")}, results[0]["sklearn"]
+
+
+def main(runs):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = build(tmp)
+        print(f"{'format':<10}{'load ms':>10}{'RSS MB':>10}{'private MB':>12}  sklearn imported")
+        for name, path in zip(("joblib", "compact"), paths):
+            r, sk = probe(path, runs)
+            print(f"{name:<10}{1000 * r['load_s']:>10.1f}{r['rss_kb'] / 1024:>10.1f}{r['private_kb'] / 1024:>12.1f}  {sk}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,68 @@
+# benchmarks/bench_seed_load.py
+"""
+Time for a fresh interpreter to get from `import ml_logic` to a loaded fallback
+affirmation index, reading the seed data from: the CSVs with pandas, the pickled
+DATA_CACHE_DIR copies, or the seed bundle (build_seed_bundle.py). Also reports whether
+pandas was imported and the cost of a full and a no-op bundle build.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/bench_seed_load.py [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+os.chdir(HERE)
+
+import build_seed_bundle  # noqa: E402
+
+SNIPPET = (
+    "import sys, time; import ml_logic; t0 = time.perf_counter(); ml_logic.get_affirmation_index(); "
+    "print(time.perf_counter() - t0, 'pandas' in sys.modules)"
+)
+
+
+def load_seconds(env: dict) -> (float, bool):
+    out = subprocess.run([sys.executable, "-c", SNIPPET], cwd=HERE, capture_output=True, text=True,
+                         env={**os.environ, **env}).stdout.split()
+    return float(out[0]), out[1] == "True"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle, cache, parse_cache = (os.path.join(tmp, d) for d in ("bundle", "data_cache", "parse_cache"))
+        t0 = time.perf_counter()
+        build_seed_bundle.build(bundle, cache_dir=parse_cache)
+        full = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        build_seed_bundle.build(bundle, cache_dir=parse_cache)
+        noop = time.perf_counter() - t0
+
+        missing = os.path.join(tmp, "no_bundle")
+        modes = [
+            ("csv (pandas)", {"SEED_BUNDLE_PATH": missing, "DATA_CACHE_DIR": ""}),
+            ("pickle cache", {"SEED_BUNDLE_PATH": missing, "DATA_CACHE_DIR": cache}),
+            ("seed bundle", {"SEED_BUNDLE_PATH": bundle}),
+        ]
+        load_seconds(modes[1][1])  # writes the pickles
+        print(f"{'source':<16}{'p50 ms':>9}{'min ms':>9}  pandas imported")
+        for name, env in modes:
+            samples = [load_seconds(env) for _ in range(args.runs)]
+            times = [s for s, _ in samples]
+            print(f"{name:<16}{1000 * statistics.median(times):>9.1f}{1000 * min(times):>9.1f}  {samples[0][1]}")
+    print(f"\nbundle build: full {1000 * full:.0f} ms, no-op {1000 * noop:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_semantic_cache.py
+"""
+Hit rate and lookup latency of semantic_cache.SemanticCache as the index grows.
+
+Uses the safety model's vectorizer when safety_model.joblib exists, otherwise fits a
+TfidfVectorizer with the same settings on a synthetic check-in corpus. Queries are
+paraphrases (word drops / swaps) of texts already in the index plus unrelated texts.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/bench_semantic_cache.py [max_entries]
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+os.chdir(HERE)
+
+from sklearn.feature_extraction.text import TfidfVectorizer  # noqa: E402
+
+from safety import load_safety_model  # noqa: E402
+from semantic_cache import SemanticCache, vectorizer_from_pipeline  # noqa: E402
+
+SUBJECTS = ["exams", "my parents", "college", "my friends", "work", "the results", "my future",
+            "my boyfriend", "my girlfriend", "my coach", "the interview", "money", "my health"]
+FEELINGS = ["stressed about", "worried about", "sad about", "angry at", "happy about",
+            "scared of", "tired of", "excited about", "confused about", "upset with"]
+FILLERS = ["today", "again", "so much", "right now", "lately", "this week", "a lot", "honestly"]
+BUCKETS = ["Anxious", "Anxious", "Sad", "Angry", "Happy", "Fearful", "Sad", "Happy", "Neutral", "Angry"]
+
+
+def make_text(rng):
+    i = rng.randrange(len(FEELINGS))
+    words = ["i", "am", FEELINGS[i], rng.choice(SUBJECTS), rng.choice(FILLERS), rng.choice(FILLERS),
+             "and", rng.choice(FEELINGS), rng.choice(SUBJECTS), str(rng.randrange(1000))]
+    return " ".join(words), BUCKETS[i]
+
+
+def paraphrase(text, rng):
+    words = text.split()
+    if len(words) > 4:
+        del words[rng.randrange(len(words))]
+    i = rng.randrange(len(words) - 1)
+    words[i], words[i + 1] = words[i + 1], words[i]
+    return " ".join(words)
+
+
+def main(max_entries):
+    rng = random.Random(7)
+    corpus = [make_text(rng) for _ in range(max_entries)]
+    vectorizer = vectorizer_from_pipeline(load_safety_model())
+    if vectorizer is None:
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2), max_features=20000)
+        vectorizer.fit([t for t, _ in corpus[:5000]])
+
+    cache = SemanticCache(vectorizer, capacity=max_entries, threshold=0.85)
+    checkpoints = [c for c in (1000, 10000, 25000, 50000, 100000) if c <= max_entries] or [max_entries]
+    print(f"{'entries':>8}{'hit rate':>10}{'p50 us':>10}{'p95 us':>10}")
+    filled = 0
+    for target in checkpoints:
+        # fill without lookups (vectorizing in bulk) so the run stays short
+        block = corpus[filled:target]
+        vecs = vectorizer.transform([t for t, _ in block]).astype("float32")
+        for i, (_, bucket) in enumerate(block):
+            cache.add(vecs[i], bucket)
+        filled = target
+
+        cache.hits = cache.misses = 0
+        latencies = []
+        for _ in range(300):
+            if rng.random() < 0.7:
+                query = paraphrase(corpus[rng.randrange(filled)][0], rng)
+            else:
+                query = make_text(rng)[0]
+            t0 = time.perf_counter()
+            cache.lookup(query)
+            latencies.append(time.perf_counter() - t0)
+        latencies.sort()
+        hit_rate = cache.hits / max(1, cache.hits + cache.misses)
+        print(f"{len(cache):>8}{hit_rate:>10.2%}{1e6 * statistics.median(latencies):>10.0f}"
+              f"{1e6 * latencies[int(0.95 * (len(latencies) - 1))]:>10.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
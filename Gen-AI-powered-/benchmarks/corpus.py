@@ -0,0 +1,114 @@
+# benchmarks/corpus.py
+"""
+Synthetic check-in corpus in English, Hindi (Devanagari) and Hinglish, for benchmarks
+and load tests. Texts are built from per-language, per-mood templates and fillers, so
+they exercise the keyword matcher, the safety model and the caches realistically
+(including a small share of urgent texts), and are reproducible from a seed.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/corpus.py N out.csv|out.jsonl [--seed 0] [--urgent-rate 0.02]
+"""
+
+import csv
+import json
+import os
+import random
+import sys
+
+LANGUAGES = ("en", "hi", "hinglish")
+
+TEMPLATES = {
+    "en": {
+        "Anxious": ["I'm so stressed about {thing}", "I can't stop panicking about {thing}",
+                    "feeling overwhelmed with {thing} right now"],
+        "Sad": ["I feel sad and lonely {when}", "nobody talked to me {when}, feeling low",
+                "I've been feeling down since {thing}"],
+        "Happy": ["so happy, {thing} went really well!", "I'm excited about {thing}",
+                  "had a great day {when}"],
+        "Angry": ["I'm so angry about {thing}", "my {person} made me furious {when}"],
+        "Fearful": ["I'm scared about {thing}", "terrified of what happens after {thing}"],
+        "Neutral": ["nothing special {when}, just {thing}", "normal day, had {thing}"],
+        "Urgent": ["I want to die, I can't handle {thing}", "sometimes I think about ending my life",
+                   "I want to hurt myself {when}"],
+    },
+    "hi": {
+        "Anxious": ["{thing} को लेकर बहुत तनाव है", "मुझे {thing} की बहुत चिंता हो रही है"],
+        "Sad": ["{when} बहुत उदास महसूस कर रहा हूँ", "मुझे बहुत अकेलापन लग रहा है"],
+        "Happy": ["आज मैं बहुत खुश हूँ, {thing} अच्छा गया", "{thing} के बारे में सोचकर खुशी हो रही है"],
+        "Angry": ["{person} पर बहुत गुस्सा आ रहा है", "मैं {thing} से नाराज़ हूँ"],
+        "Fearful": ["मुझे {thing} से डर लग रहा है", "{thing} के बारे में सोचकर डर लगता है"],
+        "Neutral": ["आज का दिन ठीक था", "{when} कुछ खास नहीं हुआ"],
+        "Urgent": ["मैं आत्महत्या के बारे में सोच रहा हूँ", "मैं अब जीना नहीं चाहता"],
+    },
+    "hinglish": {
+        "Anxious": ["yaar bahut tension hai {thing} ki", "{thing} ko lekar bahut chinta ho rahi hai"],
+        "Sad": ["aaj bahut udaas feel ho raha hai", "{when} se bahut akela feel kar raha hoon"],
+        "Happy": ["aaj main bahut khush hoon, {thing} achha gaya", "maza aa gaya {when}"],
+        "Angry": ["{person} pe bahut gussa aa raha hai", "main {thing} se naraz hoon"],
+        "Fearful": ["mujhe {thing} se darr lag raha hai", "{thing} ke baare mein soch ke dar lagta hai"],
+        "Neutral": ["aaj ka din theek tha", "{when} kuch khaas nahi hua"],
+        "Urgent": ["main marna chahta hoon", "ab jeena nahi chahti, sab khatam karna hai"],
+    },
+}
+
+FILLERS = {
+    "en": {"thing": ["my exams", "the board results", "college applications", "my project", "the match"],
+           "when": ["today", "this week", "since yesterday", "after school"],
+           "person": ["friend", "teacher", "brother", "coach"]},
+    "hi": {"thing": ["परीक्षा", "रिज़ल्ट", "कॉलेज", "प्रोजेक्ट"],
+           "when": ["आज", "इस हफ्ते", "कल से"],
+           "person": ["दोस्त", "टीचर", "भाई"]},
+    "hinglish": {"thing": ["exam", "result", "college admission", "project"],
+                 "when": ["aaj", "kal se", "is hafte"],
+                 "person": ["dost", "teacher", "bhai"]},
+}
+
+MOODS = ["Anxious", "Sad", "Happy", "Angry", "Fearful", "Neutral"]
+
+
+def generate(n: int, seed: int = 0, urgent_rate: float = 0.02, languages=LANGUAGES, duplicate_rate: float = 0.1):
+    """
+    Returns n dicts {"id", "language", "mood", "text"}. About `duplicate_rate` of texts
+    repeat an earlier one (as real check-ins do), which is what the caches feed on.
+    """
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        if out and rng.random() < duplicate_rate:
+            row = dict(rng.choice(out), id=i)
+            out.append(row)
+            continue
+        lang = rng.choice(languages)
+        mood = "Urgent" if rng.random() < urgent_rate else rng.choice(MOODS)
+        fill = {k: rng.choice(v) for k, v in FILLERS[lang].items()}
+        text = rng.choice(TEMPLATES[lang][mood]).format(**fill)
+        out.append({"id": i, "language": lang, "mood": mood, "text": text})
+    return out
+
+
+def texts(n: int, seed: int = 0, **kwargs) -> list:
+    return [row["text"] for row in generate(n, seed, **kwargs)]
+
+
+def write(rows, path: str):
+    if path.endswith(".jsonl"):
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=["id", "language", "mood", "text"])
+        w.writeheader()
+        w.writerows(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Write a synthetic check-in corpus.")
+    parser.add_argument("n", type=int)
+    parser.add_argument("out", help=".csv or .jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--urgent-rate", type=float, default=0.02)
+    args = parser.parse_args()
+    write(generate(args.n, args.seed, args.urgent_rate), args.out)
+    print(f"wrote {args.n} check-ins to {os.path.abspath(args.out)}", file=sys.stderr)
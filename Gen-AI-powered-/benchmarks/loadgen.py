@@ -0,0 +1,143 @@
+# benchmarks/loadgen.py
+"""
+Closed-loop load generator for serve.py: `concurrency` threads send check-ins from the
+synthetic corpus back to back for `duration` seconds (or `requests` total) and report
+throughput, error count, latency p50/p95/p99 and time to first byte (which is what
+/analyze/stream improves). Standard library only.
+
+Usage (from Gen-AI-powered-/, with serve.py or benchmarks/stub_server.py running):
+  python benchmarks/loadgen.py [--url http://127.0.0.1:8080] [--endpoint /analyze]
+                               [--concurrency 16] [--duration 20 | --requests N]
+                               [--batch-size 32] [--unique] [--json]
+
+--unique appends the request number to each text so every request misses the response
+cache (worst case); by default the corpus repeats texts the way real traffic does.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+
+from benchmarks.corpus import texts as corpus_texts  # noqa: E402
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def one_request(url, body, timeout):
+    """
+    Returns (ok, latency s, time to first byte s).
+    """
+    req = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read(1)
+            ttfb = time.perf_counter() - t0
+            resp.read()
+            ok = 200 <= resp.status < 300
+    except (urllib.error.URLError, OSError, ValueError):
+        return False, time.perf_counter() - t0, None
+    return ok, time.perf_counter() - t0, ttfb
+
+
+def run(url, endpoint="/analyze", concurrency=16, duration=20.0, requests=None, batch_size=32,
+        timeout=30.0, seed=0, unique=False):
+    texts = corpus_texts(20000, seed=seed)
+
+    def text(i):
+        return f"{texts[i % len(texts)]} {i}" if unique else texts[i % len(texts)]
+
+    target = url.rstrip("/") + endpoint
+    batch = endpoint.endswith("/batch")
+    lock = threading.Lock()
+    counter = [0]
+    latencies, ttfbs = [], []
+    errors = [0]
+    deadline = time.perf_counter() + duration if requests is None else None
+
+    def worker():
+        while True:
+            with lock:
+                i = counter[0]
+                if (requests is not None and i >= requests) or (deadline and time.perf_counter() >= deadline):
+                    return
+                counter[0] += 1
+            if batch:
+                body = {"texts": [text(i * batch_size + j) for j in range(batch_size)]}
+            else:
+                body = {"text": text(i)}
+            ok, latency, ttfb = one_request(target, body, timeout)
+            with lock:
+                if ok:
+                    latencies.append(latency)
+                    ttfbs.append(ttfb)
+                else:
+                    errors[0] += 1
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    ttfbs.sort()
+    done = len(latencies)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": done + errors[0],
+        "errors": errors[0],
+        "seconds": round(elapsed, 2),
+        "req_per_s": round(done / elapsed, 1) if elapsed else 0.0,
+        "texts_per_s": round(done * (batch_size if batch else 1) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(1000 * percentile(latencies, 0.50), 1),
+        "p95_ms": round(1000 * percentile(latencies, 0.95), 1),
+        "p99_ms": round(1000 * percentile(latencies, 0.99), 1),
+        "max_ms": round(1000 * (latencies[-1] if latencies else 0.0), 1),
+        "ttfb_p50_ms": round(1000 * percentile(ttfbs, 0.50), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test serve.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--endpoint", default="/analyze", help="/analyze, /analyze/stream or /analyze/batch")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--requests", type=int, default=None, help="stop after N requests instead of --duration")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--unique", action="store_true", help="make every text a response-cache miss")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    r = run(args.url, args.endpoint, args.concurrency, args.duration, args.requests, args.batch_size, args.timeout,
+            unique=args.unique)
+    if args.json:
+        print(json.dumps(r))
+        return
+    print(f"{r['endpoint']}  concurrency={r['concurrency']}  {r['requests']} requests in {r['seconds']}s "
+          f"({r['errors']} errors)")
+    print(f"  throughput  {r['req_per_s']:.1f} req/s  ({r['texts_per_s']:.1f} texts/s)")
+    print(f"  latency     p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  max {r['max_ms']} ms")
+    print(f"  first byte  p50 {r['ttfb_p50_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
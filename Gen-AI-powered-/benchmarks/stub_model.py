@@ -0,0 +1,160 @@
+# benchmarks/stub_model.py
+"""
+Local stand-in for vertexai GenerativeModel, so benchmarks run offline.
+
+It answers the three prompt shapes ml_logic sends (classify, affirmation, combined JSON),
+sleeps for a latency drawn from a configurable distribution plus a per-input-token cost,
+fails a configurable fraction of calls, and counts calls and tokens. It supports
+generate_content(..., stream=True) and generate_content_async like the real SDK.
+
+Latency specs (also accepted by StubGenerativeModel.from_spec / stub_server.py):
+  "fixed:0.05"              always 50 ms
+  "uniform:0.02:0.2"        uniform between 20 and 200 ms
+  "lognormal:0.3:0.5"       median 300 ms, sigma 0.5 (long right tail, like real APIs)
+"""
+
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+
+TASK_LATENCY_S = 0.05        # fixed per-call overhead
+PER_TOKEN_LATENCY_S = 0.0002  # extra latency per input token
+STREAM_CHUNK_WORDS = 3        # words per streamed chunk
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token, good enough for relative comparisons
+    return max(1, len(text) // 4)
+
+
+def parse_latency(spec: str):
+    """
+    "kind:arg[:arg]" -> callable(rng) returning seconds.
+    """
+    kind, *args = spec.split(":")
+    args = [float(a) for a in args]
+    if kind == "fixed":
+        return lambda rng: args[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == "lognormal":
+        median, sigma = args
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+class StubError(RuntimeError):
+    """
+    Injected failure (stands in for a Vertex 5xx / deadline error).
+    """
+
+
+class StubUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class StubResponse:
+    def __init__(self, text, prompt_tokens):
+        self.text = text
+        self.usage_metadata = StubUsage(prompt_tokens, estimate_tokens(text))
+
+
+class StubGenerativeModel:
+    def __init__(self, model_name="stub", base_latency=TASK_LATENCY_S, per_token_latency=PER_TOKEN_LATENCY_S,
+                 latency=None, failure_rate=0.0, seed=None):
+        self.model_name = model_name
+        self.base_latency = base_latency
+        self.per_token_latency = per_token_latency
+        # callable(rng) -> seconds; replaces base_latency when given
+        self.latency = parse_latency(latency) if isinstance(latency, str) else latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def from_spec(cls, latency="fixed:0.05", failure_rate=0.0, per_token_latency=PER_TOKEN_LATENCY_S, seed=None):
+        return cls(latency=latency, failure_rate=failure_rate, per_token_latency=per_token_latency, seed=seed)
+
+    def reset(self):
+        self.calls = 0
+        self.failures = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def _answer(self, prompt: str) -> str:
+        text = prompt.rsplit("User text:", 1)[-1].lower()
+        mood = "Anxious" if "stress" in text or "exam" in text else "Sad" if "sad" in text else "Neutral"
+        affirmation = "You are doing your best, and that is enough for today."
+        if prompt.rstrip().endswith("JSON:"):
+            return json.dumps({"mood_bucket": mood, "affirmation": affirmation})
+        if prompt.rstrip().endswith("Category:"):
+            return mood
+        return affirmation
+
+    def _plan(self, prompt):
+        """
+        (delay seconds, failure?, prompt tokens) for one call; counts the call.
+        """
+        prompt_tokens = estimate_tokens(prompt)
+        with self._lock:
+            base = self.latency(self._rng) if self.latency else self.base_latency
+            failed = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+            self.calls += 1
+            self.failures += failed
+            self.input_tokens += prompt_tokens
+        return base + self.per_token_latency * prompt_tokens, failed, prompt_tokens
+
+    def _count_output(self, text):
+        with self._lock:
+            self.output_tokens += estimate_tokens(text)
+
+    def _stream(self, text, prompt_tokens, delay):
+        # first chunk after `delay`, then the rest spread over a third of it
+        words = text.split(" ")
+        chunks = [" ".join(words[i:i + STREAM_CHUNK_WORDS]) + " " for i in range(0, len(words), STREAM_CHUNK_WORDS)]
+        time.sleep(delay)
+        sent = ""
+        try:
+            for i, chunk in enumerate(chunks):
+                if i:
+                    time.sleep(delay / 3 / len(chunks))
+                sent += chunk
+                yield StubResponse(chunk, prompt_tokens)
+        finally:
+            # only what was actually generated is billed, like a cancelled stream
+            self._count_output(sent)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        delay, failed, prompt_tokens = self._plan(prompt)
+        text = self._answer(prompt)
+        if stream:
+            if failed:
+                time.sleep(delay)
+                raise StubError("stub: injected failure")
+            return self._stream(text, prompt_tokens, delay)
+        time.sleep(delay)
+        if failed:
+            raise StubError("stub: injected failure")
+        self._count_output(text)
+        return StubResponse(text, prompt_tokens)
+
+    async def generate_content_async(self, prompt, generation_config=None, **kwargs):
+        delay, failed, prompt_tokens = self._plan(prompt)
+        await asyncio.sleep(delay)
+        if failed:
+            raise StubError("stub: injected failure")
+        text = self._answer(prompt)
+        self._count_output(text)
+        return StubResponse(text, prompt_tokens)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "failures": self.failures,
+                    "input_tokens": self.input_tokens, "output_tokens": self.output_tokens}
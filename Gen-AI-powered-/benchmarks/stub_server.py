@@ -0,0 +1,44 @@
+# benchmarks/stub_server.py
+"""
+Runs serve.py's Flask app with StubGenerativeModel in place of Vertex, so loadgen.py can
+exercise the whole HTTP pipeline offline. Stub call counters are at GET /stub/stats.
+
+Usage (from Gen-AI-powered-/):
+  python benchmarks/stub_server.py [--port 8080] [--latency lognormal:0.3:0.5] [--failure-rate 0.02]
+"""
+
+import argparse
+import os
+import sys
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+os.chdir(HERE)
+
+import ml_logic  # noqa: E402
+from serve import app, jsonify  # noqa: E402
+from benchmarks.stub_model import StubGenerativeModel  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serve.py backed by the stub model")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", default="lognormal:0.3:0.5", help="see benchmarks/stub_model.py")
+    parser.add_argument("--per-token-latency", type=float, default=0.0002)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    ml_logic.warmup()
+    stub = StubGenerativeModel.from_spec(args.latency, args.failure_rate, args.per_token_latency, args.seed)
+    ml_logic._model = stub
+
+    @app.route("/stub/stats", methods=["GET"])
+    def stub_stats():
+        return jsonify(stub.stats()), 200
+
+    app.run(host="127.0.0.1", port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
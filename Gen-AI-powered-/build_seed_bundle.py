@@ -0,0 +1,342 @@
+# build_seed_bundle.py
+"""
+Builds the seed data bundle read by seed_bundle.py (ml_logic's fallback affirmations,
+train_mood_model.py's seed moods) from the affirmations / health tips / moods CSVs in
+English and Hindi.
+
+  - Parse: csv module against a per-table schema. The hand-edited CSVs have unquoted
+    commas in their free-text column, so surplus fields are folded back into it; rows that
+    still fail validation are reported and dropped (--strict fails the build instead).
+  - Normalize: language -> en / hi, safety_flag -> safe / flag, mood tags lowercased and
+    Devanagari tags mapped to the English ones (TAG_ALIASES, plus moods_hindi.csv labels
+    aligned by id with moods.csv).
+  - Deduplicate texts per table and language (response_cache.normalize_text); an
+    affirmation stays flagged if any of its copies was.
+  - Write a new bundle version and switch CURRENT to it.
+
+Incremental: validated rows are cached per source file by content hash under
+DATA_CACHE_DIR, so only changed files are parsed again; tables whose inputs did not change
+are hard-linked from the previous version; if nothing changed nothing is written.
+
+Usage:
+  python build_seed_bundle.py [--out seed_bundle] [--strict] [--force]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+from response_cache import make_key, normalize_text
+from seed_bundle import (BUNDLE_PATH, CURRENT, FORMAT_VERSION, MANIFEST, column_files, encode_column,
+                         load_bundle)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(os.getenv("DATA_CACHE_DIR", ".data_cache") or ".data_cache", "seed")
+KEEP_VERSIONS = 2  # the new version and the one before it (still mapped by running processes)
+
+# (table, language, path); all inside this directory so the Docker build context has them
+# (the Hindi files are copies of the ones in youth-wellness-hack, like the English ones)
+SOURCES = [
+    ("affirmations", "en", os.path.join(HERE, "affirmations.csv")),
+    ("affirmations", "hi", os.path.join(HERE, "affirmations_hindi.csv")),
+    ("health_tips", "en", os.path.join(HERE, "health_tips.csv")),
+    ("health_tips", "hi", os.path.join(HERE, "health_tips_hindi.csv")),
+    ("moods", "en", os.path.join(HERE, "moods.csv")),
+    ("moods", "hi", os.path.join(HERE, "moods_hindi.csv")),
+]
+
+LANGUAGES = {"en": "en", "english": "en", "hi": "hi", "hindi": "hi", "हिन्दी": "hi", "हिंदी": "hi"}
+SAFETY_FLAGS = {"safe": "safe", "0": "safe", "false": "safe", "flag": "flag", "unsafe": "flag", "1": "flag",
+                "true": "flag"}
+# Devanagari mood tags / tip categories -> the English tags used everywhere else
+TAG_ALIASES = {
+    "भ्रमित": "confused", "उलझन": "confused", "चिंतित": "anxious", "उदासीन": "depressed", "उदास": "sad",
+    "तनावग्रस्त": "stressed", "खुश": "happy", "अकेला": "lonely", "अकेली": "lonely", "गुस्सा": "angry",
+    "डरा हुआ": "fearful", "शारीरिक": "physical", "मानसिक": "mental",
+}
+
+
+class Schema:
+    def __init__(self, columns, free, text, tag, required, kinds):
+        self.columns = tuple(columns)
+        self.free = free          # free-text column that absorbs unquoted commas
+        self.text = text          # deduplication key
+        self.tag = tag            # mood tag column
+        self.required = required
+        self.kinds = kinds        # column -> seed_bundle column kind
+
+    def fold(self, fields: list, header: list) -> list:
+        n = len(header)
+        if len(fields) < n:
+            raise ValueError(f"{len(fields)} fields, expected {n}")
+        if len(fields) > n:
+            i = header.index(self.free)
+            end = len(fields) - (n - i - 1)
+            fields = fields[:i] + [",".join(fields[i:end])] + fields[end:]
+        return fields
+
+    def validate(self, fields: list, header: list, language: str) -> dict:
+        row = {c: v.strip() for c, v in zip(header, self.fold(fields, header))}
+        for c in self.required:
+            if not row[c]:
+                raise ValueError(f"empty {c}")
+        try:
+            row["id"] = int(row["id"])
+        except ValueError:
+            raise ValueError(f"id {row['id']!r} is not an integer") from None
+        if "language" in self.columns:
+            lang = LANGUAGES.get(row["language"].lower(), row["language"]) if row["language"] else language
+            if lang != language:
+                raise ValueError(f"language {row['language']!r} in a {language} file")
+        row["language"] = language
+        if "safety_flag" in self.columns:
+            flag = SAFETY_FLAGS.get(row["safety_flag"].lower() or "safe")
+            if flag is None:
+                raise ValueError(f"safety_flag {row['safety_flag']!r} is not safe / flag")
+            row["safety_flag"] = flag
+        if "duration_min" in self.columns:
+            try:
+                row["duration_min"] = float(row["duration_min"]) if row["duration_min"] else None
+            except ValueError:
+                raise ValueError(f"duration_min {row['duration_min']!r} is not a number") from None
+        row[self.tag] = row[self.tag].lower()
+        return row
+
+    def output_columns(self) -> list:
+        return list(self.columns) + ([] if "language" in self.columns else ["language"])
+
+
+SCHEMAS = {
+    "affirmations": Schema(
+        ("id", "mood_tag", "text", "tone", "language", "safety_flag"), free="text", text="text", tag="mood_tag",
+        required=("id", "mood_tag", "text"),
+        kinds={"id": "int", "mood_tag": "dict", "text": "str", "tone": "dict", "language": "dict",
+               "safety_flag": "dict"}),
+    "health_tips": Schema(
+        ("id", "category", "title", "content", "duration_min", "language"), free="content", text="content",
+        tag="category", required=("id", "category", "title", "content"),
+        kinds={"id": "int", "category": "dict", "title": "str", "content": "str", "duration_min": "float",
+               "language": "dict"}),
+    "moods": Schema(
+        ("id", "example_text", "mood_label", "notes"), free="notes", text="example_text", tag="mood_label",
+        required=("id", "example_text", "mood_label"),
+        kinds={"id": "int", "example_text": "str", "mood_label": "dict", "notes": "str", "language": "dict"}),
+}
+
+
+def parse_source(path: str, table: str, language: str) -> (list, list):
+    """
+    (valid rows as dicts, error messages) for one CSV.
+    """
+    schema = SCHEMAS[table]
+    rows, errors = [], []
+    name = os.path.basename(path)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader, [])]
+        if sorted(header) != sorted(schema.columns):
+            return [], [f"{name}: columns {header}, expected {list(schema.columns)}"]
+        for fields in reader:
+            if not any(v.strip() for v in fields):
+                continue
+            try:
+                rows.append(schema.validate(fields, header, language))
+            except ValueError as e:
+                errors.append(f"{name}:{reader.line_num}: {e}")
+    return rows, errors
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _parsed(path, table, language, digest, cache_dir, force) -> (list, list, bool):
+    """
+    parse_source, through a per-source cache keyed on the file's hash. The bool is True if
+    the file was parsed (not cached).
+    """
+    cached = os.path.join(cache_dir, f"{table}.{language}.json")
+    if not force:
+        try:
+            with open(cached, encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry["sha256"] == digest and entry["format"] == FORMAT_VERSION:
+                return entry["rows"], entry["errors"], False
+        except (OSError, ValueError, KeyError):
+            pass
+    rows, errors = parse_source(path, table, language)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{cached}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"format": FORMAT_VERSION, "sha256": digest, "rows": rows, "errors": errors}, f,
+                      ensure_ascii=False)
+        os.replace(tmp, cached)
+    except OSError as e:
+        print(f"Could not write parse cache {cached}: {e}")
+    return rows, errors, True
+
+
+def tag_aliases(parsed: dict) -> dict:
+    """
+    TAG_ALIASES plus Hindi mood labels that differ from the English label with the same id.
+    """
+    aliases = dict(TAG_ALIASES)
+    en, hi = parsed.get(("moods", "en")), parsed.get(("moods", "hi"))
+    if en and hi:
+        english = {row["id"]: row["mood_label"] for row in en}
+        for row in hi:
+            target = english.get(row["id"])
+            if target and row["mood_label"] != target and not row["mood_label"].isascii():
+                aliases.setdefault(row["mood_label"], target)
+    return aliases
+
+
+def compile_table(table: str, sources: list, aliases: dict) -> (dict, int, list):
+    """
+    ({column: values}, duplicates dropped, unmapped non-English tags) for a table's rows.
+    """
+    schema = SCHEMAS[table]
+    columns = schema.output_columns()
+    out = {c: [] for c in columns}
+    seen, duplicates, unmapped = {}, 0, set()
+    for rows in sources:
+        for row in rows:
+            tag = aliases.get(row[schema.tag], row[schema.tag])
+            if not tag.isascii():
+                unmapped.add(tag)
+            key = (row["language"], normalize_text(row[schema.text]))
+            if key in seen:
+                duplicates += 1
+                if row.get("safety_flag") == "flag":
+                    out["safety_flag"][seen[key]] = "flag"
+                continue
+            seen[key] = len(out["id"])
+            for c in columns:
+                out[c].append(tag if c == schema.tag else row[c])
+    return out, duplicates, sorted(unmapped)
+
+
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _write_current(out: str, name: str):
+    tmp = os.path.join(out, f"{CURRENT}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(name + "\n")
+    os.replace(tmp, os.path.join(out, CURRENT))
+
+
+def _prune(out: str, keep: int = KEEP_VERSIONS):
+    versions = sorted((int(m.group(1)), m.group(0)) for m in map(re.compile(r"^v(\d+)$").match, os.listdir(out)) if m)
+    for _, name in versions[:-keep]:
+        shutil.rmtree(os.path.join(out, name), ignore_errors=True)
+
+
+def build(out: str = BUNDLE_PATH, sources=SOURCES, strict: bool = False, force: bool = False,
+          cache_dir: str = CACHE_DIR):
+    """
+    Builds (or updates) the bundle under `out`; returns the current SeedBundle.
+    """
+    import numpy as np
+    t0 = time.perf_counter()
+    previous = load_bundle(out)
+    old_tables = previous.manifest["tables"] if previous else {}
+
+    missing = [path for _, _, path in sources if not os.path.exists(path)]
+    if missing:
+        # a bundle without some languages / tables would silently change the fallbacks
+        raise FileNotFoundError(f"missing seed CSVs: {', '.join(missing)}")
+
+    parsed, digests, source_meta, errors, reparsed = {}, {}, {}, [], []
+    for table, language, path in sources:
+        digest = _sha256(path)
+        rows, errs, fresh = _parsed(path, table, language, digest, cache_dir, force)
+        parsed.setdefault((table, language), []).extend(rows)
+        digests.setdefault(table, []).append(digest)
+        errors.extend(errs)
+        if fresh:
+            reparsed.append(os.path.basename(path))
+        source_meta[os.path.relpath(path, HERE)] = {
+            "table": table, "language": language, "sha256": digest, "rows": len(rows), "rejected": len(errs),
+        }
+    for e in errors:
+        print("Rejected", e)
+    if errors and strict:
+        raise ValueError(f"{len(errors)} invalid seed rows (see above)")
+
+    aliases = tag_aliases(parsed)
+    alias_key = make_key(*sorted(f"{k}={v}" for k, v in aliases.items()))
+    inputs = {table: make_key(FORMAT_VERSION, alias_key, *d) for table, d in digests.items()}
+    unchanged = set() if force else {t for t, key in inputs.items() if old_tables.get(t, {}).get("inputs") == key}
+    if previous is not None and unchanged == set(inputs) == set(old_tables):
+        print(f"Seed bundle v{previous.version} is up to date ({1000 * (time.perf_counter() - t0):.0f} ms)")
+        return previous
+
+    version = previous.version + 1 if previous else 1
+    os.makedirs(out, exist_ok=True)
+    tmp = os.path.join(out, f".v{version}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    tables, unmapped = {}, set()
+    for table in inputs:
+        if table in unchanged:
+            tables[table] = old_tables[table]
+            for column, meta in tables[table]["columns"].items():
+                for name in column_files(table, column, meta["kind"]):
+                    _link_or_copy(os.path.join(previous.directory, name), os.path.join(tmp, name))
+            continue
+        values, duplicates, missing = compile_table(
+            table, [rows for (t, _), rows in sorted(parsed.items()) if t == table], aliases)
+        unmapped.update(missing)
+        columns = {}
+        for column, vals in values.items():
+            arrays, columns[column] = encode_column(vals, SCHEMAS[table].kinds[column])
+            for suffix, arr in arrays.items():
+                np.save(os.path.join(tmp, f"{table}.{column}{suffix}.npy"), arr)
+        tables[table] = {"rows": len(values["id"]), "duplicates": duplicates, "inputs": inputs[table],
+                         "columns": columns}
+    for tag in sorted(unmapped):
+        print(f"Unmapped mood tag {tag!r}: add it to TAG_ALIASES")
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "sources": source_meta,
+        "tag_aliases": aliases,
+        "tables": tables,
+    }
+    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.rename(tmp, os.path.join(out, f"v{version}"))
+    _write_current(out, f"v{version}")
+    _prune(out)
+
+    print(f"Wrote seed bundle v{version} to {out} in {1000 * (time.perf_counter() - t0):.0f} ms "
+          f"(parsed: {', '.join(reparsed) or 'none'}; reused tables: {', '.join(sorted(unchanged)) or 'none'})")
+    for table, meta in tables.items():
+        print(f"  {table}: {meta['rows']} rows, {meta['duplicates']} duplicates dropped")
+    return load_bundle(out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate the seed CSVs and compile them into the seed bundle.")
+    parser.add_argument("--out", default=BUNDLE_PATH)
+    parser.add_argument("--strict", action="store_true", help="fail on any invalid row instead of dropping it")
+    parser.add_argument("--force", action="store_true", help="reparse every source and rewrite every table")
+    args = parser.parse_args()
+    build(args.out, strict=args.strict, force=args.force)
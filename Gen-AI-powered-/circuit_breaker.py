@@ -0,0 +1,169 @@
+# circuit_breaker.py
+"""
+Circuit breaker for the Vertex client.
+
+States:
+  - closed:    calls go through; outcomes are recorded in a sliding time window.
+  - open:      the window's error rate or slow-call rate crossed its threshold; calls are
+               rejected immediately with CircuitOpenError (callers use the local path).
+  - half_open: after `open_s`, up to `probes` calls are let through. If all succeed
+               the breaker closes, and one failure (or slow call) re-opens it.
+
+Thread-safe. Works around async calls too: `with breaker.guard(): await ...`.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, window_s: float = 30.0, min_calls: int = 10, error_rate: float = 0.5,
+                 slow_call_s: float = 8.0, slow_rate: float = 0.8, open_s: float = 15.0, probes: int = 2,
+                 enabled: bool = True):
+        self.name = name
+        self.window_s = window_s
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_call_s = slow_call_s
+        self.slow_rate = slow_rate
+        self.open_s = open_s
+        self.probes = max(1, probes)
+        self.enabled = enabled
+        self.state = self.CLOSED
+        self._window = deque()  # (time, ok, slow)
+        self._errors = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.transitions = {}  # "closed->open" -> count
+        self.last_transition = None
+
+    # caller holds the lock for the helpers below
+    def _to(self, state, now):
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        self.last_transition = (key, now)
+        self.state = state
+        if state == self.OPEN:
+            self._opened_at = now
+        elif state == self.HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        else:
+            self._window.clear()
+            self._errors = self._slow = 0
+
+    def _trim(self, now):
+        cutoff = now - self.window_s
+        while self._window and self._window[0][0] < cutoff:
+            _, ok, slow = self._window.popleft()
+            self._errors -= not ok
+            self._slow -= slow
+
+    def allow(self) -> bool:
+        """
+        Whether a call may proceed now. In half_open this reserves a probe slot, which
+        must be released through record() or release().
+        """
+        if not self.enabled:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.open_s:
+                    self.rejected += 1
+                    return False
+                self._to(self.HALF_OPEN, now)
+            if self.state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.probes:
+                    self.rejected += 1
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def release(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record(self, ok: bool, latency: float):
+        if not self.enabled:
+            return
+        slow = latency >= self.slow_call_s
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not ok or slow:
+                    self._to(self.OPEN, now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.probes:
+                        self._to(self.CLOSED, now)
+                return
+            if self.state == self.OPEN:
+                return  # a call admitted before the trip finished late
+            self._window.append((now, ok, slow))
+            self._errors += not ok
+            self._slow += slow
+            self._trim(now)
+            n = len(self._window)
+            if n >= self.min_calls and (self._errors / n >= self.error_rate or self._slow / n >= self.slow_rate):
+                self._to(self.OPEN, now)
+
+    @contextmanager
+    def guard(self):
+        """
+        Wraps one call: raises CircuitOpenError if rejected, otherwise records the outcome
+        (an exception counts as a failure) and its latency.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is {self.state}")
+        t0 = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.record(False, time.monotonic() - t0)
+            raise
+        except BaseException:
+            # cancelled / interrupted: no verdict on the backend, just free the probe slot
+            self.release()
+            raise
+        self.record(True, time.monotonic() - t0)
+
+    def call(self, fn, *args, **kwargs):
+        with self.guard():
+            return fn(*args, **kwargs)
+
+    @property
+    def tripped(self) -> bool:
+        return self.enabled and self.state != self.CLOSED
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._trim(time.monotonic())
+            n = len(self._window)
+            return {
+                "enabled": self.enabled,
+                "state": self.state,
+                "window_calls": n,
+                "window_error_rate": round(self._errors / n, 3) if n else 0.0,
+                "window_slow_rate": round(self._slow / n, 3) if n else 0.0,
+                "rejected": self.rejected,
+                "transitions": dict(self.transitions),
+            }
@@ -0,0 +1,64 @@
+# gunicorn.conf.py
+"""
+Production server settings for serve.py:
+
+  gunicorn -c gunicorn.conf.py serve:app
+
+The app is preloaded in the master, which also warms ml_logic (CSVs, fallback index,
+safety model) before forking, so workers share those pages copy-on-write instead of each
+loading its own copy. Each worker then opens its own sqlite handle and Vertex client
+(ml_logic.after_fork); neither is fork-safe.
+
+/metrics is aggregated over all workers through files in METRICS_DIR (metrics.py), so a
+scrape that lands on any worker returns the totals.
+
+Tunables (env):
+  PORT                       listen port (8080)
+  WEB_CONCURRENCY            worker processes (CPU count)
+  GUNICORN_THREADS           threads per worker (8); requests mostly wait on Vertex
+  GUNICORN_TIMEOUT           seconds before a silent worker is restarted (120)
+  GUNICORN_GRACEFUL_TIMEOUT  seconds to finish in-flight requests on SIGTERM (8; Cloud Run allows 10)
+  METRICS_DIR                directory for the per-worker metrics files (a fresh temp dir)
+"""
+
+import gc
+import multiprocessing
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = "gthread"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "8"))
+keepalive = 5
+preload_app = True
+
+
+def on_starting(server):
+    # master, after the app is imported and before any worker exists
+    import metrics
+    import ml_logic
+    metrics.enable_multiprocess(os.getenv("METRICS_DIR") or tempfile.mkdtemp(prefix="ml_metrics_"))
+    state = ml_logic.warmup()
+    server.log.info(f"ml_logic warmed up in master: {state}")
+    # keep the warmed objects out of GC passes so refcount/GC writes in workers do
+    # not un-share their pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import metrics
+    import ml_logic
+    metrics.start_worker()
+    ml_logic.after_fork()
+    server.log.info(f"worker {worker.pid} ready: {ml_logic.readiness()}")
+
+
+def worker_exit(server, worker):
+    import metrics
+    import ml_logic
+    ml_logic.shutdown()
+    metrics.flush()  # its final counts stay in the totals
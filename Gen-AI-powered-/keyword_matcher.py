@@ -0,0 +1,157 @@
+# keyword_matcher.py
+"""
+Single crisis / mood keyword engine shared by safety.py and ml_logic.py.
+
+All phrase lists (English, Hindi, Hinglish) are compiled into one trie-shaped regex whose
+terminal named groups identify the category, so a single pass over the text reports every
+category it mentions.
+
+Phrase syntax:
+  - plain text is matched literally, case-insensitively, as whole words
+  - spaces match any run of whitespace
+  - a trailing "*" matches any word ending ("suicid*" -> suicide, suicidal, ...)
+
+Word boundaries include Devanagari letters and vowel signs, which Python's \\w does
+not fully cover, so Hindi phrases do not match inside longer words.
+"""
+
+import re
+
+# word characters: \w plus the whole Devanagari block (matras / virama are not \w)
+_WORD = r"[\w\u0900-\u097F]"
+_BEFORE = rf"(?<!{_WORD})"
+_AFTER = rf"(?!{_WORD})"
+
+# category -> phrases; "urgent" comes first so it wins ties at the same position
+CATEGORY_PHRASES = {
+    "urgent": [
+        # English
+        "kill myself", "kill me", "want to die", "end my life", "ending my life", "suicid*", "hurt myself",
+        # Hindi
+        "आत्महत्या", "खुदकुशी", "मरना चाहत*", "मर जाना चाहत*", "जीना नहीं चाहत*", "खुद को नुकसान", "अपनी जान ले*",
+        # Hinglish
+        "khudkushi", "aatmahatya", "atmahatya", "marna chahta", "marna chahti", "mar jana chahta",
+        "mar jana chahti", "mar jaana chahta", "mar jaana chahti", "jeena nahi chahta", "jeena nahi chahti",
+        "jina nahi chahta", "jina nahi chahti", "apni jaan le*",
+    ],
+    "anxious": [
+        "stress*", "anxi*", "panic*", "overwhelm*",
+        "चिंता", "चिंतित", "तनाव", "घबराहट", "घबरा*", "बेचैन*",
+        "tension", "chinta", "ghabrahat", "ghabra*", "pareshan*", "bechain*",
+    ],
+    "sad": [
+        "sad", "sadness", "depress*", "lonel*", "gloom*",
+        "उदास*", "दुखी", "दुख", "अकेला", "अकेली", "अकेलापन", "निराश*",
+        "udaas*", "udas", "dukhi", "dukh", "akela", "akeli", "akelapan", "nirash*",
+    ],
+    "happy": [
+        "happy", "happi*", "excit*", "glad", "joy*",
+        "खुश*", "प्रसन्न", "आनंद*",
+        "khush*", "maza aa*", "mazaa aa*",
+    ],
+    "angry": [
+        "angry", "anger", "mad", "furious",
+        "गुस्सा", "गुस्से", "क्रोध*", "नाराज़*", "नाराज*",
+        "gussa", "gusse", "naraz*", "naaraz*",
+    ],
+    "fearful": [
+        "fear*", "scared", "terrified",
+        "डर*", "भय*",
+        "darr*", "dar lag*", "darta", "darti",
+    ],
+}
+
+
+def _phrase_atoms(phrase: str):
+    """
+    Lowercased phrase as trie atoms: characters, " " (whitespace run), "*" (word ending).
+    """
+    prefix = phrase.endswith("*")
+    atoms = []
+    for i, word in enumerate(phrase.rstrip("*").lower().split()):
+        if i:
+            atoms.append(" ")
+        atoms.extend(word)
+    if prefix:
+        atoms.append("*")
+    return atoms
+
+
+def compile_trie(category_phrases: dict) -> str:
+    """
+    Regex for all phrases, factored as a character trie so shared prefixes are matched
+    once (in effect an Aho-Corasick trie run by the regex engine). Each phrase ends in an
+    empty named group "<category>__<n>"; match.lastgroup therefore names the category.
+    """
+    trie = {}
+    for cat, phrases in category_phrases.items():
+        for phrase in phrases:
+            node = trie
+            for atom in _phrase_atoms(phrase):
+                node = node.setdefault(atom, {})
+            node.setdefault(None, cat)  # first category listed wins for duplicate phrases
+
+    counter = [0]
+
+    def emit(node):
+        alts = []
+        for atom, child in node.items():
+            if atom is None:
+                continue
+            head = f"{_WORD}*" if atom == "*" else r"\s+" if atom == " " else re.escape(atom)
+            alts.append(head + emit(child))
+        if None in node:
+            # shortest alternative last, so longer phrases are tried first
+            alts.append(f"(?P<{node[None]}__{counter[0]}>)")
+            counter[0] += 1
+        return alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+
+    return emit(trie)
+
+
+class KeywordMatcher:
+    def __init__(self, category_phrases: dict):
+        self.categories = list(category_phrases)
+        # one pattern for every category; boundary guards wrap the whole trie so they
+        # are evaluated once per position. Texts are lowercased before matching, which
+        # is much faster than re.IGNORECASE.
+        self.regex = re.compile(_BEFORE + compile_trie(category_phrases) + _AFTER)
+        self._group_category = {name: name.split("__", 1)[0] for name in self.regex.groupindex}
+        # per-category patterns for "is this one category present?" checks
+        self._single = {cat: re.compile(_BEFORE + compile_trie({cat: phrases}) + _AFTER)
+                        for cat, phrases in category_phrases.items()}
+
+    def pattern_for(self, category: str):
+        """
+        Compiled pattern for one category; expects lowercased text.
+        """
+        return self._single[category]
+
+    def has(self, text: str, category: str) -> bool:
+        if not text:
+            return False
+        return self._single[category].search(text.lower()) is not None
+
+    def match(self, text: str) -> set:
+        """
+        Every category mentioned in `text`, in one pass.
+        """
+        if not text:
+            return set()
+        groups = self._group_category
+        return {groups[m.lastgroup] for m in self.regex.finditer(text.lower())}
+
+    def match_many(self, texts) -> list:
+        finditer, groups = self.regex.finditer, self._group_category
+        return [{groups[m.lastgroup] for m in finditer(t.lower())} if t else set() for t in texts]
+
+
+DEFAULT_MATCHER = KeywordMatcher(CATEGORY_PHRASES)
+
+
+def match_categories(text: str) -> set:
+    return DEFAULT_MATCHER.match(text)
+
+
+def is_urgent(text: str) -> bool:
+    return DEFAULT_MATCHER.has(text, "urgent")
@@ -0,0 +1,360 @@
+# metrics.py
+"""
+Dependency-free Prometheus metrics for ml_logic / serve.py.
+
+  - Counter, Histogram: labelled, thread-safe, a few microseconds per update.
+  - Callback metrics: read at scrape time (cache sizes, circuit breaker state), so the
+    hot path pays nothing for them.
+  - stage(name): times one pipeline stage into ml_stage_seconds{stage=...} and, inside
+    collect_timings(), into a per-request dict (the opt-in `timings` response field).
+    Uses contextvars, so it works per thread and per asyncio task.
+
+render() returns the Prometheus text exposition format (served at /metrics).
+
+Multi-process servers (gunicorn workers) each have their own registry, so a scrape would
+see one random worker. With enable_multiprocess(dir) (gunicorn.conf.py does this) every
+worker writes its counters / histograms to dir/<pid>-<start ns>.json every METRICS_FLUSH_S
+seconds, and render() in any worker sums the files of all workers, dead ones included, so
+counters never go backwards (the start time keeps a new worker that reuses a dead one's
+pid from overwriting its file). Callback metrics are per process state and get a `pid`
+label, live workers only.
+"""
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+METRICS_FLUSH_S = float(os.getenv("METRICS_FLUSH_S", "1"))
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    parts = []
+    for k, v in zip(names, values):
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _num(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, "") for n in self.labelnames), 0)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+    @staticmethod
+    def merge(snapshots) -> dict:
+        total = {}
+        for items in snapshots:
+            for key, v in items:
+                total[tuple(key)] = total.get(tuple(key), 0) + v
+        return total
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self, values: dict = None):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        for key, v in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_num(v)}"
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(k), list(v)] for k, v in self._series.items()]
+
+    @staticmethod
+    def merge(snapshots) -> dict:
+        total = {}
+        for items in snapshots:
+            for key, series in items:
+                acc = total.get(tuple(key))
+                total[tuple(key)] = list(series) if acc is None else [a + b for a, b in zip(acc, series)]
+        return total
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self, series_by_key: dict = None):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        if series_by_key is None:
+            with self._lock:
+                series_by_key = {k: list(v) for k, v in self._series.items()}
+        items = sorted(series_by_key.items())
+        names = self.labelnames + ("le",)
+        for key, series in items:
+            cumulative = 0
+            for le, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(names, key + (_num(le),))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_num(series[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class CallbackGauge:
+    """
+    Metric whose samples come from fn() -> iterable of (labels dict, value) at scrape time.
+    `kind` is "counter" for cumulative values kept elsewhere (e.g. cache hit counts).
+    """
+
+    def __init__(self, name, help, fn, kind="gauge"):
+        self.name, self.help, self.fn, self.kind = name, help, fn, kind
+
+    def samples(self) -> list:
+        try:
+            return [[dict(labels), v] for labels, v in self.fn()]
+        except Exception:
+            return []
+
+    def render(self, samples: list = None):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        if samples is None:
+            samples = self.samples()
+        for labels, v in samples:
+            yield f"{self.name}{_labels(tuple(labels), tuple(labels.values()))} {_num(v)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge_callback(self, name, help, fn, kind="gauge"):
+        return self.register(CallbackGauge(name, help, fn, kind))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """
+        JSON-able state of this process: {name: samples} (see the metrics' snapshot()).
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        return {m.name: m.samples() if isinstance(m, CallbackGauge) else m.snapshot() for m in metrics}
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        for m in metrics:
+            if not isinstance(m, CallbackGauge):
+                m.reset()
+
+    def render_merged(self, snapshots: dict) -> str:
+        """
+        Exposition of {(pid, start ns): snapshot, ...}: counters / histograms summed over
+        every snapshot, callback metrics per live pid (its latest start only).
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        latest = {}
+        for pid, start in snapshots:
+            latest[pid] = max(start, latest.get(pid, start))
+        live = sorted((pid, start) for pid, start in latest.items() if _alive(pid))
+        lines = []
+        for m in metrics:
+            if isinstance(m, CallbackGauge):
+                samples = [[dict(labels, pid=str(pid)), v] for pid, start in live
+                           for labels, v in snapshots[(pid, start)].get(m.name, [])]
+                lines.extend(m.render(samples))
+            else:
+                lines.extend(m.render(m.merge(snap.get(m.name, []) for snap in snapshots.values())))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.histogram("ml_stage_seconds", "Time spent per analyze pipeline stage", ("stage",))
+
+_timings = contextvars.ContextVar("ml_timings", default=None)
+
+
+def record_stage(name: str, elapsed: float):
+    STAGE_SECONDS.observe(elapsed, stage=name)
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collects stage durations of the code run inside, as {stage: milliseconds} in the
+    yielded dict (filled in when the block exits).
+    """
+    timings = {}
+    token = _timings.set(timings)
+    t0 = time.perf_counter()
+    result = {}
+    try:
+        yield result
+    finally:
+        _timings.reset(token)
+        result.update({k: round(1000 * v, 3) for k, v in timings.items()})
+        result["total"] = round(1000 * (time.perf_counter() - t0), 3)
+
+
+# -------------------- Multi-process --------------------
+_multiprocess_dir = None
+_flusher = None
+_process = None  # (pid, start ns) naming this process's file
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # exists, not ours to signal
+    return True
+
+
+def enable_multiprocess(directory: str):
+    """
+    In the server master, before forking: workers share `directory` (emptied here).
+    """
+    global _multiprocess_dir
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            os.remove(os.path.join(directory, name))
+    _multiprocess_dir = directory
+
+
+def _file_name() -> str:
+    # re-derived after a fork, so a worker never writes under its parent's name
+    global _process
+    if _process is None or _process[0] != os.getpid():
+        _process = (os.getpid(), time.time_ns())
+    return f"{_process[0]}-{_process[1]}.json"
+
+
+def flush():
+    if _multiprocess_dir is None:
+        return
+    path = os.path.join(_multiprocess_dir, _file_name())
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(REGISTRY.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_S)
+        try:
+            flush()
+        except Exception:
+            pass
+
+
+def start_worker():
+    """
+    In each worker after fork: drop the values inherited from the master (they would be
+    counted once per worker) and start writing this worker's file.
+    """
+    global _flusher
+    if _multiprocess_dir is None:
+        return
+    REGISTRY.reset()
+    flush()
+    _flusher = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+    _flusher.start()
+
+
+def _read_snapshots() -> dict:
+    snapshots = {}
+    for name in os.listdir(_multiprocess_dir):
+        if not name.endswith(".json"):
+            continue
+        try:
+            pid, _, start = name[:-5].partition("-")
+            with open(os.path.join(_multiprocess_dir, name), encoding="utf-8") as f:
+                snapshots[(int(pid), int(start))] = json.load(f)
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def render() -> str:
+    if _multiprocess_dir is None:
+        return REGISTRY.render()
+    flush()  # this worker's own numbers are always current
+    return REGISTRY.render_merged(_read_snapshots())
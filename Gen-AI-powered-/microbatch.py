@@ -0,0 +1,112 @@
+# microbatch.py
+"""
+Micro-batching: callers submit single items from many threads; one background thread
+groups them and calls fn(items) -> results once per group.
+
+A group is everything queued when the worker picks up work (at most `max_batch` items).
+Under load, requests that arrive while a batch is running form the next one, so batches
+grow with concurrency. The group is topped up for at most `max_wait` seconds only when
+there is concurrency to wait for (more than one item queued, or the previous batch had
+more than one), so a lone request at low load is not delayed.
+
+The worker thread starts on first submit (so a preloading server can fork safely) and
+stops on close().
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    def __init__(self, fn, max_batch: int = 64, max_wait: float = 0.002, name: str = "microbatch"):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self.name = name
+        self._pending = deque()  # (item, Future)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+        self._last = 0
+
+    def submit(self, item) -> Future:
+        fut = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._pending.append((item, fut))
+            # wake the worker when work appears or a batch fills up, not on every item
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._cond.notify()
+        return fut
+
+    def __call__(self, item, timeout: float = None):
+        return self.submit(item).result(timeout)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            deadline = time.monotonic() + self.max_wait
+            concurrent = len(self._pending) > 1 or self._last > 1
+            while concurrent and len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            n = self._last = min(len(self._pending), self.max_batch)
+            return [self._pending.popleft() for _ in range(n)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+            else:
+                for (_, fut), result in zip(batch, results):
+                    fut.set_result(result)
+            self.batches += 1
+            self.items += len(batch)
+            self.largest = max(self.largest, len(batch))
+
+    def close(self, timeout: float = None):
+        """
+        Stops accepting items; queued items are still processed.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": 1000 * self.max_wait,
+            "queued": len(self._pending),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest,
+        }
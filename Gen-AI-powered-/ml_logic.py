@@ -7,74 +7,434 @@ Requirements:
 
 Behavior:
   - Uses Vertex AI GenerativeModel (Gemini) to classify mood and generate affirmations.
-  - Uses local CSVs (moods.csv, affirmations.csv) only as fallback / enrichment.
+  - Uses local CSVs (moods.csv, affirmations.csv) only as fallback / enrichment; when a
+    seed bundle has been built (build_seed_bundle.py, seed_bundle.py) it is read instead.
   - By default WILL FAIL if Vertex cannot be reached (no silent mock).
   - Optional fallback behavior can be enabled by setting ALLOW_FALLBACK=true in .env (for dev).
+  - A circuit breaker (circuit_breaker.py) stops calling Vertex while it is failing or slow;
+    meanwhile requests use the local keyword + CSV path (VERTEX_BREAKER_FALLBACK=true).
+  - Concurrent identical requests (same normalized text, and mood) share one model call
+    (singleflight.py, SINGLEFLIGHT=true); the urgent screens run first and are never shared.
+  - serve.py / serve_asgi.py run the safety model on micro-batches of concurrent requests
+    (submit_safety, microbatch.py) instead of one predict_proba call per request.
+  - A local char n-gram mood classifier (mood_model.py) answers texts it is confident
+    about; only the rest go to Vertex (LOCAL_MOOD=true, MOOD_CONFIDENCE_THRESHOLD).
+  - Prompts come from versioned templates (prompts.py): static prefixes, user text truncated
+    to a token budget, and a max_output_tokens cap per task.
+  - Per-stage timers and counters (metrics.py) are exported by serve.py at /metrics.
+  - Heavy resources (seed data, the safety model, the Vertex SDK) load lazily on first
+    use; call warmup() to load them up front (e.g. before a server starts taking traffic).
 """
 
 import os
+import re
 import sys
 import json
+import itertools
 import random
 import logging
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
-import pandas as pd
-from safety import detect_urgent, load_safety_model, predict_safety, MODEL_PATH
 
-
-# Vertex imports
-try:
-    import vertexai
-    from vertexai.generative_models import GenerativeModel
-except Exception as e:
-    vertexai = None
-    GenerativeModel = None
-
-# Load .env if present
+# Load .env if present; before the local imports below, which read their settings
+# (SAFETY_FLAG_THRESHOLD, PROMPT_INPUT_MAX_TOKENS, MOOD_CONFIDENCE_THRESHOLD, ...) at import
 load_dotenv()
 
-safety_model = load_safety_model()
-
+from safety import (compact_dir, detect_urgent, flag_threshold, load_safety_model, predict_safety, predict_safety_many,
+                    reload_flag_threshold, MODEL_PATH)
+from response_cache import build_cache, make_key, normalize_text
+from keyword_matcher import match_categories
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from metrics import REGISTRY, TOKEN_BUCKETS, record_stage, stage
+from singleflight import AsyncSingleFlight, SingleFlight
+from microbatch import MicroBatcher
+from prompts import AFFIRMATION, CLASSIFY, COMBINED, MOOD_BUCKETS, PROMPT_VERSION
+from mood_model import CONFIDENCE_THRESHOLD as MOOD_CONFIDENCE_THRESHOLD, load_mood_model, predict_mood
+from seed_bundle import BUNDLE_PATH as SEED_BUNDLE_PATH, load_bundle
 
 # Config from env
 PROJECT_ID = os.getenv("GCP_PROJECT") or os.getenv("GOOGLE_CLOUD_PROJECT")
 LOCATION = os.getenv("GCP_LOCATION", "asia-south1")
 VERTEX_MODEL_ID = os.getenv("VERTEX_MODEL_ID", "gemini-2.5-flash")
 ALLOW_FALLBACK = os.getenv("ALLOW_FALLBACK", "false").lower() == "true"
+# one generation returning {mood_bucket, affirmation} instead of two serial calls
+VERTEX_COMBINED = os.getenv("VERTEX_COMBINED", "false").lower() == "true"
+# response cache (model answers keyed on normalized text + model + prompts.PROMPT_VERSION)
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "true").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "4096"))
+RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", "86400"))
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")  # e.g. /tmp/ml_cache.sqlite3 to survive restarts
+# share one in-flight model call between concurrent requests with the same cache key
+SINGLEFLIGHT = os.getenv("SINGLEFLIGHT", "true").lower() == "true"
+# near-duplicate mood cache on the safety model's TF-IDF features
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "20000"))
+# parsed CSVs are pickled here, keyed by source mtime/size ("" disables)
+DATA_CACHE_DIR = os.getenv("DATA_CACHE_DIR", ".data_cache")
+# first-tier local mood classifier (mood_model.joblib from train_mood_model.py)
+LOCAL_MOOD = os.getenv("LOCAL_MOOD", "true").lower() == "true"
+# seconds between checks of the safety model file for a newer checkpoint (0 disables hot-swap)
+SAFETY_MODEL_RELOAD_S = float(os.getenv("SAFETY_MODEL_RELOAD_S", "30"))
 
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ml_logic")
 
+# -------------------- Lazy resources --------------------
+class _Lazy:
+    """
+    Thread-safe lazily initialized value: the loader runs once, on first get().
+    """
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._loader()
+                    self._loaded = True
+        return self._value
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+            self._loaded = True
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._loaded = False
+
 # -------------------- Data loading --------------------
 def load_csv_safe(path):
     if not os.path.exists(path):
         logger.warning(f"Data file not found: {path}")
         return None
-    return pd.read_csv(path, engine="python")
+    import pandas as pd
+    st = os.stat(path)
+    cached = None
+    if DATA_CACHE_DIR:
+        name = f"{os.path.basename(path)}.{st.st_mtime_ns}.{st.st_size}.pkl"
+        cached = os.path.join(os.path.dirname(os.path.abspath(path)), DATA_CACHE_DIR, name)
+        if os.path.exists(cached):
+            try:
+                return pd.read_pickle(cached)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable data cache {cached}: {e}")
+    # C parser; the python engine is several times slower
+    df = pd.read_csv(path)
+    if cached:
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            tmp = f"{cached}.{os.getpid()}.tmp"
+            df.to_pickle(tmp)
+            os.replace(tmp, cached)
+        except OSError as e:
+            logger.warning(f"Could not write data cache {cached}: {e}")
+    return df
 
-moods_df = load_csv_safe("moods.csv")    # expects columns: mood_label, ...
-affirmations_df = load_csv_safe("affirmations.csv")  # expects columns: mood_tag, text, safety_flag (optional)
+def _load_seed_bundle():
+    try:
+        bundle = load_bundle()
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable seed bundle {SEED_BUNDLE_PATH}: {e}")
+        return None
+    if bundle is not None:
+        logger.info(f"Loaded seed bundle v{bundle.version} from {bundle.directory}")
+    return bundle
+
+def _load_frames():
+    bundle = get_seed_bundle()
+    if bundle is not None:
+        # English rows, same columns as the CSVs (language is "en")
+        moods_df = bundle.frame("moods", language="en")
+        affirmations_df = bundle.frame("affirmations", language="en")
+    else:
+        moods_df = load_csv_safe("moods.csv")    # expects columns: mood_label, ...
+        affirmations_df = load_csv_safe("affirmations.csv")  # expects columns: mood_tag, text, safety_flag (optional)
+
+    # minimal check
+    if moods_df is None or affirmations_df is None:
+        logger.warning("One or more CSV data files missing. Affirmation fallback may be limited.")
 
-# minimal check
-if moods_df is None or affirmations_df is None:
-    logger.warning("One or more CSV data files missing. Affirmation fallback may be limited.")
+    # normalize/merge if possible
+    if moods_df is not None and affirmations_df is not None \
+            and "mood_label" in moods_df.columns and "mood_tag" in affirmations_df.columns:
+        # create a combined df for fallback lookup
+        import pandas as pd
+        try:
+            full_df = pd.merge(moods_df, affirmations_df, left_on="mood_label", right_on="mood_tag", how="inner")
+        except Exception:
+            full_df = affirmations_df.copy()
+    else:
+        full_df = affirmations_df.copy() if affirmations_df is not None else None
+    return {"moods_df": moods_df, "affirmations_df": affirmations_df, "full_df": full_df}
+
+def _load_affirmation_index():
+    # mood_tag -> (text, safety_flag) index used by the fallback path
+    from affirmation_index import AffirmationIndex
+    bundle = get_seed_bundle()
+    if bundle is not None:
+        # the moods / affirmations inner join of _load_frames, without pandas
+        tags = {tag for tag, in bundle.rows("moods", ("mood_label",), language="en")}
+        rows = bundle.rows("affirmations", ("mood_tag", "text", "safety_flag"), language="en")
+        return AffirmationIndex.from_records(row for row in rows if row[0] in tags)
+    full_df = get_full_df()
+    return AffirmationIndex.from_dataframe(full_df) if full_df is not None else None
 
-# normalize/merge if possible
-if moods_df is not None and "mood_label" in moods_df.columns and "mood_tag" in affirmations_df.columns:
-    # create a combined df for fallback lookup
+def _safety_model_signature():
+    # a compact model is switched by replacing CURRENT; the live version's config.json marks it
+    path = os.path.join(compact_dir(MODEL_PATH), "config.json") if os.path.isdir(MODEL_PATH) else MODEL_PATH
     try:
-        full_df = pd.merge(moods_df, affirmations_df, left_on="mood_label", right_on="mood_tag", how="inner")
-    except Exception:
-        full_df = affirmations_df.copy()
-else:
-    full_df = affirmations_df.copy() if affirmations_df is not None else None
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (path, st.st_mtime_ns, st.st_size)
+
+_safety_model_sig = None
+_safety_model_checked = 0.0
+_safety_reload_lock = threading.Lock()
+
+def _load_safety_model():
+    global _safety_model_sig
+    sig = _safety_model_signature()
+    model = load_safety_model()
+    if model is not None:
+        _safety_model_sig = sig
+    return model
+
+_seed_bundle = _Lazy(_load_seed_bundle)
+_frames = _Lazy(_load_frames)
+_safety_model = _Lazy(_load_safety_model)
+_affirmation_index = _Lazy(_load_affirmation_index)
+_mood_model = _Lazy(lambda: load_mood_model() if LOCAL_MOOD else None)
+
+def get_seed_bundle():
+    return _seed_bundle.get()
+
+def get_full_df():
+    return _frames.get()["full_df"]
+
+def _warm_frames():
+    # with a seed bundle nothing needs the DataFrames up front
+    if get_seed_bundle() is None:
+        get_full_df()
+
+def _seed_data_loaded() -> bool:
+    if _seed_bundle.loaded and _seed_bundle.get() is not None:
+        return True
+    return _frames.loaded and _frames.get()["full_df"] is not None
+
+def _maybe_reload_safety_model():
+    """
+    Hot-swap: if the model file changed since it was loaded (e.g. a new checkpoint from
+    `train_safety_model.py incremental`), load it and replace the current model. One
+    thread does the check / load while the others keep using the old model.
+    """
+    global _safety_model_sig, _safety_model_checked
+    now = time.monotonic()
+    if now - _safety_model_checked < SAFETY_MODEL_RELOAD_S or not _safety_reload_lock.acquire(blocking=False):
+        return
+    try:
+        _safety_model_checked = now
+        sig = _safety_model_signature()
+        if sig == _safety_model_sig:
+            return
+        # the signature is recorded only once the model is in use, so a failed load
+        # (e.g. a half-written file) is retried on the next check
+        try:
+            model = load_safety_model()
+        except Exception as e:
+            logger.warning(f"Keeping current safety model, reload of {MODEL_PATH} failed: {e}")
+            return
+        if model is None:
+            # deleted, or caught between the renames of an export: never drop the screen
+            logger.warning(f"Keeping current safety model, {MODEL_PATH} is missing")
+            return
+        _safety_model.set(model)
+        _safety_model_sig = sig
+        # the flag threshold is tuned per model (the sweep report next to it)
+        threshold = reload_flag_threshold()
+        # near-duplicate vectors depend on the model's vectorizer
+        _semantic_cache.reset()
+        logger.info(f"Reloaded safety model from {MODEL_PATH} (flag threshold {threshold})")
+    finally:
+        _safety_reload_lock.release()
+
+def get_safety_model():
+    if SAFETY_MODEL_RELOAD_S > 0 and _safety_model.loaded:
+        _maybe_reload_safety_model()
+    return _safety_model.get()
+
+def get_affirmation_index():
+    return _affirmation_index.get()
+
+def get_mood_model():
+    return _mood_model.get()
+
+def __getattr__(name):
+    # keep `ml_logic.safety_model`, `ml_logic.full_df`, ... working without eager loading
+    if name in ("moods_df", "affirmations_df", "full_df"):
+        return _frames.get()[name]
+    if name == "safety_model":
+        return get_safety_model()
+    if name == "affirmation_index":
+        return get_affirmation_index()
+    if name == "semantic_cache":
+        return get_semantic_cache()
+    raise AttributeError(f"module 'ml_logic' has no attribute '{name}'")
 
 # -------------------- Vertex init --------------------
 _model = None
+
+# Circuit breaker around every model call: when Vertex errors or is slow across the
+# window, calls skip the network and (with VERTEX_BREAKER_FALLBACK) use the local path.
+VERTEX_BREAKER = os.getenv("VERTEX_BREAKER", "true").lower() == "true"
+VERTEX_BREAKER_FALLBACK = os.getenv("VERTEX_BREAKER_FALLBACK", "true").lower() == "true"
+vertex_breaker = CircuitBreaker(
+    "vertex",
+    window_s=float(os.getenv("VERTEX_BREAKER_WINDOW_S", "30")),
+    min_calls=int(os.getenv("VERTEX_BREAKER_MIN_CALLS", "10")),
+    error_rate=float(os.getenv("VERTEX_BREAKER_ERROR_RATE", "0.5")),
+    slow_call_s=float(os.getenv("VERTEX_BREAKER_SLOW_CALL_S", "8")),
+    slow_rate=float(os.getenv("VERTEX_BREAKER_SLOW_RATE", "0.8")),
+    open_s=float(os.getenv("VERTEX_BREAKER_OPEN_S", "15")),
+    probes=int(os.getenv("VERTEX_BREAKER_PROBES", "2")),
+    enabled=VERTEX_BREAKER,
+)
+
+# -------------------- Metrics --------------------
+VERTEX_CALLS = REGISTRY.counter("ml_vertex_calls_total", "Vertex calls by task and outcome (ok, error, rejected, cancelled)",
+                                ("task", "outcome"))
+VERTEX_TOKENS = REGISTRY.histogram("ml_vertex_tokens", "Tokens per Vertex call (usage_metadata)",
+                                   ("task", "kind"), buckets=TOKEN_BUCKETS)
+PROMPTS_TRUNCATED = REGISTRY.counter("ml_prompts_truncated_total", "Prompts whose user text was cut to the token budget",
+                                     ("task",))
+FALLBACKS = REGISTRY.counter("ml_fallbacks_total", "Answers from the local keyword / CSV path", ("kind",))
+LOCAL_MOODS = REGISTRY.counter("ml_local_mood_total", "Local mood classifier outcomes (answered, escalated)",
+                               ("result",))
+URGENT_HITS = REGISTRY.counter("ml_urgent_total", "Check-ins classified Urgent, by what caught them", ("source",))
+
+def _breaker_samples():
+    for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN):
+        yield {"state": state}, int(vertex_breaker.state == state)
+
+def _cache_samples(field):
+    stats = cache_stats()
+    for name in ("response_cache", "semantic_cache"):
+        if stats[name] is not None:
+            yield {"cache": name}, stats[name][field]
+
+REGISTRY.gauge_callback("ml_vertex_breaker_state", "1 for the Vertex circuit breaker's current state", _breaker_samples)
+REGISTRY.gauge_callback("ml_vertex_breaker_rejected_total", "Calls rejected by the open breaker",
+                        lambda: [({}, vertex_breaker.rejected)], kind="counter")
+REGISTRY.gauge_callback("ml_cache_hits_total", "Response / semantic cache hits", lambda: _cache_samples("hits"), kind="counter")
+REGISTRY.gauge_callback("ml_cache_misses_total", "Response / semantic cache misses", lambda: _cache_samples("misses"), kind="counter")
+REGISTRY.gauge_callback("ml_cache_entries", "Entries in the response / semantic cache", lambda: _cache_samples("size"))
+
+def _observe_tokens(task, resp):
+    usage = getattr(resp, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attr in (("input", "prompt_token_count"), ("output", "candidates_token_count"),
+                       ("cached", "cached_content_token_count")):
+        count = getattr(usage, attr, None)
+        if count:
+            VERTEX_TOKENS.observe(count, task=task, kind=kind)
+
+@contextmanager
+def _vertex_call(task):
+    """
+    Wraps one model call: breaker guard, ml_stage_seconds{stage="vertex_<task>"} timer and
+    the ml_vertex_calls_total counter. Raises CircuitOpenError when tripped.
+    """
+    outcome = "error"
+    try:
+        with vertex_breaker.guard(), stage("vertex_" + task):
+            yield
+        outcome = "ok"
+    except CircuitOpenError:
+        outcome = "rejected"
+        raise
+    except BaseException as e:
+        if not isinstance(e, Exception):
+            outcome = "cancelled"  # GeneratorExit / KeyboardInterrupt / asyncio cancellation
+        raise
+    finally:
+        VERTEX_CALLS.inc(task=task, outcome=outcome)
+
+class _StreamCall:
+    """
+    _vertex_call for a streamed response, which is consumed between yields to the client:
+    the breaker latency and the vertex_<task> stage count only the time spent inside
+    model() blocks, not the time the client takes between chunks.
+    """
+    def __init__(self, task):
+        self.task = task
+        self.model_s = 0.0
+        self.outcome = None
+
+    def start(self):
+        if not vertex_breaker.allow():
+            self.finish("rejected")
+            raise CircuitOpenError(f"{vertex_breaker.name} circuit is {vertex_breaker.state}")
+
+    @contextmanager
+    def model(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.model_s += time.perf_counter() - t0
+
+    def finish(self, outcome):
+        if self.outcome is not None:
+            return
+        self.outcome = outcome
+        if outcome in ("ok", "error"):
+            vertex_breaker.record(outcome == "ok", self.model_s)
+        elif outcome == "cancelled":
+            vertex_breaker.release()
+        if outcome != "rejected":
+            record_stage("vertex_" + self.task, self.model_s)
+        VERTEX_CALLS.inc(task=self.task, outcome=outcome)
+
+def _vertex_generate(task, prompt, **kwargs):
+    """
+    The one place synchronous model calls happen; raises CircuitOpenError when tripped.
+    """
+    with _vertex_call(task):
+        resp = _model.generate_content(prompt, **kwargs)
+    _observe_tokens(task, resp)
+    return resp
+
+async def _vertex_generate_async(gen, task, prompt, **kwargs):
+    with _vertex_call(task):
+        resp = await gen.generate(prompt, **kwargs)
+    _observe_tokens(task, resp)
+    return resp
+
+def _can_fallback() -> bool:
+    # the local keyword / CSV path: always in dev, and while Vertex is tripped
+    return ALLOW_FALLBACK or (VERTEX_BREAKER_FALLBACK and vertex_breaker.tripped)
 def init_vertex():
     global _model
-    if vertexai is None or GenerativeModel is None:
+    # imported here: the Vertex SDK is the slowest import by far
+    try:
+        import vertexai
+        from vertexai.generative_models import GenerativeModel
+    except Exception:
         raise RuntimeError("vertexai SDK not installed. Install `vertexai` and `google-cloud-aiplatform`.")
     if not PROJECT_ID:
         raise RuntimeError("GCP_PROJECT / GOOGLE_CLOUD_PROJECT env var not set.")
@@ -83,106 +443,381 @@ def init_vertex():
     _model = GenerativeModel(VERTEX_MODEL_ID)
     logger.info(f"Vertex initialized (project={PROJECT_ID}, location={LOCATION}, model={VERTEX_MODEL_ID})")
 
+def warmup(vertex: bool = False) -> dict:
+    """
+    Load the seed data, the fallback index, the safety model (and optionally Vertex) now rather
+    than on the first request. Returns readiness(); never raises.
+    """
+    for name, load in (("seed bundle", get_seed_bundle), ("csv data", _warm_frames),
+                       ("affirmation index", get_affirmation_index),
+                       ("safety model", get_safety_model), ("mood model", get_mood_model),
+                       ("semantic cache", get_semantic_cache)):
+        try:
+            load()
+        except Exception as e:
+            logger.error(f"Warmup failed to load {name}: {e}")
+    if vertex and _model is None:
+        try:
+            init_vertex()
+        except Exception as e:
+            logger.error(f"Warmup failed to init Vertex: {e}")
+    return readiness()
+
+def readiness() -> dict:
+    """
+    Which resources are loaded, without triggering any loading.
+    """
+    return {
+        "seed_bundle_loaded": _seed_bundle.loaded and _seed_bundle.get() is not None,
+        "csv_loaded": _frames.loaded and _frames.get()["full_df"] is not None,
+        "affirmation_index_loaded": _affirmation_index.loaded and _affirmation_index.get() is not None,
+        "safety_model_loaded": _safety_model.loaded and _safety_model.get() is not None,
+        "mood_model_loaded": _mood_model.loaded and _mood_model.get() is not None,
+        "vertex_initialized": _model is not None,
+        "ready": _ready(),
+    }
+
+def _ready() -> bool:
+    # seed data loaded, the safety model loaded if one is deployed, and a way to answer
+    data_ok = _seed_data_loaded()
+    safety_ok = (_safety_model.loaded and _safety_model.get() is not None) or not os.path.exists(MODEL_PATH)
+    return data_ok and safety_ok and (_model is not None or ALLOW_FALLBACK)
+
+def after_fork():
+    """
+    Per-process setup for pre-fork servers (gunicorn.conf.py post_fork): the parent's
+    sqlite handle and Vertex/gRPC client must not be shared, so reopen / re-init them here.
+    Never raises; a failed Vertex init is logged and leaves the worker on the fallback path.
+    """
+    global _model, _async_gen
+    if response_cache is not None and response_cache.store is not None:
+        response_cache.store.reopen()
+    _model = None
+    _async_gen = None
+    _safety_batcher.reset()  # its worker thread did not survive the fork
+    try:
+        init_vertex()
+    except Exception as e:
+        logger.error(f"Vertex init failed in worker {os.getpid()}: {e}")
+
+def shutdown():
+    if _safety_batcher.loaded and _safety_batcher.get() is not None:
+        _safety_batcher.get().close(timeout=1.0)
+    if response_cache is not None and response_cache.store is not None:
+        try:
+            response_cache.store.close()
+        except Exception:
+            pass
+
+# -------------------- Response cache --------------------
+response_cache = build_cache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_S, RESPONSE_CACHE_PATH) if RESPONSE_CACHE else None
+
+def _cache_key(task: str, user_text: str, *extra) -> str:
+    return make_key(task, VERTEX_MODEL_ID, PROMPT_VERSION, normalize_text(user_text), *extra)
+
+def _cache_get(task: str, user_text: str, *extra):
+    if response_cache is None:
+        return None
+    return response_cache.get(_cache_key(task, user_text, *extra))
+
+def _cache_put(task: str, user_text: str, value, *extra):
+    # Urgent texts never reach the model path, but never store an Urgent answer either
+    if response_cache is None or value == "Urgent" or (isinstance(value, list) and "Urgent" in value):
+        return
+    response_cache.set(_cache_key(task, user_text, *extra), value)
+
+def _build_semantic_cache():
+    if not SEMANTIC_CACHE:
+        return None
+    safety_model = get_safety_model()
+    if safety_model is None:
+        return None
+    from semantic_cache import SemanticCache, vectorizer_from_pipeline
+    vectorizer = vectorizer_from_pipeline(safety_model)
+    if vectorizer is None:
+        logger.warning("SEMANTIC_CACHE enabled but the safety model has no TF-IDF vectorizer")
+        return None
+    return SemanticCache(vectorizer, capacity=SEMANTIC_CACHE_CAPACITY, threshold=SEMANTIC_CACHE_THRESHOLD)
+
+_semantic_cache = _Lazy(_build_semantic_cache)
+
+def get_semantic_cache():
+    return _semantic_cache.get()
+
+def _cached_mood(user_text: str):
+    """
+    Exact-match cache first, then the near-duplicate index.
+    Returns (bucket or None, semantic vector to store on a miss).
+    """
+    cached = _cache_get("mood", user_text)
+    if cached:
+        return cached, None
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is None:
+        return None, None
+    return semantic_cache.lookup(user_text)
+
+def _store_mood(user_text: str, bucket: str, vec=None):
+    _cache_put("mood", user_text, bucket)
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None and vec is not None and bucket != "Urgent":
+        semantic_cache.add(vec, bucket)
+
+# -------------------- Request coalescing --------------------
+_flights = SingleFlight()
+_async_flights = AsyncSingleFlight()
+COALESCED = REGISTRY.counter("ml_coalesced_total", "Requests that shared another request's in-flight model call",
+                             ("task",))
+REGISTRY.gauge_callback("ml_singleflight_in_flight", "Model calls currently shared by key",
+                        lambda: [({"mode": "thread"}, _flights.in_flight()), ({"mode": "async"}, _async_flights.in_flight())])
+
+def _coalesce(task: str, key: str, fn, *args):
+    """
+    fn(*args), unless a call with the same key is already running: then wait for it and
+    share its result (or exception). Keys are response-cache keys, so sharing matches
+    what the cache would return a moment later.
+    """
+    if not SINGLEFLIGHT:
+        return fn(*args)
+    t0 = time.perf_counter()
+    result, shared = _flights.do(key, fn, *args)
+    if shared:
+        COALESCED.inc(task=task)
+        record_stage("coalesced_" + task, time.perf_counter() - t0)
+    return result
+
+async def _coalesce_async(task: str, key: str, coro_fn, *args):
+    if not SINGLEFLIGHT:
+        return await coro_fn(*args)
+    t0 = time.perf_counter()
+    result, shared = await _async_flights.do(key, coro_fn, *args)
+    if shared:
+        COALESCED.inc(task=task)
+        record_stage("coalesced_" + task, time.perf_counter() - t0)
+    return result
+
+def cache_stats() -> dict:
+    return {
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "semantic_cache": _semantic_cache.get().stats() if _semantic_cache.loaded and _semantic_cache.get() else None,
+        "vertex_breaker": vertex_breaker.stats(),
+        "safety_batcher": _safety_batcher.get().stats() if _safety_batcher.loaded and _safety_batcher.get() else None,
+    }
+
+# longest model answer we look at; answers are capped by max_output_tokens anyway
+EXTRACT_MAX_CHARS = int(os.getenv("EXTRACT_MAX_CHARS", "2000"))
+
+# candidates stopped for these reasons carry no usable answer
+BLOCKED_FINISH_REASONS = {"SAFETY", "BLOCKLIST", "PROHIBITED_CONTENT", "SPII", "RECITATION"}
+
 # safe extractor for vertex responses (may vary by SDK version)
 def _extract_text(resp):
+    """
+    Visible answer text of a response, or None when there is none (empty, blocked, or all
+    tokens spent on thinking): callers treat None as a failed call and fall back. Never the
+    response repr, which would otherwise be served and cached as an answer.
+    """
+    candidates = getattr(getattr(resp, "response", resp), "candidates", None)
+    if candidates:
+        cand = candidates[0]
+        reason = getattr(getattr(cand, "finish_reason", None), "name", None)
+        if reason in BLOCKED_FINISH_REASONS:
+            return None
+        try:
+            parts = cand.content.parts
+        except Exception:
+            parts = None
+        if parts is not None:
+            # thought parts (thinking models) are not part of the answer
+            text = "".join(getattr(p, "text", "") or "" for p in parts if not getattr(p, "thought", False))
+            return text[:EXTRACT_MAX_CHARS].strip() or None
     try:
-        # many SDKs provide resp.text
+        # many SDKs provide resp.text (raises if the candidate has no text)
         if hasattr(resp, "text") and resp.text:
-            return resp.text.strip()
-    except Exception:
-        pass
-    try:
-        if hasattr(resp, "response") and getattr(resp.response, "candidates", None):
-            cand = resp.response.candidates[0]
-            # candidate content parts
-            if getattr(cand, "content", None) and getattr(cand.content, "parts", None):
-                part = cand.content.parts[0]
-                # part may have .text or .content
-                if hasattr(part, "text"):
-                    return part.text.strip()
-    except Exception:
-        pass
-    # fallback: try string conversion
-    try:
-        s = str(resp)
-        if len(s) < 10000:
-            return s.strip()
+            return resp.text[:EXTRACT_MAX_CHARS].strip() or None
     except Exception:
         pass
     return None
 
-# -------------------- Safety detection --------------------
-URGENT_KEYWORDS = ["suicide", "kill myself", "hurt myself", "want to die", "end my life", "die by suicide"]
-def detect_urgent(text: str) -> bool:
-    if not text:
-        return False
-    t = text.lower()
-    return any(k in t for k in URGENT_KEYWORDS)
-
 # -------------------- Core functions --------------------
-def classify_mood(user_text: str) -> str:
+CRISIS_MESSAGE = "It sounds like you're going through a lot. Please reach out to a trusted person or crisis line right now. You are not alone."
+
+def _screen_mood(user_text: str, safety=None):
     """
-    Use Vertex to classify into one of: Happy, Sad, Anxious, Angry, Fearful, Urgent, Neutral
-    Raises RuntimeError if Vertex not available and ALLOW_FALLBACK=False
+    Local pre-checks run before any model call. Returns a bucket if the text can be
+    classified without Vertex (empty -> Neutral, urgent / safety flag -> Urgent, else the
+    local mood classifier's bucket when it is confident), else None.
     """
-    buckets = ["Happy", "Sad", "Anxious", "Angry", "Fearful", "Urgent", "Neutral"]
     if not user_text or not user_text.strip():
         return "Neutral"
     # If urgent, return Urgent
-    if detect_urgent(user_text):
+    with stage("screen_urgent"):
+        urgent = detect_urgent(user_text)
+    if urgent:
+        URGENT_HITS.inc(source="keyword")
         return "Urgent"
 
      # 2) Safety classifier pre-check (if available)
+    safety_model = get_safety_model() if safety is None else None
     if safety_model is not None:
-        label, score = predict_safety(user_text, safety_model)
+        with stage("safety_model"):
+            safety = predict_safety(user_text, safety_model)
+    if safety is not None:
+        label, score = safety
         # if classifier thinks it's flagged (score high) treat as Urgent/flag
-        if label == "flag" and score >= 0.5:
+        if label == "flag" and score >= flag_threshold():
+            URGENT_HITS.inc(source="safety_model")
             return "Urgent"
+    return _local_mood(user_text)
+
+def _local_mood(user_text: str):
+    """
+    The local mood classifier's bucket if it is at least MOOD_CONFIDENCE_THRESHOLD sure,
+    else None (escalate to Vertex). Urgent is never answered locally.
+    """
+    mood_model = get_mood_model()
+    if mood_model is None:
+        return None
+    with stage("mood_model"):
+        bucket, confidence = predict_mood(user_text, mood_model)
+    if bucket == "Urgent" or confidence < MOOD_CONFIDENCE_THRESHOLD:
+        LOCAL_MOODS.inc(result="escalated")
+        return None
+    LOCAL_MOODS.inc(result="answered")
+    return bucket
+
+def _render(template, user_text: str, **fields) -> str:
+    prompt, truncated = template.render(user_text, **fields)
+    if truncated:
+        PROMPTS_TRUNCATED.inc(task=template.task)
+    return prompt
+
+def _generation_kwargs(template, **config) -> dict:
+    config = template.generation_config(**config)
+    return {"generation_config": config} if config else {}
+
+_CLASSIFY_KWARGS = _generation_kwargs(CLASSIFY)
+_AFFIRMATION_KWARGS = _generation_kwargs(AFFIRMATION)
+
+def _classify_prompt(user_text: str) -> str:
+    return _render(CLASSIFY, user_text)
+
+def _parse_mood(text):
+    if not text:
+        return None
+    # sanitize: first non-empty token which matches a bucket
+    for line in text.splitlines():
+        for b in MOOD_BUCKETS:
+            if b.lower() == line.strip().lower() or b.lower() in line.strip().lower():
+                return b
+    # fallback: try to see if any bucket appears in text
+    for b in MOOD_BUCKETS:
+        if b.lower() in text.lower():
+            return b
+    return None
+
+# fallback heuristics: first matching category wins, in this order
+FALLBACK_MOOD_ORDER = [("anxious", "Anxious"), ("sad", "Sad"), ("happy", "Happy"),
+                       ("angry", "Angry"), ("fearful", "Fearful"), ("urgent", "Urgent")]
+
+def _fallback_mood(user_text: str) -> str:
+    # fallback local heuristics (only if ALLOW_FALLBACK true)
+    if _can_fallback():
+        FALLBACKS.inc(kind="mood")
+        # the local classifier's best guess beats substring heuristics, even unconfident
+        mood_model = get_mood_model()
+        if mood_model is not None:
+            with stage("fallback_mood"):
+                bucket, _ = predict_mood(user_text, mood_model)
+            if bucket != "Urgent":
+                return bucket
+        with stage("fallback_mood"):
+            found = match_categories(user_text)
+        for category, bucket in FALLBACK_MOOD_ORDER:
+            if category in found:
+                return bucket
+        return "Neutral"
+    else:
+        raise RuntimeError("Vertex classify failed and ALLOW_FALLBACK is false")
+
+def _vertex_mood(user_text: str, vec=None):
+    resp = _vertex_generate("classify", _classify_prompt(user_text), **_CLASSIFY_KWARGS)
+    bucket = _parse_mood(_extract_text(resp))
+    if bucket:
+        if bucket == "Urgent":
+            URGENT_HITS.inc(source="model")
+        _store_mood(user_text, bucket, vec)
+    return bucket
+
+def classify_mood(user_text: str, safety=None) -> str:
+    """
+    Use Vertex to classify into one of: Happy, Sad, Anxious, Angry, Fearful, Urgent, Neutral
+    Raises RuntimeError if Vertex not available and ALLOW_FALLBACK=False
+    `safety` may carry a precomputed (label, score) from predict_safety_many.
+    """
+    screened = _screen_mood(user_text, safety)
+    if screened:
+        return screened
 
     # If Vertex available, call it
     if _model is not None:
-        prompt = (
-            "You are an empathetic classifier. Classify the user's text into ONE of: "
-            + ", ".join(buckets)
-            + ". Return only the single category name (no additional text).\n\n"
-            f"User text: \"{user_text}\"\nCategory:"
-        )
+        cached, vec = _cached_mood(user_text)
+        if cached:
+            return cached
         try:
-            resp = _model.generate_content(prompt)
-            text = _extract_text(resp)
-            if text:
-                # sanitize: first non-empty token which matches a bucket
-                for line in text.splitlines():
-                    for b in buckets:
-                        if b.lower() == line.strip().lower() or b.lower() in line.strip().lower():
-                            return b
-                # fallback: try to see if any bucket appears in text
-                for b in buckets:
-                    if b.lower() in text.lower():
-                        return b
+            bucket = _coalesce("classify", _cache_key("mood", user_text), _vertex_mood, user_text, vec)
+            if bucket:
+                return bucket
+        except CircuitOpenError:
+            pass
         except Exception as e:
             logger.error("Vertex classify error: %s", e)
-            if not ALLOW_FALLBACK:
+            if not _can_fallback():
                 raise
 
-    # fallback local heuristics (only if ALLOW_FALLBACK true)
-    if ALLOW_FALLBACK:
-        t = user_text.lower()
-        if any(k in t for k in ["stress", "stressed", "anxiet", "panic", "overwhelm"]):
-            return "Anxious"
-        if any(k in t for k in ["sad", "depress", "lonely", "gloom"]):
-            return "Sad"
-        if any(k in t for k in ["happy", "excited", "glad", "joy"]):
-            return "Happy"
-        if any(k in t for k in ["angry", "mad", "furious"]):
-            return "Angry"
-        if any(k in t for k in ["fear", "scared", "terrified"]):
-            return "Fearful"
-        if detect_urgent(t):
-            return "Urgent"
-        return "Neutral"
-    else:
-        raise RuntimeError("Vertex classify failed and ALLOW_FALLBACK is false")
+    return _fallback_mood(user_text)
+
+def _affirmation_prompt(user_text: str, mood_bucket: str) -> str:
+    return _render(AFFIRMATION, user_text, mood_bucket=mood_bucket)
+
+def _parse_affirmation(text):
+    if not text:
+        return None
+    # trim to single line summary
+    first = text.splitlines()[0].strip()
+    # small sanity limits
+    if len(first.split()) > 60:
+        first = " ".join(first.split()[:60]) + "..."
+    return first
+
+def _fallback_affirmation(mood_bucket: str) -> (str, str):
+    # Fallback to CSV-based selection if ALLOW_FALLBACK (or Vertex is tripped)
+    affirmation_index = get_affirmation_index() if _can_fallback() else None
+    if affirmation_index is not None:
+        try:
+            with stage("fallback_affirmation"):
+                picked = affirmation_index.pick(mood_bucket)
+            if picked is not None:
+                # counted only when an index pick is actually served
+                FALLBACKS.inc(kind="affirmation")
+                text, safety_flag = picked
+                # If dataset marks it as urgent flag, override with crisis message
+                if safety_flag == "flag":
+                    text = CRISIS_MESSAGE
+                return (text, safety_flag)
+        except Exception as e:
+            logger.error("Fallback affirmation selection error: %s", e)
+
+
+    # Absolute final fallback
+    return ("Thank you for sharing. Remember to be kind to yourself today.", "safe")
+
+def _vertex_affirmation(user_text: str, mood_bucket: str):
+    resp = _vertex_generate("affirmation", _affirmation_prompt(user_text, mood_bucket), **_AFFIRMATION_KWARGS)
+    first = _parse_affirmation(_extract_text(resp))
+    if first:
+        _cache_put("affirmation", user_text, first, mood_bucket)
+    return first
 
 def generate_affirmation(user_text: str, mood_bucket: str) -> (str, str):
     """
@@ -191,66 +826,125 @@ def generate_affirmation(user_text: str, mood_bucket: str) -> (str, str):
     """
     # urgent detection
     if detect_urgent(user_text) or mood_bucket == "Urgent":
-        return ("It sounds like you're going through a lot. Please reach out to a trusted person or crisis line right now. You are not alone.", "flag")
+        return (CRISIS_MESSAGE, "flag")
 
     # Try Vertex generation
     if _model is not None:
-        prompt = (
-            f"You are an empathetic youth support assistant. The user's mood is '{mood_bucket}'. "
-            "Create a short positive affirmation tailored to the user's input. Maximum 25 words. "
-            "Do NOT provide medical diagnoses or instructions. If the user expresses self-harm, respond with a supportive helpline suggestion instead.\n\n"
-            f"User text: \"{user_text}\"\nAffirmation:"
-        )
+        cached = _cache_get("affirmation", user_text, mood_bucket)
+        if cached:
+            return (cached, "safe")
         try:
-            resp = _model.generate_content(prompt)
-            text = _extract_text(resp)
-            if text:
-                # trim to single line summary
-                first = text.splitlines()[0].strip()
-                # small sanity limits
-                if len(first.split()) > 60:
-                    first = " ".join(first.split()[:60]) + "..."
+            first = _coalesce("affirmation", _cache_key("affirmation", user_text, mood_bucket),
+                              _vertex_affirmation, user_text, mood_bucket)
+            if first:
                 return (first, "safe")
+        except CircuitOpenError:
+            pass
         except Exception as e:
             logger.error("Vertex generate_affirmation error: %s", e)
-            if not ALLOW_FALLBACK:
+            if not _can_fallback():
                 raise
 
-    # Fallback to CSV-based selection if ALLOW_FALLBACK
-    if ALLOW_FALLBACK and full_df is not None:
+    return _fallback_affirmation(mood_bucket)
+
+# -------------------- Combined classify + affirm --------------------
+COMBINED_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "mood_bucket": {"type": "string", "enum": MOOD_BUCKETS},
+        "affirmation": {"type": "string"},
+    },
+    "required": ["mood_bucket", "affirmation"],
+}
+
+def _combined_prompt(user_text: str) -> str:
+    return _render(COMBINED, user_text)
+
+def _build_combined_kwargs() -> dict:
+    # JSON mode + response schema when the SDK supports it; the prompt asks for JSON either way
+    try:
+        from vertexai.generative_models import GenerationConfig
+        config = COMBINED.generation_config(response_mime_type="application/json",
+                                            response_schema=COMBINED_RESPONSE_SCHEMA)
         try:
-            # Map mood_bucket to CSV mood_tag format (lowercase)
-            mood_mapping = {
-                "Happy": "happy",
-                "Sad": "sad", 
-                "Anxious": "anxious",
-                "Angry": "angry",
-                "Fearful": "fearful",
-                "Urgent": "suicidal",
-                "Neutral": "confused"
-            }
-            csv_mood = mood_mapping.get(mood_bucket, mood_bucket.lower())
-            
-            rows = full_df[full_df.get("mood_tag", "") == csv_mood]
-            if rows is None or len(rows) == 0:
-                # Try with original mood_bucket if mapping fails
-                rows = full_df[full_df.get("mood_tag", "") == mood_bucket.lower()]
-            if rows is None or len(rows) == 0:
-                # Fallback to any row
-                rows = full_df
-            rec = rows.sample(1).iloc[0]
-            text = rec.get("text") if "text" in rec else rec.get("affirmation", "Be kind to yourself today.")
-            safety_flag = rec.get("safety_flag", "safe")
-            # If dataset marks it as urgent flag, override with crisis message
-            if safety_flag == "flag":
-                text = "It sounds like you're going through a lot. Please reach out to a trusted person or crisis line right now. You are not alone."
-            return (str(text).strip(), str(safety_flag))
-        except Exception as e:
-            logger.error("Fallback affirmation selection error: %s", e)
+            return {"generation_config": GenerationConfig(**config)}
+        except TypeError:
+            # SDK without thinking_config in GenerationConfig: keep JSON mode
+            logger.warning("GenerationConfig has no thinking_config; combined calls use the model's default thinking")
+            config.pop("thinking_config", None)
+            return {"generation_config": GenerationConfig(**config)}
+    except Exception:
+        return _generation_kwargs(COMBINED)
 
+_combined_kwargs_lazy = _Lazy(_build_combined_kwargs)
 
-    # Absolute final fallback
-    return ("Thank you for sharing. Remember to be kind to yourself today.", "safe")
+def _combined_kwargs() -> dict:
+    return _combined_kwargs_lazy.get()
+
+def _parse_combined(text):
+    """
+    Returns (mood_bucket, affirmation) if `text` is a valid combined response, else None.
+    """
+    if not text:
+        return None
+    raw = text.strip()
+    if raw.startswith("```"):
+        # tolerate ```json fenced output
+        raw = raw.strip("`")
+        raw = raw[raw.find("{"):]
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    bucket = next((b for b in MOOD_BUCKETS if b.lower() == str(data.get("mood_bucket", "")).strip().lower()), None)
+    affirmation = _parse_affirmation(str(data.get("affirmation") or ""))
+    if bucket is None or not affirmation:
+        return None
+    return (bucket, affirmation)
+
+def _from_combined(user_text: str, parsed) -> (str, str, str):
+    bucket, affirmation = parsed
+    if bucket == "Urgent" or detect_urgent(user_text):
+        return (bucket, CRISIS_MESSAGE, "flag")
+    return (bucket, affirmation, "safe")
+
+def _vertex_combined(user_text: str):
+    resp = _vertex_generate("combined", _combined_prompt(user_text), **_combined_kwargs())
+    parsed = _parse_combined(_extract_text(resp))
+    if parsed:
+        if parsed[0] == "Urgent":
+            URGENT_HITS.inc(source="model")
+        _cache_put("combined", user_text, list(parsed))
+    return parsed
+
+def classify_and_affirm(user_text: str, safety=None) -> (str, str, str):
+    """
+    Single model call returning (mood_bucket, affirmation, safety_flag).
+    Falls back to the two-call classify_mood + generate_affirmation path if the
+    structured response is missing or invalid.
+    """
+    screened = _screen_mood(user_text, safety)
+    if screened:
+        return (screened,) + generate_affirmation(user_text, screened)
+
+    if _model is not None:
+        cached = _cache_get("combined", user_text)
+        if cached:
+            return _from_combined(user_text, cached)
+        try:
+            parsed = _coalesce("combined", _cache_key("combined", user_text), _vertex_combined, user_text)
+            if parsed:
+                return _from_combined(user_text, parsed)
+            logger.warning("Combined response invalid, using two-call path")
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            logger.error("Vertex combined classify/affirm error: %s", e)
+
+    mood_bucket = classify_mood(user_text, safety=safety)
+    return (mood_bucket,) + generate_affirmation(user_text, mood_bucket)
 
 def get_playlist_for_mood(mood_bucket: str):
     """
@@ -288,14 +982,298 @@ def get_playlist_for_mood(mood_bucket: str):
     candidates = mapping.get(mood_bucket, mapping["Neutral"])
     return random.choice(candidates)
 # -------------------- Public API --------------------
-def analyze_and_respond(user_text: str) -> dict:
+def analyze_and_respond(user_text: str, safety=None) -> dict:
     """
     Main wrapper: classify mood, produce affirmation, playlist, and safety flag.
     Returns a dict with keys: mood_bucket, affirmation, safety_flag, playlist_url
     """
-    # classify
-    mood_bucket = classify_mood(user_text)
-    affirmation, safety_flag = generate_affirmation(user_text, mood_bucket)
+    if VERTEX_COMBINED:
+        mood_bucket, affirmation, safety_flag = classify_and_affirm(user_text, safety=safety)
+    else:
+        # classify
+        mood_bucket = classify_mood(user_text, safety=safety)
+        affirmation, safety_flag = generate_affirmation(user_text, mood_bucket)
+    playlist = get_playlist_for_mood(mood_bucket)
+    return {
+        "text": user_text,
+        "mood_bucket": mood_bucket,
+        "affirmation": affirmation,
+        "safety_flag": safety_flag,
+        "playlist_url": playlist
+    }
+
+# -------------------- Streaming API --------------------
+# Server-Sent Events support (serve.py /analyze/stream): mood and playlist go out as soon
+# as the mood is known, then affirmation text as Vertex generates it. Generation is cut off
+# at the first line break or STREAM_MAX_WORDS words, the same text generate_affirmation keeps.
+STREAM_MAX_WORDS = int(os.getenv("STREAM_MAX_WORDS", "25"))
+
+def _chunk_text(chunk) -> str:
+    # .text raises on chunks without text (e.g. a final safety-ratings-only chunk)
+    try:
+        return chunk.text or ""
+    except Exception:
+        return ""
+
+_WORD_RUN = re.compile(r"\S+")
+
+def _stream_cut(text: str, max_words: int):
+    """
+    Where a streamed affirmation must stop: the first newline, or the end of word
+    `max_words` once a following word has started (so the word is known to be complete).
+    None if neither happened yet.
+    """
+    nl = text.find("\n")
+    ends = [m.end() for m in itertools.islice(_WORD_RUN.finditer(text), max_words + 1)]
+    if len(ends) > max_words:
+        return ends[max_words - 1] if nl < 0 else min(nl, ends[max_words - 1])
+    return nl if nl >= 0 else None
+
+def stream_affirmation(user_text: str, mood_bucket: str):
+    """
+    Yields pieces of the affirmation for `mood_bucket` as they are generated; the
+    concatenation is the final affirmation. Urgent input yields only CRISIS_MESSAGE;
+    cache hits and the fallback yield the whole text at once. The generator's return
+    value (StopIteration.value) is (affirmation, safety_flag).
+    Only a stream that completed (or stopped at the line / word cut) is cached; if the model
+    fails mid-stream, the fallback affirmation follows the text already sent.
+    """
+    if detect_urgent(user_text) or mood_bucket == "Urgent":
+        yield CRISIS_MESSAGE
+        return (CRISIS_MESSAGE, "flag")
+
+    if _model is not None:
+        cached = _cache_get("affirmation", user_text, mood_bucket)
+        if cached:
+            yield cached
+            return (cached, "safe")
+        text, sent, stream, chunk, last, complete = "", 0, None, None, None, False
+        call = _StreamCall("affirmation_stream")
+        try:
+            call.start()
+            with call.model():
+                stream = _model.generate_content(_affirmation_prompt(user_text, mood_bucket), stream=True,
+                                                 **_AFFIRMATION_KWARGS)
+                chunks = iter(stream)
+            while True:
+                with call.model():
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                last = chunk
+                text += _chunk_text(chunk)
+                if not text.strip():
+                    continue
+                text = text.lstrip()
+                cut = _stream_cut(text, STREAM_MAX_WORDS)
+                final = text[:cut] if cut is not None else text
+                if len(final) > sent:
+                    piece, sent = final[sent:], len(final)
+                    yield piece  # outside model(): time spent by the client is not model time
+                if cut is not None:
+                    text = final
+                    break
+            complete = True
+            call.finish("ok")
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            call.finish("error")
+            logger.error("Vertex stream_affirmation error: %s", e)
+            if not sent and not _can_fallback():
+                raise
+        except BaseException:
+            # GeneratorExit: the client went away
+            call.finish("cancelled")
+            raise
+        finally:
+            # stop the generation server-side once the line / word cap is reached
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            # usage_metadata on the last chunk received covers the whole stream so far
+            _observe_tokens("affirmation_stream", last)
+        affirmation = text[:sent].strip()
+        if affirmation and complete:
+            _cache_put("affirmation", user_text, affirmation, mood_bucket)
+            return (affirmation, "safe")
+        if sent:
+            # failed mid-stream: finish with the fallback, and never cache the fragment
+            tail, safety_flag = _fallback_affirmation(mood_bucket)
+            yield " " + tail
+            return (f"{affirmation} {tail}", safety_flag)
+
+    affirmation, safety_flag = _fallback_affirmation(mood_bucket)
+    yield affirmation
+    return (affirmation, safety_flag)
+
+def analyze_and_respond_stream(user_text: str, safety=None):
+    """
+    Streaming analyze_and_respond: yields (event, data) pairs:
+      ("mood", {text, mood_bucket, playlist_url})   once, after the urgent / safety screens
+      ("token", {text})                             affirmation pieces
+      ("done", <the analyze_and_respond dict>)
+    Mood classification is a separate call even when VERTEX_COMBINED is set, since a
+    JSON response cannot be shown before it is complete.
+    """
+    mood_bucket = classify_mood(user_text, safety=safety)
+    playlist = get_playlist_for_mood(mood_bucket)
+    yield ("mood", {"text": user_text, "mood_bucket": mood_bucket, "playlist_url": playlist})
+
+    pieces = stream_affirmation(user_text, mood_bucket)
+    while True:
+        try:
+            piece = next(pieces)
+        except StopIteration as stop:
+            affirmation, safety_flag = stop.value
+            break
+        yield ("token", {"text": piece})
+
+    yield ("done", {
+        "text": user_text,
+        "mood_bucket": mood_bucket,
+        "affirmation": affirmation,
+        "safety_flag": safety_flag,
+        "playlist_url": playlist
+    })
+
+# -------------------- Async API --------------------
+# Same pipeline as analyze_and_respond, but model calls go through vertex_async so an
+# ASGI server (serve_asgi.py) can keep many check-ins in flight without a thread each.
+VERTEX_CONCURRENCY = int(os.getenv("VERTEX_CONCURRENCY", "16"))
+VERTEX_TIMEOUT_S = float(os.getenv("VERTEX_TIMEOUT_S", "15"))
+VERTEX_RETRIES = int(os.getenv("VERTEX_RETRIES", "2"))
+VERTEX_HEDGE_AFTER_S = float(os.getenv("VERTEX_HEDGE_AFTER_S", "0"))  # 0 disables hedging
+
+_async_gen = None
+def get_async_generator():
+    """
+    AsyncGenerator wrapping the current Vertex model (None if Vertex is not initialized).
+    """
+    global _async_gen
+    if _model is None:
+        return None
+    if _async_gen is None or _async_gen.model is not _model:
+        from vertex_async import AsyncGenerator
+        _async_gen = AsyncGenerator(_model, concurrency=VERTEX_CONCURRENCY, timeout=VERTEX_TIMEOUT_S,
+                                    retries=VERTEX_RETRIES, hedge_after=VERTEX_HEDGE_AFTER_S)
+    return _async_gen
+
+async def _vertex_mood_async(gen, user_text: str, vec=None):
+    resp = await _vertex_generate_async(gen, "classify", _classify_prompt(user_text), **_CLASSIFY_KWARGS)
+    bucket = _parse_mood(_extract_text(resp))
+    if bucket:
+        if bucket == "Urgent":
+            URGENT_HITS.inc(source="model")
+        _store_mood(user_text, bucket, vec)
+    return bucket
+
+async def classify_mood_async(user_text: str, safety=None) -> str:
+    """
+    Async version of classify_mood.
+    """
+    screened = _screen_mood(user_text, safety)
+    if screened:
+        return screened
+
+    gen = get_async_generator()
+    if gen is not None:
+        cached, vec = _cached_mood(user_text)
+        if cached:
+            return cached
+        try:
+            bucket = await _coalesce_async("classify", _cache_key("mood", user_text), _vertex_mood_async,
+                                           gen, user_text, vec)
+            if bucket:
+                return bucket
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            logger.error("Vertex classify error: %s", e)
+            if not _can_fallback():
+                raise
+
+    return _fallback_mood(user_text)
+
+async def _vertex_affirmation_async(gen, user_text: str, mood_bucket: str):
+    resp = await _vertex_generate_async(gen, "affirmation", _affirmation_prompt(user_text, mood_bucket),
+                                        **_AFFIRMATION_KWARGS)
+    first = _parse_affirmation(_extract_text(resp))
+    if first:
+        _cache_put("affirmation", user_text, first, mood_bucket)
+    return first
+
+async def generate_affirmation_async(user_text: str, mood_bucket: str) -> (str, str):
+    """
+    Async version of generate_affirmation.
+    """
+    if detect_urgent(user_text) or mood_bucket == "Urgent":
+        return (CRISIS_MESSAGE, "flag")
+
+    gen = get_async_generator()
+    if gen is not None:
+        cached = _cache_get("affirmation", user_text, mood_bucket)
+        if cached:
+            return (cached, "safe")
+        try:
+            first = await _coalesce_async("affirmation", _cache_key("affirmation", user_text, mood_bucket),
+                                          _vertex_affirmation_async, gen, user_text, mood_bucket)
+            if first:
+                return (first, "safe")
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            logger.error("Vertex generate_affirmation error: %s", e)
+            if not _can_fallback():
+                raise
+
+    return _fallback_affirmation(mood_bucket)
+
+async def _vertex_combined_async(gen, user_text: str):
+    resp = await _vertex_generate_async(gen, "combined", _combined_prompt(user_text), **_combined_kwargs())
+    parsed = _parse_combined(_extract_text(resp))
+    if parsed:
+        if parsed[0] == "Urgent":
+            URGENT_HITS.inc(source="model")
+        _cache_put("combined", user_text, list(parsed))
+    return parsed
+
+async def classify_and_affirm_async(user_text: str, safety=None) -> (str, str, str):
+    """
+    Async version of classify_and_affirm.
+    """
+    screened = _screen_mood(user_text, safety)
+    if screened:
+        return (screened,) + await generate_affirmation_async(user_text, screened)
+
+    gen = get_async_generator()
+    if gen is not None:
+        cached = _cache_get("combined", user_text)
+        if cached:
+            return _from_combined(user_text, cached)
+        try:
+            parsed = await _coalesce_async("combined", _cache_key("combined", user_text), _vertex_combined_async,
+                                           gen, user_text)
+            if parsed:
+                return _from_combined(user_text, parsed)
+            logger.warning("Combined response invalid, using two-call path")
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            logger.error("Vertex combined classify/affirm error: %s", e)
+
+    mood_bucket = await classify_mood_async(user_text, safety=safety)
+    return (mood_bucket,) + await generate_affirmation_async(user_text, mood_bucket)
+
+async def analyze_and_respond_async(user_text: str, safety=None) -> dict:
+    """
+    Async version of analyze_and_respond; returns the same dict.
+    """
+    if VERTEX_COMBINED:
+        mood_bucket, affirmation, safety_flag = await classify_and_affirm_async(user_text, safety=safety)
+    else:
+        mood_bucket = await classify_mood_async(user_text, safety=safety)
+        affirmation, safety_flag = await generate_affirmation_async(user_text, mood_bucket)
     playlist = get_playlist_for_mood(mood_bucket)
     return {
         "text": user_text,
@@ -305,13 +1283,191 @@ def analyze_and_respond(user_text: str) -> dict:
         "playlist_url": playlist
     }
 
+# -------------------- Batch API --------------------
+VERTEX_BATCH_CONCURRENCY = int(os.getenv("VERTEX_BATCH_CONCURRENCY", "8"))
+
+def analyze_many(texts, concurrency: int = VERTEX_BATCH_CONCURRENCY) -> list:
+    """
+    Batch version of analyze_and_respond for backfills / re-scoring.
+    The urgent regex screen and the safety model run over the whole batch up front
+    (one predict_proba call); only the remaining texts go to Vertex, at most
+    `concurrency` at a time. Results keep input order; an item that fails gets
+    {"text": ..., "error": ...} instead of failing the whole batch.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    texts = ["" if t is None else str(t) for t in texts]
+
+    # screen: only non-empty, non-urgent texts need the safety model
+    to_score = [i for i, t in enumerate(texts) if t.strip() and not detect_urgent(t)]
+    safety = {}
+    safety_model = get_safety_model() if to_score else None
+    if safety_model is not None:
+        scores = predict_safety_many([texts[i] for i in to_score], safety_model)
+        safety = dict(zip(to_score, scores))
+
+    def _one(i):
+        try:
+            return analyze_and_respond(texts[i], safety=safety.get(i))
+        except Exception as e:
+            logger.error("Batch item %d failed: %s", i, e)
+            return {"text": texts[i], "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        return list(executor.map(_one, range(len(texts))))
+
+# -------------------- Micro-batched safety screen --------------------
+# Concurrent requests queue their text; one thread scores up to SAFETY_BATCH_MAX texts per
+# predict_proba call, waiting at most SAFETY_BATCH_WAIT_MS for a batch to fill.
+SAFETY_BATCH = os.getenv("SAFETY_BATCH", "true").lower() == "true"
+SAFETY_BATCH_MAX = int(os.getenv("SAFETY_BATCH_MAX", "64"))
+SAFETY_BATCH_WAIT_MS = float(os.getenv("SAFETY_BATCH_WAIT_MS", "2"))
+
+SAFETY_BATCH_SIZE = REGISTRY.histogram("ml_safety_batch_size", "Texts per batched safety model call",
+                                       buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+def _score_safety_batch(texts):
+    safety_model = get_safety_model()
+    if safety_model is None:
+        return [None] * len(texts)
+    SAFETY_BATCH_SIZE.observe(len(texts))
+    return predict_safety_many(texts, safety_model)
+
+def _build_safety_batcher():
+    if not SAFETY_BATCH:
+        return None
+    return MicroBatcher(_score_safety_batch, max_batch=SAFETY_BATCH_MAX,
+                        max_wait=SAFETY_BATCH_WAIT_MS / 1000, name="safety-batcher")
+
+_safety_batcher = _Lazy(_build_safety_batcher)
+
+def submit_safety(user_text: str):
+    """
+    Queues user_text for the batched safety screen. Returns a Future of (label, score) to
+    pass as analyze_and_respond(..., safety=...), or None when the text does not need the
+    model (empty / caught by the urgent keywords) or batching is off.
+    """
+    batcher = _safety_batcher.get()
+    if batcher is None or not user_text or not user_text.strip() or detect_urgent(user_text):
+        return None
+    return batcher.submit(user_text)
+
+def batched_safety(user_text: str):
+    """
+    Blocking submit_safety: the (label, score), or None to let the pipeline score the
+    text itself (also on batch errors, which are logged).
+    """
+    fut = submit_safety(user_text)
+    if fut is None:
+        return None
+    try:
+        with stage("safety_batch"):
+            return fut.result()
+    except Exception as e:
+        logger.error("Batched safety screen failed: %s", e)
+        return None
+
+# -------------------- Worker mode --------------------
+# Long-lived process: pays the import / CSV / safety model / Vertex init cost once,
+# then serves newline-delimited JSON requests. Each request line looks like
+#   {"id": "abc", "text": "I feel stressed"}
+# and each response line echoes the id:
+#   {"id": "abc", "result": {...}}  or  {"id": "abc", "error": "...", "message": "..."}
+# Requests are handled on a thread pool, so responses may come back out of order;
+# callers must match them by id.
+WORKER_THREADS = int(os.getenv("ML_WORKER_THREADS", "4"))
+
+def handle_worker_request(line: str) -> dict:
+    """
+    Parse one NDJSON request line and return the response dict (never raises).
+    """
+    try:
+        req = json.loads(line)
+    except ValueError as e:
+        return {"id": None, "error": "bad_request", "message": f"Invalid JSON: {e}"}
+    if not isinstance(req, dict):
+        return {"id": None, "error": "bad_request", "message": "Request must be a JSON object"}
+    req_id = req.get("id")
+    if req.get("op") == "ping":
+        return {"id": req_id, "result": "pong"}
+    text = req.get("text")
+    if not isinstance(text, str):
+        return {"id": req_id, "error": "bad_request", "message": "Missing 'text' field"}
+    try:
+        return {"id": req_id, "result": analyze_and_respond(text)}
+    except Exception as e:
+        logger.error("Worker request %s failed: %s", req_id, e)
+        return {"id": req_id, "error": "internal_error", "message": str(e)}
+
+def _serve_lines(lines, write_line, executor):
+    """
+    Dispatch request lines to the executor; write_line is called (under a lock)
+    with each serialized response as soon as it is ready.
+    """
+    lock = threading.Lock()
+
+    def _respond(line):
+        out = json.dumps(handle_worker_request(line))
+        with lock:
+            write_line(out)
+
+    for raw in lines:
+        line = raw.strip()
+        if line:
+            executor.submit(_respond, line)
+
+def run_worker(stdin=None, stdout=None, threads: int = WORKER_THREADS):
+    """
+    Serve NDJSON requests from stdin until EOF, writing responses to stdout.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+
+    def _write(out):
+        stdout.write(out + "\n")
+        stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        _serve_lines(stdin, _write, executor)
+
+def run_socket_worker(socket_path: str, threads: int = WORKER_THREADS):
+    """
+    Serve NDJSON requests over a Unix domain socket. Every connection is an
+    independent NDJSON stream; all connections share one analysis thread pool.
+    """
+    import socketserver
+    from concurrent.futures import ThreadPoolExecutor
+
+    executor = ThreadPoolExecutor(max_workers=threads)
+
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def _write(out):
+                self.wfile.write((out + "\n").encode("utf-8"))
+                self.wfile.flush()
+            lines = (raw.decode("utf-8", errors="replace") for raw in self.rfile)
+            _serve_lines(lines, _write, executor)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    with socketserver.ThreadingUnixStreamServer(socket_path, _Handler) as server:
+        logger.info(f"ml_logic worker listening on {socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            executor.shutdown(wait=True)
+
 # -------------------- CLI entrypoint --------------------
 if __name__ == "__main__":
-    import sys, json
-    if len(sys.argv) > 1:
-        input_text = " ".join(sys.argv[1:])
-    else:
-        input_text = sys.stdin.read().strip()
+    # `python ml_logic.py <text>` analyzes one text (legacy, one process per request);
+    # `python ml_logic.py --worker` / `--socket PATH` starts a long-lived worker.
+    # Flags are only recognized as the first argument so free text is never mis-parsed.
+    argv = sys.argv[1:]
+    mode = argv[0] if argv and argv[0] in ("--worker", "--socket") else None
+    socket_path = argv[1] if mode == "--socket" and len(argv) > 1 else None
+    if mode == "--socket" and not socket_path:
+        sys.stderr.write("usage: ml_logic.py --socket PATH\n")
+        sys.exit(2)
 
     try:
         init_vertex()
@@ -322,6 +1478,18 @@ if __name__ == "__main__":
         else:
             sys.stderr.write(f"WARNING: Vertex init failed, using fallback mode: {e}\n")
 
+    if mode == "--socket":
+        run_socket_worker(socket_path)
+        sys.exit(0)
+    if mode == "--worker":
+        run_worker()
+        sys.exit(0)
+
+    if argv:
+        input_text = " ".join(argv)
+    else:
+        input_text = sys.stdin.read().strip()
+
     try:
         out = analyze_and_respond(input_text)
         sys.stdout.write(json.dumps(out))
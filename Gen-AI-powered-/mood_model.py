@@ -0,0 +1,126 @@
+# mood_model.py
+"""
+Local first-tier mood classifier (char n-gram TF-IDF + LogisticRegression over the mood
+buckets, trained by train_mood_model.py from the English / Hindi seed CSVs plus any
+labeled check-ins).
+
+ml_logic answers with it when its confidence is at least CONFIDENCE_THRESHOLD and sends
+the rest to Vertex. It never answers Urgent: that stays with the urgent screens and Vertex.
+
+At load the fitted pipeline is converted to CompactMoodModel, which scores one text in
+about 0.1 ms instead of paying sklearn's per-call overhead (about 1.5 ms).
+"""
+
+import json
+import os
+
+from safety import report_path
+
+MODEL_PATH = os.getenv("MOOD_MODEL_PATH", "mood_model.joblib")
+
+
+def _confidence_threshold() -> float:
+    # MOOD_CONFIDENCE_THRESHOLD wins; else the one calibrated by train_mood_model.py; else 0.8
+    env = os.getenv("MOOD_CONFIDENCE_THRESHOLD")
+    if env:
+        return float(env)
+    try:
+        with open(report_path(MODEL_PATH), encoding="utf-8") as f:
+            return float(json.load(f)["threshold"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0.8
+
+
+CONFIDENCE_THRESHOLD = _confidence_threshold()
+
+
+class CompactMoodModel:
+    """
+    predict_proba of a char_wb TfidfVectorizer + multinomial LogisticRegression pipeline,
+    reimplemented with a dict lookup per n-gram and one small numpy product.
+    """
+
+    def __init__(self, pipe):
+        import re
+        import numpy as np
+        vec, clf = pipe[0], pipe[-1]
+        self.vocab = dict(vec.vocabulary_)
+        self.idf = np.asarray(vec.idf_, dtype=np.float64) if vec.use_idf else None
+        self.coef = np.ascontiguousarray(clf.coef_.T, dtype=np.float64)  # (n_features, n_classes)
+        self.intercept = np.asarray(clf.intercept_, dtype=np.float64)
+        self.classes_ = clf.classes_
+        self.lowercase = vec.lowercase
+        self.ngram_range = vec.ngram_range
+        self.sublinear_tf = vec.sublinear_tf
+        self._white_spaces = re.compile(r"\s\s+")
+
+    @staticmethod
+    def supports(pipe) -> bool:
+        steps = getattr(pipe, "steps", None)
+        if not steps or len(steps) != 2:
+            return False
+        vec, clf = pipe[0], pipe[-1]
+        return (getattr(vec, "analyzer", None) == "char_wb" and hasattr(vec, "vocabulary_")
+                and not vec.strip_accents and vec.preprocessor is None and vec.norm == "l2"
+                and hasattr(clf, "coef_") and len(clf.classes_) > 2
+                and getattr(clf, "multi_class", "auto") != "ovr")
+
+    def _ngrams(self, text: str):
+        # same n-grams as sklearn's _char_wb_ngrams
+        if self.lowercase:
+            text = text.lower()
+        lo, hi = self.ngram_range
+        for w in self._white_spaces.sub(" ", text).split():
+            w = " " + w + " "
+            for n in range(lo, hi + 1):
+                if len(w) <= n:
+                    yield w
+                    break
+                for i in range(len(w) - n + 1):
+                    yield w[i:i + n]
+
+    def predict_proba(self, texts):
+        import numpy as np
+        out = np.empty((len(texts), len(self.classes_)))
+        for row, text in enumerate(texts):
+            counts = {}
+            for gram in self._ngrams(text):
+                j = self.vocab.get(gram)
+                if j is not None:
+                    counts[j] = counts.get(j, 0) + 1
+            scores = self.intercept.copy()
+            if counts:
+                idx = np.fromiter(counts, dtype=np.intp, count=len(counts))
+                tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+                if self.sublinear_tf:
+                    tf = 1 + np.log(tf)
+                if self.idf is not None:
+                    tf *= self.idf[idx]
+                scores += (tf / np.sqrt(tf @ tf)) @ self.coef[idx]
+            scores = np.exp(scores - scores.max())
+            out[row] = scores / scores.sum()
+        return out
+
+
+def load_mood_model(path: str = MODEL_PATH):
+    if not os.path.exists(path):
+        return None
+    import joblib
+    pipe = joblib.load(path)
+    return CompactMoodModel(pipe) if CompactMoodModel.supports(pipe) else pipe
+
+
+def predict_mood_many(texts, model) -> list:
+    """
+    [(bucket, confidence)] for texts, confidence being the top class probability.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    proba = model.predict_proba(texts)
+    best = proba.argmax(axis=1)
+    return [(str(model.classes_[j]), float(proba[i, j])) for i, j in enumerate(best)]
+
+
+def predict_mood(text: str, model) -> (str, float):
+    return predict_mood_many([text], model)[0]
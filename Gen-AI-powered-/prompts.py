@@ -0,0 +1,132 @@
+# prompts.py
+"""
+Versioned prompt templates for the Vertex calls in ml_logic.
+
+  - Each template is a static prefix (instructions, assembled once at import) followed by
+    a short per-call suffix holding the mood and user text. The prefix is byte-identical
+    across calls of a task, which is what Gemini's implicit context caching reuses. (Our
+    prefixes are far below the minimum size for explicit CachedContent.)
+  - User text is budgeted: estimate_tokens() is a local estimate, and texts over
+    PROMPT_INPUT_MAX_TOKENS keep their head and tail (truncate_middle), where journal-style
+    check-ins usually say how the writer feels.
+  - Each task caps its output with max_output_tokens (0 = no cap). Thinking models count
+    thinking tokens against the cap, so generation configs also carry a thinking budget
+    (THINKING_BUDGET, default 0 = no thinking) to keep the cap on the visible answer.
+    Models that cannot turn thinking off (2.5 Pro) need a small budget and higher caps;
+    THINKING_BUDGET=-1 leaves thinking_config out altogether.
+
+Bump PROMPT_VERSION whenever a template changes: it is part of the response cache key.
+"""
+
+import os
+
+PROMPT_VERSION = "v3"
+
+MOOD_BUCKETS = ["Happy", "Sad", "Anxious", "Angry", "Fearful", "Urgent", "Neutral"]
+
+# token budget for the user text in a prompt (0 disables truncation)
+PROMPT_INPUT_MAX_TOKENS = int(os.getenv("PROMPT_INPUT_MAX_TOKENS", "512"))
+HEAD_SHARE = 0.6  # share of the budget kept from the start of the text
+TRUNCATION_MARK = " [...] "
+# thinking tokens allowed per call (-1: don't send thinking_config, model default)
+THINKING_BUDGET = int(os.getenv("THINKING_BUDGET", "0"))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without a tokenizer: ~4 UTF-8 bytes per token. Close for English,
+    and counts Devanagari (3 bytes / char) at about one token per 1.3 characters.
+    """
+    if not text:
+        return 0
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def truncate_middle(text: str, max_tokens: int = None) -> str:
+    """
+    `text` if it fits in max_tokens (estimated), else its head and tail joined by
+    TRUNCATION_MARK, cut at whitespace where possible.
+    """
+    max_tokens = PROMPT_INPUT_MAX_TOKENS if max_tokens is None else max_tokens
+    total = estimate_tokens(text)
+    if max_tokens <= 0 or total <= max_tokens:
+        return text
+    keep = int(len(text) * max_tokens / total) - len(TRUNCATION_MARK)
+    while keep > 0:
+        head_len = int(keep * HEAD_SHARE)
+        head = text[:head_len]
+        tail = text[len(text) - (keep - head_len):]
+        # don't split words: back off to the nearest whitespace in the outer half
+        cut = head.rfind(" ")
+        if cut > head_len // 2:
+            head = head[:cut]
+        cut = tail.find(" ")
+        if 0 <= cut < len(tail) // 2:
+            tail = tail[cut + 1:]
+        out = head.rstrip() + TRUNCATION_MARK + tail.lstrip()
+        if estimate_tokens(out) <= max_tokens:
+            return out
+        keep = int(keep * 0.9)
+    return text[:max(1, max_tokens)]
+
+
+class PromptTemplate:
+    def __init__(self, task: str, prefix: str, suffix: str, max_output_tokens: int = 0):
+        self.task = task
+        self.prefix = prefix
+        self.suffix = suffix
+        self.max_output_tokens = max_output_tokens
+        self.prefix_tokens = estimate_tokens(prefix)
+
+    def render(self, user_text: str, **fields) -> (str, bool):
+        """
+        (prompt, truncated?) for user_text.
+        """
+        text = truncate_middle(user_text)
+        return self.prefix + self.suffix.format(user_text=text, **fields), text is not user_text
+
+    def generation_config(self, **extra) -> dict:
+        """
+        generate_content generation_config as a dict (accepted by the Vertex SDK).
+        """
+        if self.max_output_tokens > 0:
+            extra["max_output_tokens"] = self.max_output_tokens
+        if THINKING_BUDGET >= 0:
+            extra["thinking_config"] = {"thinking_budget": THINKING_BUDGET}
+        return extra
+
+
+def _max_output(task: str, default: int) -> int:
+    return int(os.getenv(f"MAX_OUTPUT_TOKENS_{task.upper()}", str(default)))
+
+
+CLASSIFY = PromptTemplate(
+    "classify",
+    "You are an empathetic classifier. Classify the user's text into ONE of: "
+    + ", ".join(MOOD_BUCKETS)
+    + ". Return only the single category name (no additional text).\n\n",
+    "User text: \"{user_text}\"\nCategory:",
+    _max_output("classify", 64),
+)
+
+AFFIRMATION = PromptTemplate(
+    "affirmation",
+    "You are an empathetic youth support assistant. Create a short positive affirmation tailored "
+    "to the user's mood and input. Maximum 25 words. "
+    "Do NOT provide medical diagnoses or instructions. If the user expresses self-harm, respond with a supportive helpline suggestion instead.\n\n",
+    "User mood: {mood_bucket}\nUser text: \"{user_text}\"\nAffirmation:",
+    _max_output("affirmation", 160),
+)
+
+COMBINED = PromptTemplate(
+    "combined",
+    "You are an empathetic youth support assistant. Classify the user's text into ONE of: "
+    + ", ".join(MOOD_BUCKETS)
+    + ". Then write a short positive affirmation tailored to the user's input. Maximum 25 words. "
+    "Do NOT provide medical diagnoses or instructions. If the user expresses self-harm, use the category Urgent.\n"
+    "Respond with JSON only: {\"mood_bucket\": <category>, \"affirmation\": <affirmation>}.\n\n",
+    "User text: \"{user_text}\"\nJSON:",
+    _max_output("combined", 256),
+)
+
+TEMPLATES = {t.task: t for t in (CLASSIFY, AFFIRMATION, COMBINED)}
@@ -0,0 +1,170 @@
+# response_cache.py
+"""
+Cache for model responses (mood buckets, affirmations), keyed on normalized text.
+
+  - ResponseCache: thread-safe in-process LRU with per-entry TTL and hit/miss/eviction counters.
+  - SqliteStore: optional on-disk second level so cached answers survive restarts.
+
+Callers decide what is cacheable; ml_logic never caches Urgent / flagged results.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lowercase, drop punctuation and collapse whitespace, so "Feeling sad!!" and
+    "feeling  sad" share a key. Uses Unicode categories so Devanagari vowel signs survive.
+    """
+    t = "".join(ch for ch in (text or "").lower() if not unicodedata.category(ch).startswith("P"))
+    return " ".join(t.split())
+
+
+def make_key(*parts) -> str:
+    return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class SqliteStore:
+    """
+    Minimal key -> JSON value store with expiry, shared by all threads of a process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connect()
+
+    def _connect(self):
+        import sqlite3
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None, 0.0
+        value, expires = row
+        if expires < time.time():
+            return None, 0.0
+        return json.loads(value), expires
+
+    def set(self, key, value, expires: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires),
+            )
+            self._conn.commit()
+
+    def reopen(self):
+        """
+        New connection for a forked child; a sqlite connection must not cross fork().
+        The inherited one is dropped without closing it, as the parent still owns it.
+        """
+        self._connect()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache WHERE expires < ?", (time.time(),))
+            self._conn.commit()
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 4096, ttl: float = 3600.0, store: SqliteStore = None):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.store = store
+        self._data = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires >= now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+
+        if self.store is not None:
+            try:
+                value, expires = self.store.get(key)
+            except Exception:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                    self._insert(key, value, expires)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _insert(self, key, value, expires):
+        # caller holds the lock
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key, value):
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._insert(key, value, expires)
+        if self.store is not None:
+            try:
+                self.store.set(key, value, expires)
+            except Exception:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "persistent": self.store is not None,
+            }
+
+
+def build_cache(maxsize: int, ttl: float, path: str = None) -> ResponseCache:
+    store = None
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        store = SqliteStore(path)
+        store.purge_expired()
+    return ResponseCache(maxsize=maxsize, ttl=ttl, store=store)
@@ -1,55 +1,408 @@
 # safety.py
-import re
-from typing import Tuple
-import joblib
+from typing import List, Tuple
+import json
 import os
+from keyword_matcher import DEFAULT_MATCHER
 
-# urgent regex - robust patterns
-URGENT_PATTERNS = [
-    r"\bkill myself\b",
-    r"\bkill me\b",
-    r"\bi want to die\b",
-    r"\bi'm going to kill myself\b",
-    r"\bwant to end my life\b",
-    r"\bsuicid\w*\b",
-    r"\bhurt myself\b",
-    r"\bending my life\b",
-    r"\bwant to die\b"
-]
-URGENT_REGEX = re.compile("|".join(URGENT_PATTERNS), flags=re.IGNORECASE)
+# urgent phrases (English / Hindi / Hinglish) live in keyword_matcher, shared with ml_logic
+URGENT_REGEX = DEFAULT_MATCHER.pattern_for("urgent")  # matches lowercased text
 
 def detect_urgent(text: str) -> bool:
     if not text:
         return False
-    return bool(URGENT_REGEX.search(text))
+    return DEFAULT_MATCHER.has(text, "urgent")
 
 # ---- model wrapper ----
-# we will save a scikit-learn model as safety_model.joblib
+# we will save a scikit-learn model as safety_model.joblib, or a compact directory
+# exported by `python train_safety_model.py export` (see CompactSafetyModel)
 MODEL_PATH = os.getenv("SAFETY_MODEL_PATH", "safety_model.joblib")
 
+def report_path(model_path: str = MODEL_PATH) -> str:
+    """
+    Sweep report written next to the model by `train_safety_model.py sweep`
+    (safety_model.joblib and the compact safety_model/ share safety_model.report.json).
+    """
+    return os.path.splitext(model_path.rstrip("/\\"))[0] + ".report.json"
+
+def _flag_threshold() -> float:
+    # SAFETY_FLAG_THRESHOLD wins; else the threshold tuned by the sweep; else 0.5
+    env = os.getenv("SAFETY_FLAG_THRESHOLD")
+    if env:
+        return float(env)
+    try:
+        with open(report_path(), encoding="utf-8") as f:
+            return float(json.load(f)["threshold"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0.5
+
+FLAG_THRESHOLD = _flag_threshold()
+
+def flag_threshold() -> float:
+    # current value; reload_flag_threshold() replaces it when the model is hot-swapped
+    return FLAG_THRESHOLD
+
+def reload_flag_threshold() -> float:
+    """
+    Re-reads the threshold (env, else the report next to the model) for a newly loaded model.
+    """
+    global FLAG_THRESHOLD
+    FLAG_THRESHOLD = _flag_threshold()
+    return FLAG_THRESHOLD
+
+# export_compact writes each export to its own version directory (v1, v2, ...) and then
+# replaces CURRENT, which names the live one, so a reader never sees a missing model
+COMPACT_CURRENT = "CURRENT"
+
+def compact_dir(path: str) -> str:
+    """
+    Live version directory of a compact model: the one named by path/CURRENT, else `path`
+    itself (exports from before versioning).
+    """
+    try:
+        with open(os.path.join(path, COMPACT_CURRENT), encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return path
+    return os.path.join(path, name) if name else path
+
+class CompactSafetyModel:
+    """
+    sklearn-free scorer for the artifact written by train_safety_model.export_compact.
+    Reproduces TfidfVectorizer's word n-gram analyzer and the linear model's
+    predict_proba with numpy only; the arrays are memory-mapped read-only, so forked
+    workers share one copy of them through the page cache.
+    """
+
+    def __init__(self, path: str):
+        import re
+        import numpy as np
+        path = compact_dir(path)
+        with open(os.path.join(path, "config.json"), encoding="utf-8") as f:
+            cfg = json.load(f)
+        self.path = path
+        self.vocab = np.load(os.path.join(path, "vocab.npy"), mmap_mode="r")
+        self.idf = np.load(os.path.join(path, "idf.npy"), mmap_mode="r")
+        self.coef = np.load(os.path.join(path, "coef.npy"), mmap_mode="r")  # (1 or n_classes, n_features)
+        self.intercept = np.asarray(cfg["intercept"], dtype=np.float64)
+        self.classes_ = np.asarray(cfg["classes"])
+        self.lowercase = cfg["lowercase"]
+        self.ngram_range = tuple(cfg["ngram_range"])
+        self.sublinear_tf = cfg["sublinear_tf"]
+        self.norm = cfg["norm"]
+        self._token = re.compile(cfg["token_pattern"])
+
+    def _analyze(self, text: str):
+        if self.lowercase:
+            text = text.lower()
+        tokens = self._token.findall(text)
+        lo, hi = self.ngram_range
+        terms = tokens if lo == 1 else []
+        for n in range(max(lo, 2), hi + 1):
+            terms += [" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+        return terms
+
+    def decision_function(self, texts):
+        import numpy as np
+        texts = list(texts)
+        n_docs, n_features = len(texts), len(self.vocab)
+        terms, docs = [], []
+        for i, text in enumerate(texts):
+            t = self._analyze(str(text))
+            terms += t
+            docs += [i] * len(t)
+        scores = np.tile(self.intercept, (n_docs, 1))
+        if not terms or not n_features:
+            return scores
+
+        # vocabulary lookup for every term of every text in one searchsorted
+        terms = np.asarray(terms, dtype=str)
+        pos = np.minimum(np.searchsorted(self.vocab, terms), n_features - 1)
+        hit = self.vocab[pos] == terms
+        docs = np.asarray(docs, dtype=np.int64)[hit]
+        cells, tf = np.unique(docs * n_features + pos[hit], return_counts=True)
+        d, j = cells // n_features, cells % n_features
+
+        w = (1.0 + np.log(tf)) if self.sublinear_tf else tf.astype(np.float64)
+        w *= self.idf[j]
+        if self.norm == "l2":
+            w /= np.sqrt(np.bincount(d, w * w, minlength=n_docs))[d]
+        elif self.norm == "l1":
+            w /= np.bincount(d, np.abs(w), minlength=n_docs)[d]
+        for k in range(scores.shape[1]):
+            scores[:, k] += np.bincount(d, w * self.coef[k, j], minlength=n_docs)
+        return scores
+
+    def predict_proba(self, texts):
+        import numpy as np
+        scores = self.decision_function(texts)
+        if scores.shape[1] == 1:
+            p = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        scores -= scores.max(axis=1, keepdims=True)
+        e = np.exp(scores)
+        return e / e.sum(axis=1, keepdims=True)
+
 def load_safety_model():
+    if os.path.isdir(MODEL_PATH):
+        return CompactSafetyModel(MODEL_PATH)
     if os.path.exists(MODEL_PATH):
+        import joblib  # deferred: pulls in numpy/scipy, only needed when a model exists
         return joblib.load(MODEL_PATH)
     return None
 
+def _flag_column(model) -> int:
+    """
+    Index of the 'flag' class in model.predict_proba output, or -1 if absent.
+    """
+    for i, cls in enumerate(model.classes_):
+        if str(cls).lower() in ("flag","unsafe","1","true"):
+            return i
+    return -1
+
+def predict_safety_many(texts, model, threshold: float = None) -> List[Tuple[str, float]]:
+    """
+    Batch version of predict_safety: vectorizes all texts and runs a single
+    predict_proba call. Returns a list of (label, score) in input order.
+    """
+    threshold = FLAG_THRESHOLD if threshold is None else threshold
+    texts = list(texts)
+    if model is None:
+        return [("unknown", 0.0)] * len(texts)
+    if not texts:
+        return []
+    proba = model.predict_proba(texts)
+    col = _flag_column(model)
+    out = []
+    for row in proba:
+        score_flag = float(row[col]) if col >= 0 else 0.0
+        out.append(("flag" if score_flag >= threshold else "safe", score_flag))
+    return out
+
 def predict_safety(text: str, model) -> Tuple[str, float]:
     """
     Returns (label, score) where label in {'safe','flag'}.
     If model is None, returns ('unknown', 0.0)
     """
+    return predict_safety_many([text], model)[0]
+
+# ---- bulk scoring ----
+# Scans whole CSV exports: texts are read in chunks, vectorized once per chunk and scored
+# with one predict_proba over the sparse matrix. Chunks run in parallel via joblib and the
+# TF-IDF matrices can be cached on disk (uncompressed .npy, memory-mapped on reload) so
+# re-scoring or threshold sweeps skip tokenization entirely.
+BULK_CHUNKSIZE = int(os.getenv("SAFETY_BULK_CHUNKSIZE", "20000"))
+
+def _split_model(model):
+    """
+    (vectorizer, classifier) of a fitted Pipeline; vectorizer is None for other models.
+    """
+    steps = getattr(model, "steps", None)
+    if steps and len(steps) > 1:
+        return model[:-1], model[-1]
+    return None, model
+
+def _flag_scores(clf, X):
+    import numpy as np
+    col = _flag_column(clf)
+    if col < 0:
+        return np.zeros(X.shape[0] if hasattr(X, "shape") else len(X))
+    return np.asarray(clf.predict_proba(X)[:, col])
+
+def _score_chunk(model, texts, keep_features=False):
+    """
+    Flag scores for one chunk of texts; also returns the CSR feature matrix when asked
+    (for the feature cache), otherwise None so it is not shipped back from the worker.
+    """
+    vectorizer, clf = _split_model(model)
+    if vectorizer is None:
+        return None, _flag_scores(clf, texts)
+    X = vectorizer.transform(texts).tocsr()
+    return (X if keep_features else None), _flag_scores(clf, X)
+
+class FeatureCache:
+    """
+    Directory of per-chunk CSR matrices (data / indices / indptr .npy files) plus a
+    meta.json written last, so an interrupted run is never mistaken for a complete one.
+    """
+
+    def __init__(self, root: str, key: str):
+        self.path = os.path.join(root, key)
+
+    @staticmethod
+    def key_for(src: str, column: str, vectorizer) -> str:
+        """
+        Keyed on the source file and on the fitted vectorizer itself (not on whatever
+        MODEL_PATH points to), so a model passed in directly never reuses stale features.
+        """
+        import hashlib
+        import joblib
+        parts = [os.path.abspath(src), column, joblib.hash(vectorizer)]
+        if os.path.exists(src):
+            st = os.stat(src)
+            parts += [str(st.st_mtime_ns), str(st.st_size)]
+        return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    def complete(self) -> bool:
+        return os.path.exists(os.path.join(self.path, "meta.json"))
+
+    def _file(self, i, part):
+        return os.path.join(self.path, f"chunk_{i:05d}.{part}.npy")
+
+    def save_chunk(self, i, X, ids):
+        import numpy as np
+        os.makedirs(self.path, exist_ok=True)
+        for part in ("data", "indices", "indptr"):
+            np.save(self._file(i, part), getattr(X, part))
+        np.save(self._file(i, "ids"), np.asarray(ids, dtype=object), allow_pickle=True)
+        return X.shape
+
+    def finish(self, shapes):
+        os.makedirs(self.path, exist_ok=True)  # no chunks were saved for an empty source
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"shapes": shapes}, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def chunks(self):
+        """
+        Yields (ids, X) with X's arrays memory-mapped read-only.
+        """
+        import numpy as np
+        from scipy import sparse
+        with open(os.path.join(self.path, "meta.json")) as f:
+            shapes = json.load(f)["shapes"]
+        for i, shape in enumerate(shapes):
+            arrays = [np.load(self._file(i, part), mmap_mode="r") for part in ("data", "indices", "indptr")]
+            ids = np.load(self._file(i, "ids"), allow_pickle=True)
+            yield ids, sparse.csr_matrix(tuple(arrays), shape=tuple(shape), copy=False)
+
+def iter_text_chunks(src: str, column: str = "text", id_column: str = "id", chunksize: int = BULK_CHUNKSIZE):
+    """
+    Yields (ids, texts) lists from a CSV without loading it whole. Rows are numbered when
+    there is no `id_column`.
+    """
+    import pandas as pd
+    offset = 0
+    for df in pd.read_csv(src, chunksize=chunksize, dtype={column: str}, keep_default_na=False):
+        if column not in df.columns:
+            raise ValueError(f"column '{column}' not in {src}")
+        if df.empty:
+            continue
+        ids = df[id_column].tolist() if id_column in df.columns else list(range(offset, offset + len(df)))
+        offset += len(df)
+        yield ids, df[column].tolist()
+
+class _ScoreWriter:
+    """
+    Appends (id, label, score) rows to CSV, or Parquet when dst ends in .parquet.
+    """
+
+    def __init__(self, dst: str):
+        self.dst = dst
+        self.parquet = dst.endswith(".parquet")
+        self._writer = None
+        self._first = True
+
+    def write(self, ids, scores, threshold):
+        import pandas as pd
+        df = pd.DataFrame({
+            "id": list(ids),
+            "label": ["flag" if s >= threshold else "safe" for s in scores],
+            "score": scores,
+        })
+        if self.parquet:
+            import pyarrow as pa  # optional; only needed for Parquet output
+            import pyarrow.parquet as pq
+            # empty input still gets a typed schema (pandas would infer null columns)
+            schema = pa.schema([("id", pa.int64()), ("label", pa.string()), ("score", pa.float64())]) if df.empty else None
+            table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.dst, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.dst, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._first:
+            self.write([], [], FLAG_THRESHOLD)  # header-only file / schema-only table for empty input
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+def bulk_score(src: str, dst: str, model, column: str = "text", chunksize: int = BULK_CHUNKSIZE,
+               n_jobs: int = -1, feature_cache: str = None, threshold: float = None) -> dict:
+    """
+    Scores every row of `src` into `dst` (id, label, score). With `feature_cache` set,
+    TF-IDF matrices are written there on the first run and reused afterwards.
+    Returns {"rows", "flagged", "seconds", "texts_per_sec", "from_cache"}.
+    """
+    import itertools
+    import time
+    from joblib import Parallel, delayed, effective_n_jobs
+
     if model is None:
-        return ("unknown", 0.0)
-    X = [text]
-    proba = model.predict_proba(X)[0]  # assume columns [safe, flag] or [flag, safe] - check order
-    # We'll assume model.classes_ gives labels
-    # find index for 'flag'
-    classes = model.classes_
-    score_flag = 0.0
-    for cls, p in zip(classes, proba):
-        if str(cls).lower() in ("flag","unsafe","1","true"):
-            score_flag = p
-    # Decide threshold
-    if score_flag >= 0.5:
-        return ("flag", float(score_flag))
-    else:
-        return ("safe", float(score_flag))
+        raise RuntimeError("no safety model loaded")
+    threshold = FLAG_THRESHOLD if threshold is None else threshold
+    t0 = time.perf_counter()
+    rows = flagged = 0
+    writer = _ScoreWriter(dst)
+    cache = None
+    vectorizer, clf = _split_model(model)
+    if feature_cache and vectorizer is not None:
+        cache = FeatureCache(feature_cache, FeatureCache.key_for(src, column, vectorizer))
+    from_cache = cache is not None and cache.complete()
+
+    try:
+        if from_cache:
+            for ids, X in cache.chunks():
+                scores = _flag_scores(clf, X)
+                writer.write(ids, scores, threshold)
+                rows += len(ids)
+                flagged += int((scores >= threshold).sum())
+        else:
+            shapes = []
+            chunks = iter_text_chunks(src, column, chunksize=chunksize)
+            # one chunk per worker at a time keeps memory flat on huge files
+            per_round = effective_n_jobs(n_jobs)
+            with Parallel(n_jobs=n_jobs) as parallel:
+                while True:
+                    batch = list(itertools.islice(chunks, per_round))
+                    if not batch:
+                        break
+                    results = parallel(delayed(_score_chunk)(model, texts, cache is not None)
+                                       for _, texts in batch)
+                    for (ids, _), (X, scores) in zip(batch, results):
+                        if cache is not None:
+                            shapes.append(cache.save_chunk(len(shapes), X, ids))
+                        writer.write(ids, scores, threshold)
+                        rows += len(ids)
+                        flagged += int((scores >= threshold).sum())
+            if cache is not None:
+                cache.finish(shapes)
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - t0
+    return {
+        "rows": rows,
+        "flagged": flagged,
+        "seconds": round(seconds, 3),
+        "texts_per_sec": round(rows / seconds, 1) if seconds > 0 else 0.0,
+        "from_cache": from_cache,
+    }
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Bulk safety scoring of a CSV of texts.")
+    parser.add_argument("src", help="input CSV")
+    parser.add_argument("dst", help="output .csv or .parquet (id, label, score)")
+    parser.add_argument("--column", default="text")
+    parser.add_argument("--chunksize", type=int, default=BULK_CHUNKSIZE)
+    parser.add_argument("--jobs", type=int, default=-1)
+    parser.add_argument("--feature-cache", default=None, help="directory for cached TF-IDF matrices")
+    parser.add_argument("--threshold", type=float, default=None, help="default: FLAG_THRESHOLD")
+    args = parser.parse_args()
+    print(json.dumps(bulk_score(args.src, args.dst, load_safety_model(), column=args.column,
+                                chunksize=args.chunksize, n_jobs=args.jobs,
+                                feature_cache=args.feature_cache, threshold=args.threshold)))
@@ -0,0 +1,147 @@
+# seed_bundle.py
+"""
+Compiled seed data (affirmations, health tips, moods in English and Hindi), built by
+build_seed_bundle.py and loaded here without pandas.
+
+Layout: SEED_BUNDLE_PATH/CURRENT names the live version directory (v1, v2, ...), which
+holds manifest.json plus one .npy file per column:
+  - "str" columns: UTF-8 bytes of all values back to back (uint8) and
+    <table>.<column>.offsets.npy (int64, rows + 1)
+  - "dict" columns (tags, language, flags): small integer codes, the values in the manifest
+  - "int" / "float" columns: plain arrays (float NaN = missing)
+
+Columns are memory-mapped and decoded on first use, so loading a bundle only reads the
+manifest. A rebuild writes a new version directory and then replaces CURRENT, so readers
+never see a half-written bundle.
+"""
+
+import json
+import os
+
+BUNDLE_PATH = os.getenv("SEED_BUNDLE_PATH", "seed_bundle")
+FORMAT_VERSION = 1
+CURRENT = "CURRENT"
+MANIFEST = "manifest.json"
+
+
+def current_dir(path: str = BUNDLE_PATH):
+    """
+    The live version directory under `path`, or None if no bundle has been built.
+    """
+    try:
+        with open(os.path.join(path, CURRENT), encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    directory = os.path.join(path, name)
+    return directory if name and os.path.isdir(directory) else None
+
+
+def column_files(table: str, column: str, kind: str) -> list:
+    files = [f"{table}.{column}.npy"]
+    if kind == "str":
+        files.append(f"{table}.{column}.offsets.npy")
+    return files
+
+
+def encode_column(values: list, kind: str) -> (dict, dict):
+    """
+    ({file name suffix: array}, manifest entry) for one column; suffixes are "" and
+    ".offsets" (see column_files).
+    """
+    import numpy as np
+    if kind == "str":
+        encoded = [str(v).encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return {"": blob, ".offsets": offsets}, {"kind": kind}
+    if kind == "dict":
+        uniques = sorted(set(values))
+        code = {v: i for i, v in enumerate(uniques)}
+        dtype = np.uint8 if len(uniques) <= 256 else np.uint16
+        return {"": np.array([code[v] for v in values], dtype=dtype)}, {"kind": kind, "values": uniques}
+    if kind == "int":
+        return {"": np.array(values, dtype=np.int32)}, {"kind": kind}
+    if kind == "float":
+        return {"": np.array([float("nan") if v is None else v for v in values], dtype=np.float64)}, {"kind": kind}
+    raise ValueError(f"unknown column kind {kind!r}")
+
+
+class SeedBundle:
+    def __init__(self, directory: str, manifest: dict):
+        self.directory = directory
+        self.manifest = manifest
+        self._columns = {}
+
+    @property
+    def version(self) -> int:
+        return self.manifest["version"]
+
+    @property
+    def tables(self) -> list:
+        return list(self.manifest["tables"])
+
+    def num_rows(self, table: str) -> int:
+        return self.manifest["tables"][table]["rows"]
+
+    def _array(self, name: str):
+        import numpy as np
+        return np.load(os.path.join(self.directory, name), mmap_mode="r")
+
+    def column(self, table: str, name: str) -> list:
+        """
+        Decoded values of one column (cached); None for missing floats.
+        """
+        key = (table, name)
+        values = self._columns.get(key)
+        if values is None:
+            meta = self.manifest["tables"][table]["columns"][name]
+            kind = meta["kind"]
+            files = column_files(table, name, kind)
+            if kind == "str":
+                blob, offsets = bytes(self._array(files[0])), self._array(files[1]).tolist()
+                values = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+            elif kind == "dict":
+                lookup = meta["values"]
+                values = [lookup[c] for c in self._array(files[0]).tolist()]
+            elif kind == "float":
+                values = [None if v != v else v for v in self._array(files[0]).tolist()]
+            else:
+                values = self._array(files[0]).tolist()
+            self._columns[key] = values
+        return values
+
+    def rows(self, table: str, columns, language: str = None) -> list:
+        """
+        [(value, ...)] for `columns`, optionally only the rows in `language` ("en" / "hi").
+        """
+        cols = [self.column(table, c) for c in columns]
+        rows = zip(*cols) if cols else iter(())
+        if language is None:
+            return list(rows)
+        langs = self.column(table, "language")
+        return [row for row, lang in zip(rows, langs) if lang == language]
+
+    def frame(self, table: str, language: str = None):
+        """
+        pandas DataFrame of a table, for callers that still want one.
+        """
+        import pandas as pd
+        columns = list(self.manifest["tables"][table]["columns"])
+        return pd.DataFrame(self.rows(table, columns, language), columns=columns)
+
+
+def load_bundle(path: str = BUNDLE_PATH):
+    """
+    The current SeedBundle under `path`, or None if there is none (or it was built by an
+    incompatible build_seed_bundle.py).
+    """
+    directory = current_dir(path)
+    if directory is None:
+        return None
+    with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        return None
+    return SeedBundle(directory, manifest)
@@ -0,0 +1,132 @@
+# semantic_cache.py
+"""
+Near-duplicate cache for mood classification, built on a fitted TfidfVectorizer
+(the first step of the safety pipeline trained by train_safety_model.py).
+
+Recently classified texts are kept as L2-normalized sparse rows in a CSR matrix, so a
+lookup is one sparse mat-vec product (cosine similarity against every cached text).
+If the best neighbor is above `threshold`, its mood bucket is reused.
+
+Storage is an append-only ring: new rows go to a small pending list, the oldest rows
+are evicted first (FIFO) by advancing `_start`, and dead rows / pending rows are
+folded into a fresh CSR matrix every `compact_every` inserts.
+"""
+
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+
+
+def _stack_rows(rows, n_features):
+    """
+    Stack 1-row CSR matrices; much cheaper than sp.vstack for many tiny rows.
+    """
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([r.nnz for r in rows], out=indptr[1:])
+    indices = np.concatenate([r.indices for r in rows]) if rows else np.zeros(0, dtype=np.int32)
+    data = np.concatenate([r.data for r in rows]) if rows else np.zeros(0, dtype=np.float32)
+    return sp.csr_matrix((data, indices, indptr), shape=(len(rows), n_features))
+
+
+def vectorizer_from_pipeline(model):
+    """
+    Return the fitted vectorizer (first pipeline step with .transform) or None.
+    """
+    steps = getattr(model, "steps", None)
+    if not steps:
+        return None
+    first = steps[0][1]
+    return first if hasattr(first, "transform") and hasattr(first, "vocabulary_") else None
+
+
+class SemanticCache:
+    def __init__(self, vectorizer, capacity: int = 20000, threshold: float = 0.85, compact_every: int = 256):
+        self.vectorizer = vectorizer
+        self.capacity = max(1, capacity)
+        self.threshold = threshold
+        self.compact_every = max(1, compact_every)
+        self._n_features = len(vectorizer.vocabulary_)
+        self._matrix = sp.csr_matrix((0, self._n_features), dtype=np.float32)
+        self._pending = []
+        self._labels = []   # aligned with matrix rows followed by pending rows
+        self._start = 0     # rows before this index are evicted
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._labels) - self._start
+
+    def vectorize(self, text: str):
+        vec = sp.csr_matrix(self.vectorizer.transform([text]), dtype=np.float32)
+        if getattr(self.vectorizer, "norm", None) != "l2":
+            norm = np.sqrt(vec.multiply(vec).sum())
+            if norm > 0:
+                vec = sp.csr_matrix(vec / norm)
+        return vec
+
+    def lookup(self, text: str):
+        """
+        Returns (label or None, vector); pass the vector back to add() on a miss.
+        """
+        vec = self.vectorize(text)
+        if vec.nnz == 0:
+            with self._lock:
+                self.misses += 1
+            return None, vec
+
+        with self._lock:
+            matrix, pending, labels, start = self._matrix, list(self._pending), self._labels, self._start
+            n_rows = matrix.shape[0] + len(pending)
+
+        best_idx, best_score = -1, -1.0
+        if n_rows > start:
+            col = vec.T
+            scores = (matrix @ col).toarray().ravel()
+            if pending:
+                scores = np.concatenate([scores, (_stack_rows(pending, self._n_features) @ col).toarray().ravel()])
+            scores[:start] = -1.0
+            best_idx = int(scores.argmax())
+            best_score = float(scores[best_idx])
+
+        with self._lock:
+            if best_score >= self.threshold:
+                self.hits += 1
+                return labels[best_idx], vec
+            self.misses += 1
+        return None, vec
+
+    def add(self, vec, label):
+        if vec is None or vec.nnz == 0:
+            return
+        with self._lock:
+            # append-only between compactions, so indices in a lookup's snapshot stay valid
+            self._pending.append(vec)
+            self._labels.append(label)
+            if len(self) > self.capacity:
+                self._start += 1
+                self.evictions += 1
+            if len(self._pending) >= self.compact_every or self._start >= self.capacity // 2:
+                self._compact()
+
+    def _compact(self):
+        # caller holds the lock
+        skip_pending = max(0, self._start - self._matrix.shape[0])
+        self._matrix = sp.vstack([self._matrix[self._start:],
+                                  _stack_rows(self._pending[skip_pending:], self._n_features)], format="csr")
+        self._labels = self._labels[self._start:]
+        self._pending = []
+        self._start = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self),
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
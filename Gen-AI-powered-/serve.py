@@ -1,30 +1,107 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from ml_logic import init_vertex, analyze_and_respond
+from ml_logic import (warmup, readiness, analyze_and_respond, analyze_and_respond_stream, analyze_many,
+                      batched_safety, cache_stats)
+from serve_common import HTTP_REQUESTS, HTTP_SECONDS, batch_error, sse_event, text_error, timings_requested
+import metrics
 import logging
+import time
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend calls
 
+def wants_timings(data) -> bool:
+    return timings_requested(data, request.args)
+
+@app.before_request
+def _start_timer():
+    g.start = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    # the route pattern, not the raw path, to keep label cardinality bounded
+    path = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    HTTP_REQUESTS.inc(path=path, status=response.status_code)
+    HTTP_SECONDS.observe(time.perf_counter() - g.get("start", time.perf_counter()), path=path)
+    return response
+
 # Health check endpoint for Cloud Run
 @app.route("/health", methods=["GET"])
 def health():
     return jsonify({"status": "healthy"}), 200
 
+# Readiness: 503 until CSVs / safety model are loaded and Vertex (or fallback) can answer
+@app.route("/ready", methods=["GET"])
+def ready():
+    state = readiness()
+    return jsonify(state), 200 if state["ready"] else 503
+
+# Cache counters (hits / misses / evictions) for this process
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify(cache_stats()), 200
+
+# Prometheus text format: per-stage latencies, Vertex calls / tokens, fallbacks, caches
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
 @app.route("/analyze", methods=["POST"])
 def analyze():
     try:
         data = request.get_json()
-        if not data or "text" not in data:
-            return jsonify({"error": "Missing 'text' field"}), 400
+        error = text_error(data)
+        if error:
+            return jsonify(error[1]), error[0]
         
         text = data.get("text", "")
-        result = analyze_and_respond(text)
-        return jsonify(result)
+        # the safety model runs on a micro-batch shared with concurrent requests
+        if not wants_timings(data):
+            return jsonify(analyze_and_respond(text, safety=batched_safety(text)))
+        with metrics.collect_timings() as timings:
+            result = analyze_and_respond(text, safety=batched_safety(text))
+        return jsonify(dict(result, timings=timings))
     except Exception as e:
         logging.error(f"Error in analyze endpoint: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+# Server-Sent Events: "mood" (bucket + playlist), then "token"s of the affirmation, then
+# "done" with the same body /analyze returns. POST {"text": ...}, or GET ?text= for EventSource.
+@app.route("/analyze/stream", methods=["GET", "POST"])
+def analyze_stream():
+    data = request.get_json(silent=True) if request.method == "POST" else request.args
+    error = text_error(data)
+    if error:
+        return jsonify(error[1]), error[0]
+    text = data.get("text", "")
+
+    def events():
+        try:
+            for event, payload in analyze_and_respond_stream(text, safety=batched_safety(text)):
+                yield sse_event(event, payload)
+        except Exception as e:
+            # headers are already sent; report the failure in-band
+            logging.error(f"Error in analyze_stream endpoint: {e}")
+            yield sse_event("error", {"error": "Internal server error"})
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/analyze/batch", methods=["POST"])
+def analyze_batch():
+    try:
+        data = request.get_json()
+        error = batch_error(data)
+        if error:
+            return jsonify(error[1]), error[0]
+
+        results = analyze_many(data["texts"])
+        return jsonify({"results": results})
+    except Exception as e:
+        logging.error(f"Error in analyze_batch endpoint: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
 if __name__ == "__main__":
-    init_vertex()
+    # development server; production runs `gunicorn -c gunicorn.conf.py serve:app`
+    warmup(vertex=True)
     app.run(host="0.0.0.0", port=8080)
\ No newline at end of file
@@ -0,0 +1,213 @@
+# serve_asgi.py
+"""
+ASGI entry point exposing the same endpoints as serve.py, backed by the async
+Vertex layer so a request waiting on the model does not hold a worker thread.
+Request validation and SSE framing are shared with serve.py (serve_common.py).
+
+Not the production entrypoint (the Dockerfile runs gunicorn with serve:app); run with:
+  uvicorn serve_asgi:app --host 0.0.0.0 --port 8080
+"""
+
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import parse_qsl
+
+import metrics
+from ml_logic import (warmup, readiness, analyze_and_respond_async, analyze_and_respond_stream, analyze_many,
+                      cache_stats, shutdown, submit_safety)
+from serve_common import HTTP_REQUESTS, HTTP_SECONDS, batch_error, sse_event, text_error, timings_requested
+
+logger = logging.getLogger("serve_asgi")
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"content-type"),
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+]
+
+
+async def _read_json(receive):
+    body = b""
+    more = True
+    while more:
+        message = await receive()
+        body += message.get("body", b"")
+        more = message.get("more_body", False)
+    try:
+        return json.loads(body or b"null")
+    except ValueError:
+        return None
+
+
+def _query(scope) -> dict:
+    # GET parameters (last value wins), e.g. ?text= from an EventSource
+    return dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())] + CORS_HEADERS,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def health(data, query):
+    return 200, {"status": "healthy"}
+
+
+async def ready(data, query):
+    state = readiness()
+    return (200 if state["ready"] else 503), state
+
+
+async def stats(data, query):
+    return 200, cache_stats()
+
+
+async def _safety(text):
+    # micro-batched safety screen, awaited without blocking the loop; None lets the
+    # pipeline score the text itself
+    fut = submit_safety(text)
+    if fut is None:
+        return None
+    try:
+        with metrics.stage("safety_batch"):
+            return await asyncio.wrap_future(fut)
+    except Exception as e:
+        logger.error(f"Batched safety screen failed: {e}")
+        return None
+
+
+async def analyze(data, query):
+    error = text_error(data)
+    if error:
+        return error
+    text = data.get("text", "")
+    if not timings_requested(data, query):
+        return 200, await analyze_and_respond_async(text, safety=await _safety(text))
+    # the collecting context is per asyncio task, so concurrent requests stay separate
+    with metrics.collect_timings() as timings:
+        result = await analyze_and_respond_async(text, safety=await _safety(text))
+    return 200, dict(result, timings=timings)
+
+
+async def analyze_batch(data, query):
+    error = batch_error(data)
+    if error:
+        return error
+    # batch path has its own bounded thread pool; keep it off the event loop
+    return 200, {"results": await asyncio.to_thread(analyze_many, data["texts"])}
+
+
+async def analyze_stream(send, data):
+    # the streaming generator is synchronous; pull each event in a worker thread
+    error = text_error(data)
+    if error:
+        return await _send_json(send, *error)
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")] + CORS_HEADERS,
+    })
+    text = data.get("text", "")
+    events = analyze_and_respond_stream(text, safety=await _safety(text))
+    done = object()
+    failed = False
+    try:
+        while not failed:
+            try:
+                item = await asyncio.to_thread(next, events, done)
+            except Exception as e:
+                # headers are already sent; report the failure in-band
+                logger.error(f"Error in /analyze/stream endpoint: {e}")
+                item, failed = ("error", {"error": "Internal server error"}), True
+            if item is done:
+                break
+            # a failed send (client gone) propagates: nothing more is sent on this connection
+            await send({"type": "http.response.body", "body": sse_event(*item).encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        # ends the upstream Vertex stream (and frees its concurrency slot) when we stop early
+        try:
+            await asyncio.to_thread(events.close)
+        except ValueError:
+            pass  # still inside next() in a worker thread after a cancel; it finishes on its own
+
+
+async def metrics_endpoint(send, data):
+    body = metrics.render().encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", metrics.CONTENT_TYPE.encode()),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# endpoints that write their own response: handler(send, data)
+STREAM_ROUTES = {
+    ("GET", "/analyze/stream"): analyze_stream,
+    ("POST", "/analyze/stream"): analyze_stream,
+    ("GET", "/metrics"): metrics_endpoint,
+}
+
+ROUTES = {
+    ("GET", "/health"): health,
+    ("GET", "/ready"): ready,
+    ("GET", "/stats"): stats,
+    ("POST", "/analyze"): analyze,
+    ("POST", "/analyze/batch"): analyze_batch,
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # loads CSVs / safety model and inits Vertex; logs failures, never raises
+            await asyncio.to_thread(warmup, True)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # flushes the safety batcher and closes the response cache, like gunicorn's worker_exit
+            await asyncio.to_thread(shutdown)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"].rstrip("/") or "/"
+    if method == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204, "headers": CORS_HEADERS})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    if (method, path) in STREAM_ROUTES:
+        data = await _read_json(receive) if method == "POST" else _query(scope)
+        return await STREAM_ROUTES[(method, path)](send, data)
+
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        return await _send_json(send, 404, {"error": "Not found"})
+
+    data = await _read_json(receive) if method == "POST" else None
+    t0 = time.perf_counter()
+    try:
+        status, payload = await handler(data, _query(scope))
+    except Exception as e:
+        logger.error(f"Error in {path} endpoint: {e}")
+        status, payload = 500, {"error": "Internal server error"}
+    await _send_json(send, status, payload)
+    HTTP_REQUESTS.inc(path=path, status=status)
+    HTTP_SECONDS.observe(time.perf_counter() - t0, path=path)
@@ -0,0 +1,47 @@
+# serve_common.py
+"""
+Framework-free pieces shared by serve.py (Flask) and serve_asgi.py: request validation,
+SSE framing and the HTTP metrics, so neither server has to import the other.
+"""
+
+import json
+import os
+
+import metrics
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "256"))
+
+HTTP_REQUESTS = metrics.REGISTRY.counter("http_requests_total", "HTTP requests by route and status", ("path", "status"))
+HTTP_SECONDS = metrics.REGISTRY.histogram("http_request_seconds", "HTTP request latency by route", ("path",))
+
+
+# Request validation: (status, body) for a bad request, else None
+def text_error(data):
+    if not isinstance(data, dict) or "text" not in data:
+        return 400, {"error": "Missing 'text' field"}
+    if not isinstance(data["text"], str):
+        return 400, {"error": "'text' must be a string"}
+    return None
+
+
+def batch_error(data):
+    texts = data.get("texts") if isinstance(data, dict) else None
+    if not isinstance(texts, list):
+        return 400, {"error": "Missing 'texts' list"}
+    if len(texts) > MAX_BATCH_SIZE:
+        return 413, {"error": f"Batch too large (max {MAX_BATCH_SIZE})"}
+    if not all(isinstance(t, str) for t in texts):
+        return 400, {"error": "'texts' must be a list of strings"}
+    return None
+
+
+def timings_requested(data, args) -> bool:
+    # opt-in per request: {"timings": true} in the body or ?timings=1
+    flag = data.get("timings") if isinstance(data, dict) else None
+    if flag is None:
+        flag = args.get("timings")
+    return flag in (True, 1, "1", "true")
+
+
+def sse_event(event, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,95 @@
+# singleflight.py
+"""
+In-flight request coalescing ("single flight").
+
+While a call for `key` is running, further calls with the same key do not start their
+own; they wait for the running one and share its result (or its exception). Nothing is
+kept once the call finishes, so this only deduplicates concurrent work; the response
+cache covers repeats over time.
+
+  - SingleFlight:      threads (Flask / gunicorn gthread, analyze_many).
+  - AsyncSingleFlight: asyncio (serve_asgi). The shared call runs as its own task, so a
+                       caller that is cancelled (client went away) does not cancel it
+                       for the others.
+
+Both return (result, shared): shared is True for callers that joined someone else's call.
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._loop = None
+
+    def _table(self) -> dict:
+        # tasks are bound to one loop; start over if we are driven by a new one
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._calls = {}
+            self._loop = loop
+        return self._calls
+
+    async def do(self, key, coro_fn, *args, **kwargs):
+        calls = self._table()
+        task = calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = calls[key] = asyncio.ensure_future(coro_fn(*args, **kwargs))
+
+            def _finished(t):
+                if calls.get(key) is t:
+                    del calls[key]
+                if not t.cancelled():
+                    t.exception()  # retrieved, even if every caller was cancelled
+            task.add_done_callback(_finished)
+        return await asyncio.shield(task), shared
+
+    def in_flight(self) -> int:
+        return len(self._calls)
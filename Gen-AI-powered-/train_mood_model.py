@@ -0,0 +1,228 @@
+# train_mood_model.py
+"""
+Trains the local mood classifier (mood_model.py): char n-gram TF-IDF + LogisticRegression
+over the mood buckets. Char n-grams work the same for English, Devanagari Hindi and
+romanized Hinglish, with no tokenizer or language detection.
+
+Training data: the seed moods (the seed bundle from build_seed_bundle.py if there is one,
+else moods.csv and moods_hindi.csv; both the example_text and the notes
+column, with mood_label mapped to a bucket by TAG_TO_BUCKET) plus optional labeled
+check-ins (--checkins, e.g. texts with the bucket Vertex gave them).
+
+The confidence threshold is calibrated on a labeled set (--eval, else out-of-fold
+predictions on the training data): the lowest threshold whose locally answered texts reach
+--target-accuracy. The report next to the model (mood_model.report.json) has the whole
+escalation rate / accuracy curve.
+
+Usage:
+  python train_mood_model.py [--checkins labeled.csv] [--eval labeled.csv] [--target-accuracy 0.9]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+
+from mood_model import MODEL_PATH
+from prompts import MOOD_BUCKETS
+from safety import report_path
+from seed_bundle import load_bundle
+from train_safety_model import save_atomic
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEED_CSVS = [
+    os.path.join(HERE, "moods.csv"),
+    os.path.join(HERE, "moods_hindi.csv"),
+]
+TARGET_ACCURACY = 0.9
+CURVE_THRESHOLDS = [round(t, 2) for t in np.arange(0.2, 1.0, 0.05)]
+
+# seed mood_label -> bucket
+TAG_TO_BUCKET = {
+    "Happy": ["happy", "excited", "hopeful", "perky", "playful", "light-hearted", "fun", "cheerful", "passionate",
+              "vivacious", "motivated", "sunny", "energetic", "breezy", "bright", "animated", "zestful",
+              "rejuvenated", "joyful"],
+    "Sad": ["sad", "depressed", "lonely", "betrayed", "lost", "abandoned", "dejected", "rejected", "gloomy", "glum",
+            "heartbroken", "miserable", "mournful", "pessimistic", "wretched", "dark", "regretful", "guilty",
+            "sorrowful", "unmotivated", "alienated", "isolated", "disheartened", "weary", "grieving", "dismayed",
+            "melancholy", "wistful", "exhausted", "burnt-out", "fatigued"],
+    "Anxious": ["anxious", "stressed", "apprehensive", "erratic", "nervous", "overwhelmed", "restless",
+                "tense", "uneasy", "unstable", "unsteady", "burdened", "panicked", "troubled", "disconcerted"],
+    "Angry": ["angry", "hostile", "impatient", "jealous", "possessive", "resentful", "unfriendly", "defensive",
+              "agitated"],
+    "Fearful": ["fearful", "ominous", "scared", "horrified", "terrified", "afraid", "disturbed", "daunted",
+                "intimidated"],
+    "Urgent": ["suicidal"],
+    # "confused" is the mood_tag the affirmation fallback serves for Neutral (affirmation_index.MOOD_MAPPING)
+    "Neutral": ["neutral", "confused", "aloof", "nonchalant", "reflective", "shy", "sentimental", "strange", "weird",
+                "unknown", "unaffected", "laid-back", "peaceful", "mellow", "placid", "pensive", "content", "soothed",
+                "serene", "solemn", "nostalgic", "horny"],
+}
+_BUCKET_OF_TAG = {tag: bucket for bucket, tags in TAG_TO_BUCKET.items() for tag in tags}
+
+
+def tag_to_bucket(tag):
+    tag = str(tag).strip().lower()
+    if tag in _BUCKET_OF_TAG:
+        return _BUCKET_OF_TAG[tag]
+    return next((b for b in MOOD_BUCKETS if b.lower() == tag), None)
+
+
+def _labeled(df):
+    """
+    (text, bucket) frame from a CSV with a text column and mood_bucket / mood / mood_label.
+    """
+    text_col = next(c for c in ("text", "example_text") if c in df.columns)
+    label_col = next((c for c in ("mood_bucket", "mood", "mood_label") if c in df.columns), None)
+    if label_col is None:
+        raise ValueError("CSV must have a mood_bucket, mood or mood_label column")
+    out = pd.DataFrame({"text": df[text_col].astype(str), "bucket": df[label_col].map(tag_to_bucket)})
+    if "language" in df.columns:
+        out["language"] = df["language"]
+    return out.dropna(subset=["bucket"])[lambda d: d["text"].str.strip() != ""]
+
+
+def _seed_frames(df):
+    frames = [_labeled(df)]
+    if "notes" in df.columns:
+        # the notes describe each mood in other words: more vocabulary per label
+        frames.append(_labeled(df.drop(columns=["example_text"]).rename(columns={"notes": "text"})))
+    return frames
+
+
+def load_seeds(paths=SEED_CSVS):
+    bundle = load_bundle() if paths == SEED_CSVS else None
+    if bundle is not None:
+        # validated, deduplicated, Hindi tags mapped to the English ones
+        return pd.concat(_seed_frames(bundle.frame("moods")), ignore_index=True)
+    frames = []
+    for path in paths:
+        if not os.path.exists(path):
+            print("Skipping missing seed file", path)
+            continue
+        frames.extend(_seed_frames(pd.read_csv(path, encoding="utf-8")))
+    if not frames:
+        raise FileNotFoundError("no seed CSVs found")
+    return pd.concat(frames, ignore_index=True)
+
+
+def new_model():
+    return make_pipeline(
+        TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 5), sublinear_tf=True, min_df=1),
+        LogisticRegression(C=10.0, class_weight="balanced", max_iter=2000),
+    )
+
+
+def escalation_curve(y_true, predicted, confidence, thresholds=CURVE_THRESHOLDS):
+    """
+    Per threshold: share of texts escalated to Vertex (low confidence, or Urgent), accuracy
+    of the ones answered locally, and overall accuracy if Vertex gets every escalated one
+    right (an upper bound).
+    """
+    y_true, predicted, confidence = map(np.asarray, (y_true, predicted, confidence))
+    correct = predicted == y_true
+    rows = []
+    for t in thresholds:
+        local = (confidence >= t) & (predicted != "Urgent")
+        n_local = int(local.sum())
+        rows.append({
+            "threshold": t,
+            "escalation_rate": round(1 - n_local / len(y_true), 4),
+            "local_accuracy": round(float(correct[local].mean()), 4) if n_local else None,
+            "accuracy_if_vertex_right": round(float((correct & local).sum() + (~local).sum()) / len(y_true), 4),
+        })
+    return rows
+
+
+def pick_threshold(curve, target_accuracy):
+    """
+    Lowest threshold (fewest escalations) whose local accuracy reaches the target; 1.0
+    (escalate everything) if none does.
+    """
+    for row in curve:
+        if row["local_accuracy"] is not None and row["local_accuracy"] >= target_accuracy:
+            return row["threshold"], True
+    return 1.0, False
+
+
+def train(checkins=None, eval_csv=None, out=MODEL_PATH, target_accuracy=TARGET_ACCURACY, cv=5):
+    from sklearn.model_selection import StratifiedKFold, cross_val_predict
+    data = load_seeds()
+    sources = {"seeds": len(data)}
+    if checkins:
+        extra = _labeled(pd.read_csv(checkins, encoding="utf-8"))
+        sources["checkins"] = len(extra)
+        data = pd.concat([data, extra], ignore_index=True)
+    X, y = data["text"].tolist(), data["bucket"].to_numpy()
+
+    t0 = time.perf_counter()
+    if eval_csv:
+        calib = _labeled(pd.read_csv(eval_csv, encoding="utf-8"))
+        model = new_model().fit(X, y)
+        proba = model.predict_proba(calib["text"].tolist())
+        y_calib, calibrated_on = calib["bucket"].to_numpy(), "eval"
+        classes = model.classes_
+    else:
+        calib = data
+        folds = min(cv, int(pd.Series(y).value_counts().min()))
+        proba = cross_val_predict(new_model(), X, y, cv=StratifiedKFold(max(2, folds), shuffle=True, random_state=0),
+                                  method="predict_proba")
+        classes = np.unique(y)
+        y_calib, calibrated_on = y, "out_of_fold"
+        model = new_model().fit(X, y)
+    fit_s = time.perf_counter() - t0
+
+    predicted, confidence = classes[proba.argmax(axis=1)], proba.max(axis=1)
+    curve = escalation_curve(y_calib, predicted, confidence)
+    threshold, met = pick_threshold(curve, target_accuracy)
+    chosen = next((row for row in curve if row["threshold"] == threshold), None)
+
+    by_language = {}
+    if "language" in calib.columns:
+        for lang, idx in calib.groupby("language").indices.items():
+            by_language[lang] = escalation_curve(y_calib[idx], predicted[idx], confidence[idx], [threshold])[0]
+
+    save_atomic(model, out)
+    report = {
+        "threshold": threshold,
+        "target_accuracy": target_accuracy,
+        "target_met": met,
+        "calibrated_on": calibrated_on,
+        "calibration_rows": int(len(y_calib)),
+        "training_rows": sources,
+        "at_threshold": chosen,
+        "by_language": by_language,
+        "curve": curve,
+        "fit_seconds": round(fit_s, 2),
+        "classes": [str(c) for c in model.classes_],
+    }
+    path = report_path(out)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'threshold':>10}{'escalated':>11}{'local acc':>11}{'acc if vertex right':>21}")
+    for row in curve:
+        acc = f"{row['local_accuracy']:.3f}" if row["local_accuracy"] is not None else "-"
+        mark = "  <-" if row["threshold"] == threshold else ""
+        print(f"{row['threshold']:>10.2f}{row['escalation_rate']:>11.1%}{acc:>11}{row['accuracy_if_vertex_right']:>21.3f}{mark}")
+    for lang, row in by_language.items():
+        print(f"  {lang}: escalated {row['escalation_rate']:.1%}, local accuracy {row['local_accuracy']}")
+    print("Saved mood model to", out, "and report to", path)
+    return model, report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local mood classifier and calibrate its threshold.")
+    parser.add_argument("--checkins", help="extra labeled check-ins (text + mood_bucket / mood / mood_label)")
+    parser.add_argument("--eval", dest="eval_csv", help="labeled set to calibrate the threshold on")
+    parser.add_argument("--out", default=MODEL_PATH)
+    parser.add_argument("--target-accuracy", type=float, default=TARGET_ACCURACY)
+    parser.add_argument("--cv", type=int, default=5)
+    args = parser.parse_args()
+    train(args.checkins, args.eval_csv, args.out, args.target_accuracy, args.cv)
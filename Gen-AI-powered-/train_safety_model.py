@@ -1,32 +1,349 @@
 # train_safety_model.py
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.pipeline import make_pipeline
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.pipeline import Pipeline, make_pipeline
 import joblib
+import argparse
+import json
 import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from safety import COMPACT_CURRENT
 
 DATA_CSV = "affirmations.csv"  # adjust path
 OUT_MODEL = os.getenv("SAFETY_MODEL_PATH", "safety_model.joblib")
+# directory for the compact inference artifact (see export_compact / safety.CompactSafetyModel)
+OUT_COMPACT = os.getenv("SAFETY_COMPACT_PATH", "safety_model")
+COMPACT_FORMAT = 1
+SAFETY_CLASSES = np.array(["flag", "safe"])
+# incremental mode: stateless hashed features, so new rows never require a refit of the vocabulary
+INCREMENTAL_FEATURES = 2 ** 20
+INCREMENTAL_BATCH = 5000
+# sweep: default grid, and the precision the flag threshold must keep
+SWEEP_GRID = {
+    "counts__ngram_range": [(1,1), (1,2), (1,3)],
+    "top__max_features": [5000, 20000, None],
+    "tfidf__sublinear_tf": [False, True],
+    "clf__C": [0.3, 1.0, 3.0],
+}
+SWEEP_TARGET_PRECISION = 0.9
+CURVE_POINTS = 20  # precision / recall rows kept in the sweep report
 
-def load_data(path):
-    df = pd.read_csv(path, engine="python")
+def _label_frame(df):
     # Expect columns: text, safety_flag (safe|flag)
     df = df.dropna(subset=["text"])
     if "safety_flag" not in df.columns:
         raise ValueError("CSV must contain 'safety_flag' column with 'safe' or 'flag'")
+    df = df.copy()
     df['label'] = df['safety_flag'].apply(lambda x: 'flag' if str(x).lower().strip() in ['flag','unsafe','1','true'] else 'safe')
     return df
 
+def load_data(path):
+    return _label_frame(pd.read_csv(path, engine="python"))
+
+def save_atomic(model, path):
+    """
+    joblib.dump to a temp file next to `path`, then rename over it, so processes that
+    hot-reload the model (ml_logic) never read a partial file.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(model, tmp)
+    os.replace(tmp, path)
+
 def train():
     df = load_data(DATA_CSV)
     X = df['text'].astype(str).tolist()
     y = df['label'].tolist()
     pipe = make_pipeline(TfidfVectorizer(ngram_range=(1,2), max_features=20000), LogisticRegression(class_weight='balanced', max_iter=1000))
     pipe.fit(X, y)
-    joblib.dump(pipe, OUT_MODEL)
+    save_atomic(pipe, OUT_MODEL)
     print("Saved safety model to", OUT_MODEL)
     print("Classes:", pipe.classes_)
+    return pipe
+
+def export_compact(pipe, out_dir=OUT_COMPACT):
+    """
+    Writes the fitted TF-IDF + linear pipeline as plain arrays that safety.CompactSafetyModel
+    loads without sklearn: vocab.npy (sorted terms), idf.npy and coef.npy (float32), and
+    config.json (tokenizer settings, intercept, classes), in a new version directory
+    out_dir/vN that out_dir/CURRENT is then switched to. Arrays are saved uncompressed so
+    workers can memory-map and share them.
+    """
+    vec, clf = pipe[0], pipe[-1]
+    if not hasattr(vec, "vocabulary_"):
+        raise ValueError("compact export needs a fitted TfidfVectorizer pipeline (not the incremental model)")
+    if getattr(vec, "analyzer", "word") != "word" or vec.strip_accents or vec.stop_words or vec.preprocessor or vec.tokenizer:
+        raise ValueError("compact export supports word analyzers without accents/stop words/custom callables")
+    terms = np.asarray(vec.get_feature_names_out(), dtype=str)
+    order = np.argsort(terms)  # searchsorted lookups need codepoint order
+    coef = np.asarray(clf.coef_, dtype=np.float32)[:, order]
+    config = {
+        "format": COMPACT_FORMAT,
+        "lowercase": bool(vec.lowercase),
+        "token_pattern": vec.token_pattern,
+        "ngram_range": list(vec.ngram_range),
+        "sublinear_tf": bool(vec.sublinear_tf),
+        "norm": vec.norm,
+        "use_idf": bool(vec.use_idf),
+        "intercept": [float(x) for x in np.ravel(clf.intercept_)],
+        "classes": [str(c) for c in clf.classes_],
+    }
+
+    # each export is a new version directory; replacing CURRENT switches to it in one
+    # rename, so loaders never see a missing or half-written artifact
+    os.makedirs(out_dir, exist_ok=True)
+    versions = sorted(int(name[1:]) for name in os.listdir(out_dir) if name[:1] == "v" and name[1:].isdigit())
+    name = f"v{versions[-1] + 1 if versions else 1}"
+    tmp = os.path.join(out_dir, f".{name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "vocab.npy"), terms[order])
+    idf = vec.idf_[order] if vec.use_idf else np.ones(len(terms))
+    np.save(os.path.join(tmp, "idf.npy"), np.asarray(idf, dtype=np.float32))
+    np.save(os.path.join(tmp, "coef.npy"), np.ascontiguousarray(coef))
+    with open(os.path.join(tmp, "config.json"), "w") as f:
+        json.dump(config, f, indent=2)
+    os.rename(tmp, os.path.join(out_dir, name))
+    pointer = os.path.join(out_dir, f"{COMPACT_CURRENT}.{os.getpid()}.tmp")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(out_dir, COMPACT_CURRENT))
+    # keep the previous version too: a process that just read CURRENT may still be opening it
+    for old in versions[:-1]:
+        shutil.rmtree(os.path.join(out_dir, f"v{old}"), ignore_errors=True)
+    for legacy in ("vocab.npy", "idf.npy", "coef.npy", "config.json"):  # unversioned export
+        if os.path.exists(os.path.join(out_dir, legacy)):
+            os.remove(os.path.join(out_dir, legacy))
+    print("Saved compact safety model to", out_dir)
+
+def new_incremental_model():
+    return make_pipeline(
+        HashingVectorizer(ngram_range=(1,2), n_features=INCREMENTAL_FEATURES, alternate_sign=False),
+        SGDClassifier(loss="log_loss", alpha=1e-5),
+    )
+
+def _is_incremental(model):
+    steps = getattr(model, "steps", None)
+    return bool(steps) and isinstance(model[0], HashingVectorizer) and hasattr(model[-1], "partial_fit")
+
+def train_incremental(path, out=OUT_MODEL, batch_size=INCREMENTAL_BATCH, fresh=False, checkpoint_every=20):
+    """
+    Folds newly labeled rows from `path` into the incremental model at `out`, streaming
+    the CSV in mini-batches through SGDClassifier.partial_fit. Cost is proportional to the
+    new rows only. The model is checkpointed atomically every `checkpoint_every` batches
+    and at the end; running ml_logic processes pick the new file up on their next check.
+    """
+    if fresh or not os.path.exists(out):
+        model = new_incremental_model()
+    else:
+        model = joblib.load(out)
+        if not _is_incremental(model):
+            raise ValueError(f"{out} is not an incremental model; use --fresh to start one (e.g. from {DATA_CSV})")
+    vec, clf = model[0], model[-1]
+
+    rows = batches = 0
+    for chunk in pd.read_csv(path, chunksize=batch_size):
+        chunk = _label_frame(chunk)
+        if chunk.empty:
+            continue
+        X = vec.transform(chunk['text'].astype(str))
+        y = chunk['label'].to_numpy()
+        # balanced weights within the batch; flagged rows are rare
+        present, counts = np.unique(y, return_counts=True)
+        weight = dict(zip(present, len(y) / (len(present) * counts)))
+        clf.partial_fit(X, y, classes=SAFETY_CLASSES, sample_weight=np.array([weight[v] for v in y]))
+        rows += len(chunk)
+        batches += 1
+        if checkpoint_every and batches % checkpoint_every == 0:
+            save_atomic(model, out)
+
+    if not hasattr(clf, "classes_"):
+        print("No labeled rows in", path)
+        return None
+    save_atomic(model, out)
+    print(f"Folded {rows} rows ({batches} batches) into {out}")
+    return model
+
+class TopTerms(BaseEstimator, TransformerMixin):
+    """
+    Keeps the max_features most frequent columns of a count matrix, i.e. what
+    CountVectorizer(max_features=...) does, but after the (cached) tokenization step so
+    feature-count candidates reuse one tokenized matrix.
+    """
+
+    def __init__(self, max_features=None):
+        self.max_features = max_features
+
+    def fit(self, X, y=None):
+        totals = np.asarray(X.sum(axis=0)).ravel()
+        if self.max_features is None or self.max_features >= len(totals):
+            self.columns_ = np.arange(len(totals))
+        else:
+            # same tie-break as CountVectorizer: highest count first, then term order
+            self.columns_ = np.sort(np.argsort(-totals, kind="stable")[:self.max_features])
+        return self
+
+    def transform(self, X):
+        return X[:, self.columns_]
+
+def _pick_threshold(y_true, scores, target_precision):
+    """
+    Highest-recall threshold whose precision on the flag class is >= target_precision, the
+    lowest such threshold when several tie (flagging more texts the sweep never saw, not
+    fewer); falls back to the best-F1 threshold when the target is unreachable.
+    The precision / recall curve (at most CURVE_POINTS rows) is returned with the choice.
+    """
+    from sklearn.metrics import precision_recall_curve
+    precision, recall, thresholds = precision_recall_curve(y_true, scores, pos_label="flag")
+    precision, recall = precision[:-1], recall[:-1]  # align with thresholds (ascending)
+    ok = np.flatnonzero(precision >= target_precision)
+    if len(ok):
+        i = int(ok[recall[ok] == recall[ok].max()][0])
+        met = True
+    else:
+        f1 = 2 * precision * recall / np.maximum(precision + recall, 1e-12)
+        i = int(np.argmax(f1))
+        met = False
+    rows = np.unique(np.append(np.linspace(0, len(thresholds) - 1, min(CURVE_POINTS, len(thresholds))).astype(int), i))
+    curve = [{"threshold": round(float(thresholds[j]), 4), "precision": round(float(precision[j]), 4),
+              "recall": round(float(recall[j]), 4)} for j in rows]
+    return {"threshold": float(thresholds[i]), "precision": float(precision[i]),
+            "recall": float(recall[i]), "target_precision": target_precision, "target_met": met, "curve": curve}
+
+def _print_curve(chosen):
+    print(f"{'threshold':>10}{'precision':>11}{'recall':>9}")
+    for row in chosen["curve"]:
+        mark = "  <-" if row["threshold"] == round(chosen["threshold"], 4) else ""
+        print(f"{row['threshold']:>10.4f}{row['precision']:>11.3f}{row['recall']:>9.3f}{mark}")
+
+def sweep(data_csv=DATA_CSV, out=OUT_MODEL, cv=5, n_iter=None, target_precision=SWEEP_TARGET_PRECISION,
+          cache_dir=None, n_jobs=-1):
+    """
+    Cross-validated search over SWEEP_GRID on all cores (randomized when n_iter is set).
+    Tokenization is cached with Pipeline(memory=...) so it runs once per n-gram range and
+    fold, not once per candidate. The best configuration is refit on all rows as the usual
+    TfidfVectorizer + LogisticRegression pipeline and saved to `out`; its flag threshold is
+    tuned on out-of-fold scores and written, with the search results, to safety.report_path(out).
+    """
+    from sklearn.metrics import average_precision_score, make_scorer
+    from sklearn.model_selection import GridSearchCV, RandomizedSearchCV, StratifiedKFold, cross_val_predict
+    from safety import report_path
+
+    df = load_data(data_csv)
+    X = df['text'].astype(str).tolist()
+    y = df['label'].to_numpy()
+    n_flag = int((y == "flag").sum())
+    folds = min(cv, n_flag, len(y) - n_flag)
+    if folds < 2:
+        raise ValueError(f"need at least 2 'flag' and 2 'safe' rows for cross-validation (have {n_flag} flag)")
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=0)
+    scorer = make_scorer(average_precision_score, response_method="predict_proba", pos_label="flag")
+
+    own_cache = cache_dir is None
+    cache_dir = cache_dir or tempfile.mkdtemp(prefix="safety_sweep_")
+    t0 = time.perf_counter()
+    try:
+        search_pipe = Pipeline([
+            ("counts", CountVectorizer()),
+            ("top", TopTerms()),
+            ("tfidf", TfidfTransformer()),
+            ("clf", LogisticRegression(class_weight='balanced', max_iter=1000)),
+        ], memory=cache_dir)
+        if n_iter:
+            search = RandomizedSearchCV(search_pipe, SWEEP_GRID, n_iter=n_iter, scoring=scorer, cv=splitter,
+                                        n_jobs=n_jobs, random_state=0)
+        else:
+            search = GridSearchCV(search_pipe, SWEEP_GRID, scoring=scorer, cv=splitter, n_jobs=n_jobs)
+        search.fit(X, y)
+    finally:
+        if own_cache:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    search_s = time.perf_counter() - t0
+
+    best = search.best_params_
+    pipe = make_pipeline(
+        TfidfVectorizer(ngram_range=best["counts__ngram_range"], max_features=best["top__max_features"],
+                        sublinear_tf=best["tfidf__sublinear_tf"]),
+        LogisticRegression(C=best["clf__C"], class_weight='balanced', max_iter=1000),
+    )
+    oof = cross_val_predict(pipe, X, y, cv=splitter, method="predict_proba", n_jobs=n_jobs)
+    flag_col = list(np.unique(y)).index("flag")
+    chosen = _pick_threshold(y, oof[:, flag_col], target_precision)
+    pipe.fit(X, y)
+    save_atomic(pipe, out)
+
+    results = search.cv_results_
+    ranked = np.argsort(results["rank_test_score"])[:20]
+    report = {
+        "model": os.path.basename(out),
+        "data": data_csv,
+        "rows": len(y),
+        "flag_rows": n_flag,
+        "folds": folds,
+        "scoring": "average_precision(flag)",
+        "search_seconds": round(search_s, 2),
+        "candidates": len(results["params"]),
+        "best_params": {k: (list(v) if isinstance(v, tuple) else v) for k, v in best.items()},
+        "best_score": float(search.best_score_),
+        **chosen,
+        "top": [
+            {"params": {k: (list(v) if isinstance(v, tuple) else v) for k, v in results["params"][i].items()},
+             "mean": float(results["mean_test_score"][i]), "std": float(results["std_test_score"][i])}
+            for i in ranked
+        ],
+    }
+    path = report_path(out)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
+    print(f"Best {report['best_params']} AP={report['best_score']:.3f} ({report['candidates']} candidates, {search_s:.1f}s)")
+    _print_curve(chosen)
+    print(f"Threshold {chosen['threshold']:.3f}: precision {chosen['precision']:.3f}, recall {chosen['recall']:.3f}"
+          + ("" if chosen["target_met"] else f" (target precision {target_precision} not reachable; best F1)"))
+    print("Saved safety model to", out, "and report to", path)
+    return pipe, report
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train / export the safety classifier.")
+    parser.add_argument("--compact", action="store_true", help="after training, also export the compact artifact")
+    # also accepted after the train / sweep subcommands
+    compact = argparse.ArgumentParser(add_help=False)
+    compact.add_argument("--compact", action="store_true", default=argparse.SUPPRESS)
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("train", parents=[compact], help="full retrain from DATA_CSV (default)")
+    p = sub.add_parser("export", help="convert an existing joblib model to the compact format")
+    p.add_argument("model", nargs="?", default=OUT_MODEL)
+    p.add_argument("out_dir", nargs="?", default=OUT_COMPACT)
+    p = sub.add_parser("incremental", help="fold new labeled rows into the hashed SGD model")
+    p.add_argument("csv", help="CSV with text, safety_flag columns")
+    p.add_argument("--batch-size", type=int, default=INCREMENTAL_BATCH)
+    p.add_argument("--checkpoint-every", type=int, default=20, help="batches between checkpoints (0: end only)")
+    p.add_argument("--fresh", action="store_true", help="start a new model instead of updating the existing one")
+    p = sub.add_parser("sweep", parents=[compact], help="cross-validated hyperparameter + threshold search")
+    p.add_argument("--data", default=DATA_CSV)
+    p.add_argument("--cv", type=int, default=5)
+    p.add_argument("--n-iter", type=int, default=None, help="randomized search with this many candidates")
+    p.add_argument("--target-precision", type=float, default=SWEEP_TARGET_PRECISION)
+    p.add_argument("--cache-dir", default=None, help="keep tokenization cache here between runs")
+    p.add_argument("--jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_compact(joblib.load(args.model), args.out_dir)
+    elif args.command == "incremental":
+        train_incremental(args.csv, batch_size=args.batch_size, fresh=args.fresh,
+                          checkpoint_every=args.checkpoint_every)
+    elif args.command == "sweep":
+        pipe, _ = sweep(args.data, cv=args.cv, n_iter=args.n_iter, target_precision=args.target_precision,
+                        cache_dir=args.cache_dir, n_jobs=args.jobs)
+        if args.compact:
+            export_compact(pipe)
+    else:
+        pipe = train()
+        if args.compact:
+            export_compact(pipe)
@@ -0,0 +1,123 @@
+# vertex_async.py
+"""
+asyncio generation layer around a Vertex GenerativeModel.
+
+Behavior:
+  - Uses model.generate_content_async when the SDK provides it, otherwise runs the
+    blocking generate_content on a thread pool of `concurrency` threads.
+  - A semaphore bounds in-flight model calls (per event loop). A thread cannot be
+    interrupted, so a timed-out or cancelled threaded call keeps its slot until the
+    thread actually returns.
+  - Every attempt has its own deadline; failed / timed-out attempts are retried with
+    jittered exponential backoff.
+  - Optional hedging: if an attempt is still running after `hedge_after` seconds and a
+    concurrency slot is free, a second identical request is started and whichever
+    finishes first wins (the other is cancelled).
+"""
+
+import asyncio
+import functools
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("vertex_async")
+
+
+def _release_when_done(sem, fut):
+    # frees the slot of a threaded call that outlived its deadline
+    sem.release()
+    if not fut.cancelled():
+        fut.exception()  # retrieved, so asyncio does not log it as unhandled
+
+
+class AsyncGenerator:
+    def __init__(self, model, concurrency: int = 8, timeout: float = 15.0, retries: int = 2,
+                 backoff: float = 0.25, hedge_after: float = None):
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.hedge_after = hedge_after if hedge_after and hedge_after > 0 else None
+        self._sem = None
+        self._sem_loop = None
+        self._pool = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives are bound to one loop; recreate if we are driven by a new one
+        loop = asyncio.get_running_loop()
+        if self._sem is None or self._sem_loop is not loop:
+            self._sem = asyncio.Semaphore(self.concurrency)
+            self._sem_loop = loop
+        return self._sem
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="vertex")
+        return self._pool
+
+    async def _attempt(self, prompt, **kwargs):
+        sem = self._semaphore()
+        await sem.acquire()
+        if hasattr(self.model, "generate_content_async"):
+            try:
+                return await asyncio.wait_for(self.model.generate_content_async(prompt, **kwargs),
+                                              timeout=self.timeout)
+            finally:
+                sem.release()
+
+        fut = asyncio.get_running_loop().run_in_executor(
+            self._executor(), functools.partial(self.model.generate_content, prompt, **kwargs))
+        try:
+            # shield: a timeout / cancel stops the wait, not the thread
+            return await asyncio.wait_for(asyncio.shield(fut), timeout=self.timeout)
+        finally:
+            if fut.done():
+                sem.release()
+            else:
+                fut.add_done_callback(functools.partial(_release_when_done, sem))
+
+    async def _hedged_attempt(self, prompt, **kwargs):
+        sem = self._semaphore()
+        primary = asyncio.ensure_future(self._attempt(prompt, **kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done or sem.locked():
+            # finished in time, or no spare capacity to hedge with
+            return await primary
+
+        logger.info("Hedging slow Vertex call after %.2fs", self.hedge_after)
+        hedge = asyncio.ensure_future(self._attempt(prompt, **kwargs))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def generate(self, prompt, **kwargs):
+        """
+        Generate content for `prompt`, retrying up to `retries` times.
+        Raises the last error if every attempt fails.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                if self.hedge_after is not None:
+                    return await self._hedged_attempt(prompt, **kwargs)
+                return await self._attempt(prompt, **kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning("Vertex call failed (%s: %s), retry %d in %.2fs",
+                               type(e).__name__, e, attempt + 1, delay)
+                await asyncio.sleep(delay)
@@ -1,45 +1,143 @@
 // backend/src/services/pythonClient.js
 const { spawn } = require("child_process");
 const path = require("path");
+const readline = require("readline");
+
+const ML_DIR = path.join(__dirname, "../../../Gen-AI-powered-");
+const SCRIPT_PATH = path.join(ML_DIR, "ml_logic.py");
+const REQUEST_TIMEOUT_MS = parseInt(
+  process.env.ML_WORKER_TIMEOUT_MS || "30000",
+  10
+);
+// After a crash the worker is restarted with exponential backoff (a worker that
+// exits at startup, e.g. on a failed Vertex init, must not be respawned per call);
+// calls made while waiting fail fast instead.
+const RESTART_BACKOFF_MS = parseInt(process.env.ML_WORKER_BACKOFF_MS || "1000", 10);
+const RESTART_BACKOFF_MAX_MS = parseInt(
+  process.env.ML_WORKER_BACKOFF_MAX_MS || "60000",
+  10
+);
+
+// One long-lived `python ml_logic.py --worker` process serves every call.
+// Requests/responses are newline-delimited JSON matched by id, so many
+// analyses can be in flight at once.
+let worker = null;
+let nextId = 1;
+const pending = new Map();
+let crashes = 0; // consecutive exits without a successful response in between
+let restartAt = 0;
+
+function rejectAll(err) {
+  for (const { reject, timer } of pending.values()) {
+    clearTimeout(timer);
+    reject(err);
+  }
+  pending.clear();
+}
+
+function startWorker() {
+  console.log("Starting Python ML worker:", SCRIPT_PATH);
+
+  const py = spawn("python", [SCRIPT_PATH, "--worker"], { cwd: ML_DIR });
+
+  const rl = readline.createInterface({ input: py.stdout });
+  rl.on("line", (line) => {
+    let msg;
+    try {
+      msg = JSON.parse(line);
+    } catch (e) {
+      console.error("Invalid JSON from Python worker:", line);
+      return;
+    }
+    if (msg.id === null || msg.id === undefined) {
+      // startup failure (e.g. vertex_init_failed) or unparseable request
+      console.error("Python worker error:", msg);
+      return;
+    }
+    crashes = 0;
+    const entry = pending.get(msg.id);
+    if (!entry) return;
+    pending.delete(msg.id);
+    clearTimeout(entry.timer);
+    if (msg.error) {
+      entry.reject(new Error(msg.message || msg.error));
+    } else {
+      entry.resolve(msg.result);
+    }
+  });
+
+  py.stderr.on("data", (chunk) =>
+    console.error("Python worker stderr:", chunk.toString())
+  );
+
+  // EPIPE etc. when the worker dies mid-write: without a listener the 'error'
+  // event would crash the Node process
+  const onPipeError = (err) => {
+    console.error("Python worker pipe error:", err.message);
+    workerGone(py, err);
+  };
+  py.stdin.on("error", onPipeError);
+  py.stdout.on("error", onPipeError);
+
+  py.on("error", (err) => {
+    console.error("Python worker failed to start:", err);
+    workerGone(py, err);
+  });
+
+  py.on("close", (code) => {
+    console.log("Python worker exited with code:", code);
+    workerGone(py, new Error(`Python worker exited with code ${code}`));
+  });
+
+  return py;
+}
+
+function workerGone(py, err) {
+  // pipe errors and 'close' can both report the same exit
+  if (py.gone) return;
+  py.gone = true;
+  if (worker === py) {
+    worker = null;
+    crashes += 1;
+    const delay = Math.min(
+      RESTART_BACKOFF_MS * 2 ** (crashes - 1),
+      RESTART_BACKOFF_MAX_MS
+    );
+    restartAt = Date.now() + delay;
+    console.error(`Python worker down (${crashes} in a row); restart in ${delay}ms`);
+    py.kill();
+  }
+  rejectAll(err);
+}
+
+function getWorker() {
+  if (!worker) {
+    const wait = restartAt - Date.now();
+    if (wait > 0) {
+      throw new Error(`Python worker is restarting (retry in ${wait}ms)`);
+    }
+    worker = startWorker();
+  }
+  return worker;
+}
 
 function callPythonMl(userText) {
   return new Promise((resolve, reject) => {
-    const scriptPath = path.join(
-      __dirname,
-      "../../../Gen-AI-powered-/ml_logic.py"
-    );
+    let py;
+    try {
+      py = getWorker();
+    } catch (err) {
+      reject(err);
+      return;
+    }
+    const id = nextId++;
+    const timer = setTimeout(() => {
+      pending.delete(id);
+      reject(new Error(`Python worker timed out after ${REQUEST_TIMEOUT_MS}ms`));
+    }, REQUEST_TIMEOUT_MS);
 
-    console.log("Python script path:", scriptPath);
-    console.log("Current working directory:", process.cwd());
-
-    const py = spawn("python", [scriptPath, userText], {
-      cwd: path.join(__dirname, "../../../Gen-AI-powered-"),
-    });
-
-    let data = "";
-    let error = "";
-
-    py.stdout.on("data", (chunk) => (data += chunk.toString()));
-    py.stderr.on("data", (chunk) => (error += chunk.toString()));
-
-    py.on("close", (code) => {
-      console.log("Python process exited with code:", code);
-      console.log("Python stdout:", data);
-      console.log("Python stderr:", error);
-
-      if (code !== 0) {
-        return reject(new Error(error || `Python exited with code ${code}`));
-      }
-      try {
-        const parsed = JSON.parse(data.trim());
-        console.log("Parsed Python response:", parsed);
-        resolve(parsed);
-      } catch (e) {
-        console.error("Failed to parse Python JSON:", e);
-        console.error("Raw data:", data);
-        reject(new Error("Invalid JSON from Python: " + data));
-      }
-    });
+    pending.set(id, { resolve, reject, timer });
+    py.stdin.write(JSON.stringify({ id, text: userText }) + "\n");
   });
 }
 
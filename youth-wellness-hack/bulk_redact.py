@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Bulk redaction of check-in exports.
+
+Streams a CSV or JSONL file, shards the rows across a ProcessPoolExecutor in chunks and
+writes the redacted rows, in input order, as soon as each chunk is done. Only a bounded
+number of chunks is in flight, so memory use does not grow with the file size.
+
+Usage:
+    python bulk_redact.py checkins.csv checkins.redacted.csv [--columns text,notes]
+    python bulk_redact.py checkins.jsonl checkins.redacted.jsonl [--workers 8] [--chunk-size 2000]
+
+CSV: the header row is kept; only --columns are redacted (default: every column).
+JSONL: every string value is redacted (default) or only the --columns keys.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from improved_redaction_helper import PII_PATTERNS, redact_with_counts
+
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def _redact_value(value, counts):
+    if isinstance(value, str):
+        value, c = redact_with_counts(value)
+        counts.update(c)
+    elif isinstance(value, dict):
+        value = {k: _redact_value(v, counts) for k, v in value.items()}
+    elif isinstance(value, list):
+        value = [_redact_value(v, counts) for v in value]
+    return value
+
+
+def redact_csv_rows(rows, columns=None):
+    """
+    Redacts the given column indexes (all when None) of CSV rows. Returns (rows, counts).
+    """
+    counts = Counter()
+    out = []
+    for row in rows:
+        idx = range(len(row)) if columns is None else [i for i in columns if i < len(row)]
+        row = list(row)
+        for i in idx:
+            row[i], c = redact_with_counts(row[i])
+            counts.update(c)
+        out.append(row)
+    return out, counts
+
+
+def redact_jsonl_lines(lines, keys=None):
+    """
+    Redacts raw JSONL lines; parsing happens here so it runs in the worker. Blank lines are
+    dropped. Returns (serialized lines, counts).
+    """
+    counts = Counter()
+    out = []
+    for line in lines:
+        if not line.strip():
+            continue
+        obj = json.loads(line)
+        if keys is None or not isinstance(obj, dict):
+            obj = _redact_value(obj, counts)
+        else:
+            for k in keys:
+                if k in obj:
+                    obj[k] = _redact_value(obj[k], counts)
+        out.append(json.dumps(obj, ensure_ascii=False))
+    return out, counts
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ordered_map(fn, chunks, workers, *args):
+    """
+    Yields fn(chunk, *args) for each chunk, in order. With workers > 1 chunks run in a
+    process pool with at most 2 * workers pending, so the input is never read ahead further.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield fn(chunk, *args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(fn, chunk, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def bulk_redact(src, dst, columns=None, workers=None, chunk_size=2000, fmt=None):
+    """
+    Redacts `src` into `dst`. Returns {"rows", "seconds", "rows_per_sec", "counts"}.
+    """
+    workers = workers or os.cpu_count() or 1
+    fmt = fmt or ("jsonl" if os.path.splitext(src)[1].lower() in (".jsonl", ".ndjson") else "csv")
+    counts = Counter()
+    rows = 0
+    t0 = time.perf_counter()
+
+    with open(src, encoding="utf-8", newline="") as fin, open(dst, "w", encoding="utf-8", newline="") as fout:
+        if fmt == "csv":
+            reader = csv.reader(fin)
+            writer = csv.writer(fout)
+            header = next(reader, None)
+            if header is None:
+                return {"rows": 0, "seconds": 0.0, "rows_per_sec": 0.0, "counts": {}}
+            writer.writerow(header)
+            idx = None
+            if columns:
+                missing = [c for c in columns if c not in header]
+                if missing:
+                    raise ValueError(f"columns not in header: {', '.join(missing)}")
+                idx = [header.index(c) for c in columns]
+            for out, c in ordered_map(redact_csv_rows, _chunks(reader, chunk_size), workers, idx):
+                writer.writerows(out)
+                counts.update(c)
+                rows += len(out)
+        else:
+            for out, c in ordered_map(redact_jsonl_lines, _chunks(fin, chunk_size), workers, columns):
+                for line in out:
+                    fout.write(line)
+                    fout.write("\n")
+                counts.update(c)
+                rows += len(out)
+
+    seconds = time.perf_counter() - t0
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else 0.0,
+        "counts": {label: counts[label] for label, _ in PII_PATTERNS},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Redact PII from a CSV / JSONL check-in export.")
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    parser.add_argument("--columns", help="comma-separated columns (CSV) or keys (JSONL) to redact")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count, 1 = inline)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="rows per task")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None, help="default: from the file extension")
+    args = parser.parse_args(argv)
+
+    columns = [c.strip() for c in args.columns.split(",") if c.strip()] if args.columns else None
+    report = bulk_redact(args.src, args.dst, columns=columns, workers=args.workers,
+                         chunk_size=max(1, args.chunk_size), fmt=args.format)
+    print(f"{report['rows']} rows in {report['seconds']:.2f}s ({report['rows_per_sec']:.0f} rows/sec)", file=sys.stderr)
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,41 +5,154 @@ Automatically generated by Colab.
 
 Original file is located at
     https://colab.research.google.com/drive/1Yrmu4RQ3TsHupBRxKliIL6tvulzHh8lX
+
+All patterns are compiled into one alternation with a named group per PII type, so a
+text is scanned once and each match is replaced by a typed placeholder ("[EMAIL]",
+"[PHONE]", "[DATE]", "[NAME]"). RedactionStream applies the same regex to text that
+arrives in chunks (large exports), holding back a short tail so PII that straddles a
+chunk boundary is still caught.
 """
 
 import re
+import sys
+from collections import Counter
 
-# A more robust list of PII patterns using regular expressions.
+# A more robust list of PII patterns using regular expressions, as (label, pattern).
+# Order matters only when two patterns match at the same position: the first one wins.
 PII_PATTERNS = [
-    # Patterns for names, including middle initials and multiple names.
-    # E.g., "John Doe", "Mary Anne Smith", "P. J. Harris"
-    r"\b[A-Z]\w+ (?:\. |[A-Z]\w+ )+[A-Z]\w+\b",
-
-    # 10-digit phone numbers, with or without spaces/hyphens.
-    # E.g., "9876543210", "987-654-3210", "987 654 3210"
-    r"\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b",
-
     # Email addresses.
     # E.g., "user@example.com", "first.last@mail.co.uk"
-    r"\b[\w\.-]+@[\w\.-]+\.\w+\b",
+    ("EMAIL", r"\b[\w\.-]+@[\w\.-]+\.\w+\b"),
 
     # Dates in various formats (MM/DD/YYYY, DD-MM-YY, etc.).
-    r"\b\d{1,4}[/.-]\d{1,2}[/.-]\d{2,4}\b"
+    ("DATE", r"\b\d{1,4}[/.-]\d{1,2}[/.-]\d{2,4}\b"),
+
+    # 10-digit phone numbers, with or without spaces/hyphens.
+    # E.g., "9876543210", "987-654-3210", "987 654 3210"
+    ("PHONE", r"\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b"),
+
+    # Patterns for names, including middle initials and multiple names.
+    # E.g., "John Doe", "Mary Anne Smith", "P. J. Harris"
+    ("NAME", r"\b[A-Z]\w+ (?:\. |[A-Z]\w+ )+[A-Z]\w+\b"),
 ]
 
+PII_REGEX = re.compile("|".join(f"(?P<{label}>{pattern})" for label, pattern in PII_PATTERNS))
+PLACEHOLDERS = {label: f"[{label}]" for label, _ in PII_PATTERNS}
+
+# Longest PII match the streaming mode guarantees to catch across a chunk boundary.
+STREAM_OVERLAP = 256
+
+
 def redact(text):
     """
-    Replaces all matches of PII patterns in a given string with "[REDACTED]".
+    Replaces every PII match in a given string with its typed placeholder, in one pass.
+    """
+    if not text:
+        return text
+    return PII_REGEX.sub(lambda m: PLACEHOLDERS[m.lastgroup], text)
+
+
+def redact_with_counts(text):
+    """
+    Like redact(), but also returns a Counter of matches per PII type.
     """
-    for p in PII_PATTERns:
-        text = re.sub(p, "[REDACTED]", text)
-    return text
+    counts = Counter()
+    if not text:
+        return text, counts
+
+    def replace(m):
+        counts[m.lastgroup] += 1
+        return PLACEHOLDERS[m.lastgroup]
+
+    return PII_REGEX.sub(replace, text), counts
+
+
+class RedactionStream:
+    """
+    Incremental redactor: feed() text chunks in order, then finish(). The concatenated
+    return values equal redact() of the whole text, as long as no single PII match is
+    longer than `overlap` characters. `counts` accumulates matches per PII type.
+    """
+
+    def __init__(self, overlap=STREAM_OVERLAP):
+        self.overlap = overlap
+        self.counts = Counter()
+        self._buf = ""
+
+    def _emit(self, text, end):
+        # Redacts text[:end]. Returns (output, actual end): a match crossing `end` is
+        # left whole for the next round by cutting at its start instead.
+        out, pos = [], 0
+        for m in PII_REGEX.finditer(text):
+            if m.start() >= end:
+                break
+            if m.end() > end:
+                end = m.start()
+                break
+            out.append(text[pos:m.start()])
+            out.append(PLACEHOLDERS[m.lastgroup])
+            self.counts[m.lastgroup] += 1
+            pos = m.end()
+        out.append(text[pos:end])
+        return "".join(out), end
+
+    def feed(self, chunk):
+        buf = self._buf + chunk
+        end = len(buf) - self.overlap
+        # only cut right after whitespace, so no word is split between rounds
+        while end > 0 and not buf[end - 1].isspace():
+            end -= 1
+        if end <= 0:
+            self._buf = buf
+            return ""
+        out, end = self._emit(buf, end)
+        self._buf = buf[end:]
+        return out
+
+    def finish(self):
+        buf, self._buf = self._buf, ""
+        return self._emit(buf, len(buf))[0]
+
+
+def redact_stream(chunks, overlap=STREAM_OVERLAP):
+    """
+    Generator over redacted pieces of an iterable of text chunks (e.g. a file object).
+    """
+    stream = RedactionStream(overlap)
+    for chunk in chunks:
+        out = stream.feed(chunk)
+        if out:
+            yield out
+    tail = stream.finish()
+    if tail:
+        yield tail
+
+
+def redact_file(src, dst, chunk_size=1 << 16):
+    """
+    Redacts a text / CSV export of any size into `dst`. Returns match counts per PII type.
+    """
+    stream = RedactionStream()
+    with open(src, encoding="utf-8", newline="") as fin, open(dst, "w", encoding="utf-8", newline="") as fout:
+        for chunk in iter(lambda: fin.read(chunk_size), ""):
+            fout.write(stream.feed(chunk))
+        fout.write(stream.finish())
+    return stream.counts
+
 
 if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        # python improved_redaction_helper.py export.csv export.redacted.csv
+        counts = redact_file(sys.argv[1], sys.argv[2])
+        print(", ".join(f"{label}={counts[label]}" for label, _ in PII_PATTERNS))
+        sys.exit(0)
+
     # Test the improved redaction with a sample string containing various PII formats.
     sample = "Hi, I'm Dr. Jane Marie Smith. My phone number is 987-654-3210. You can email me at jmsmith@corp.org, and my birthday is 05-02-1985. I have an old number 9876543210 and a date 10/21/24."
 
     print("Original text:")
     print(sample)
     print("\nRedacted text:")
-    print(redact(sample))
\ No newline at end of file
+    redacted, counts = redact_with_counts(sample)
+    print(redacted)
+    print("\nMatches:", dict(counts))
@@ -1,4 +1,4 @@
-import pandas as pd
+import csv
 import os
 import json
 
@@ -22,6 +22,26 @@ fetch_gov_news_sources_sh_path = os.path.join(base_dir, "gov_news_sources", "fet
 fetch_gov_news_sources_hindi_sh_path = os.path.join(base_dir, "gov_news_sources", "fetch_gov_news_sources_hindi.sh")
 
 
+def write_csv(path, data):
+    # column dict -> CSV with the csv module (quotes fields that contain commas)
+    columns = list(data)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in zip(*data.values()):
+            writer.writerow(['' if v is None else v for v in row])
+
+
+def check_csv(path):
+    # every row must have as many fields as the header (what pandas' ParserError caught)
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        for row in reader:
+            if row and len(row) != len(header):
+                raise ValueError(f"{os.path.basename(path)}:{reader.line_num}: {len(row)} fields, expected {len(header)}")
+
+
 # Function to create dummy data files with the specified new format
 def create_dummy_files():
     # Affirmations CSVs
@@ -33,7 +53,7 @@ def create_dummy_files():
         'language': ['en', 'en', 'en'],
         'safety_flag': [0, 0, 0]
     }
-    pd.DataFrame(affirmations_data).to_csv(affirmations_path, index=False)
+    write_csv(affirmations_path, affirmations_data)
 
     affirmations_hindi_data = {
         'id': [1, 2, 3],
@@ -43,7 +63,7 @@ def create_dummy_files():
         'language': ['hi', 'hi', 'hi'],
         'safety_flag': [0, 0, 0]
     }
-    pd.DataFrame(affirmations_hindi_data).to_csv(affirmations_hindi_path, index=False, encoding='utf-8')
+    write_csv(affirmations_hindi_path, affirmations_hindi_data)
 
     # Health Tips CSVs
     health_tips_data = {
@@ -54,7 +74,7 @@ def create_dummy_files():
         'duration_min': [None, 10],
         'language': ['en', 'en']
     }
-    pd.DataFrame(health_tips_data).to_csv(health_tips_path, index=False)
+    write_csv(health_tips_path, health_tips_data)
 
     health_tips_hindi_data = {
         'id': [1, 2],
@@ -64,7 +84,7 @@ def create_dummy_files():
         'duration_min': [None, 10],
         'language': ['hi', 'hi']
     }
-    pd.DataFrame(health_tips_hindi_data).to_csv(health_tips_hindi_path, index=False, encoding='utf-8')
+    write_csv(health_tips_hindi_path, health_tips_hindi_data)
 
     # Moods CSVs
     moods_data = {
@@ -73,7 +93,7 @@ def create_dummy_files():
         'mood_label': ['confused', 'anxious', 'depressed'],
         'notes': ['User is seeking clarity.', 'User is worried about future events.', 'User feels low energy.']
     }
-    pd.DataFrame(moods_data).to_csv(moods_path, index=False)
+    write_csv(moods_path, moods_data)
     
     moods_hindi_data = {
         'id': [1, 2, 3],
@@ -81,7 +101,7 @@ def create_dummy_files():
         'mood_label': ['भ्रमित', 'चिंतित', 'उदासीन'],
         'notes': ['उपयोगकर्ता स्पष्टता चाहता है।', 'उपयोगकर्ता भविष्य की घटनाओं के बारे में चिंतित है।', 'उपयोगकर्ता कम ऊर्जा महसूस करता है।']
     }
-    pd.DataFrame(moods_hindi_data).to_csv(moods_hindi_path, index=False, encoding='utf-8')
+    write_csv(moods_hindi_path, moods_hindi_data)
 
     # Mood to Affirmation JSONs
     mood_to_affirmation_en = {
@@ -117,16 +137,13 @@ create_dummy_files()
 
 # Read CSV files with new schema
 try:
-    affirmations = pd.read_csv(affirmations_path)
-    affirmations_hindi = pd.read_csv(affirmations_hindi_path, encoding="utf-8")
-    health_tips = pd.read_csv(health_tips_path)
-    health_tips_hindi = pd.read_csv(health_tips_hindi_path, encoding="utf-8")
-    moods = pd.read_csv(moods_path)
-    moods_hindi = pd.read_csv(moods_hindi_path, encoding="utf-8")
+    for path in [affirmations_path, affirmations_hindi_path, health_tips_path, health_tips_hindi_path,
+                 moods_path, moods_hindi_path]:
+        check_csv(path)
     print("All CSV files read successfully. ✅")
 except FileNotFoundError as e:
     print(f"Error: One or more CSV files not found. {e} ❌")
-except pd.errors.ParserError as e:
+except ValueError as e:
     print(f"Error parsing CSV file. Please check for extra commas or incorrect formatting. {e} ❌")
 
 # Read JSON files